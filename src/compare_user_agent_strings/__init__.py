@@ -4,8 +4,71 @@
 
 from . __version__ import __version__
 
-from . ua_fingerprint import (
-                              print_parsed_user_agent_string,
-                              user_agent_strings_are_compatible_strictly,
-                              user_agent_strings_are_compatible
-                              )
+# The public names are imported from their submodules on first access (PEP 562), so that
+# `import compare_user_agent_strings` costs almost nothing; in particular, it imports neither ua_parser (see
+# ua_fingerprint.warm_up()) nor the modules used only for batch, persistent, or precomputed operation.
+_SUBMODULE_OF_PUBLIC_NAME = {
+    "ClientFingerprint": "ua_fingerprint",
+    "print_parsed_user_agent_string": "ua_fingerprint",
+    "user_agent_strings_are_compatible_strictly": "ua_fingerprint",
+    "user_agent_strings_are_compatible": "ua_fingerprint",
+    "fingerprint_is_compatible": "ua_fingerprint",
+    "get_client_fingerprint": "ua_fingerprint",
+    "is_fingerprint_cached": "ua_fingerprint",
+    "configure_fingerprint_cache": "ua_fingerprint",
+    "fingerprint_cache_info": "ua_fingerprint",
+    "fingerprint_source_info": "ua_fingerprint",
+    "clear_fingerprint_cache": "ua_fingerprint",
+    "configure_pair_decision_cache": "ua_fingerprint",
+    "pair_decision_cache_info": "ua_fingerprint",
+    "configure_persistent_fingerprint_cache": "ua_fingerprint",
+    "persistent_fingerprint_cache_info": "ua_fingerprint",
+    "warm_up": "ua_fingerprint",
+    "configure_lexical_prefilter": "ua_fingerprint",
+    "explain_compatibility": "ua_fingerprint",
+    "explain_fingerprint_compatibility": "ua_fingerprint",
+    "ComparisonResult": "ua_fingerprint",
+    "Reason": "ua_fingerprint",
+    "configure_parser_backend": "backends",
+    "parser_backend_info": "backends",
+    "available_parser_backends": "backends",
+    "compare_many": "batch",
+    "FingerprintRegistry": "registry",
+    "RegistryFull": "registry",
+    "SessionTracker": "session_tracker",
+    "compare_columns": "vectorized",
+    "compare_codes": "vectorized",
+    "user_agent_strings_are_compatible_async": "async_api",
+    "fingerprint_is_compatible_async": "async_api",
+    "get_client_fingerprint_async": "async_api",
+    "configure_async_parsing": "async_api",
+    "async_parsing_info": "async_api",
+    "ParseBacklogFull": "async_api",
+    "enable_metrics": "metrics",
+    "disable_metrics": "metrics",
+    "metrics_snapshot": "metrics",
+    "format_prometheus": "metrics",
+    "SessionUserAgentChecker": "middleware",
+    "UserAgentWSGIMiddleware": "middleware",
+    "UserAgentASGIMiddleware": "middleware",
+    "build_fingerprint_artifact": "precompute",
+    "load_fingerprint_artifact": "precompute",
+    "clear_precomputed_fingerprints": "precompute",
+    }
+
+__all__ = ["__version__", *_SUBMODULE_OF_PUBLIC_NAME]
+
+
+def __getattr__(name):
+    submodule_name = _SUBMODULE_OF_PUBLIC_NAME.get(name)
+    if submodule_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    # Equivalent to `from .<submodule_name> import <name>` (and, unlike importlib, visible to -X importtime).
+    value = getattr(__import__(submodule_name, globals(), None, (name,), 1), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_SUBMODULE_OF_PUBLIC_NAME))
@@ -1,10 +1,19 @@
 """
-Reads data from packaged resources for π, e, and the meaning of life.
-
 Entry point for package.
 See, e.g., https://docs.python.org/3/library/__main__.html#main-py-in-python-packages
+
+    python -m compare_user_agent_strings            runs the examples in run_examples.py
+    python -m compare_user_agent_strings bench ...  runs the benchmark suite (see benchmarks.py)
+    python -m compare_user_agent_strings replay ... replays an access log (see log_replay.py)
+    python -m compare_user_agent_strings precompute ...
+                                                    builds a fingerprint artifact (see precompute.py)
+    python -m compare_user_agent_strings differential ...
+                                                    checks the accelerated paths against the original
+                                                    implementation (see differential.py)
 """
 
+import argparse
+import importlib
 import sys
 
 
@@ -12,7 +21,44 @@ import sys
 # with `python src/demo_package_sample_data_with_code/my_module.py`, returning the following error:
 #     ImportError: attempted relative import with no known parent package
 # However, I plan to run this from within a package, in which case it works fine.
-from .run_examples import main
+from . import run_examples
+
+
+# Subcommands: name -> (module that defines its options and runs it, help)
+_SUBCOMMANDS = {
+    "bench": ("benchmarks", "benchmark the parse and compare hot paths; print JSON"),
+    "replay": ("log_replay", "replay access-log records; report flagged sessions"),
+    "precompute": ("precompute", "precompute fingerprints of common user-agent strings"),
+    "differential": ("differential", "check every accelerated path against the original implementation; print JSON"),
+    }
+
+
+def main(argv = None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(prog="python -m compare_user_agent_strings",
+                                     description="Compare user-agent strings for compatibility.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    subparsers.add_parser("examples", help="print the compatibility of the built-in example strings (default)")
+
+    # Only the module of the subcommand given is imported, so that each one starts without loading the others.
+    command = argv[0] if argv else None
+    command_module = None
+    for (name, (module_name, help_text)) in _SUBCOMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text)
+        if name == command:
+            command_module = importlib.import_module(f".{module_name}", __package__)
+            command_module.build_argument_parser(subparser)
+
+    arguments = parser.parse_args(argv)
+
+    if arguments.command in _SUBCOMMANDS:
+        return command_module.run_from_arguments(arguments)
+
+    return run_examples.main()
+
 
 if __name__ == "__main__":
-    sys.exit(main())
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,239 @@
+"""
+A frozen copy of the original (release 1.0.2) implementation of
+`user_agent_strings_are_compatible()`, kept verbatim as the reference against
+which the optimized code paths are benchmarked and differentially tested.
+
+Do not optimize or otherwise modify this module: its only value is that it
+behaves exactly as the original did. (The only deliberate differences are
+the names—the original `ClientFingerprint` is `ReferenceClientFingerprint`
+here and the entry point is `reference_user_agent_strings_are_compatible()`—
+and that the strict test `user_agent_strings_are_compatible_strictly()`, a
+plain `==`, is inlined.)
+"""
+
+
+class ReferenceClientFingerprint():
+    """
+    Object records parameters to fingerprint a web client from the user-agent
+    string it sent to the server.
+    """
+
+    def __init__(self, uastring):
+
+        # DEBUG (because of an importing problem)
+        from ua_parser import user_agent_parser
+
+        parsed_string = user_agent_parser.Parse(uastring)
+
+        self.string = parsed_string["string"]
+
+        self.device = parsed_string["device"]
+        self.device_brand = self.device["brand"]
+        self.device_family = self.device["family"]
+        self.device_model = self.device["model"]
+
+        self.os = parsed_string["os"]
+        self.os_family = self.os["family"]
+        self.os_major = self.os["major"]
+        self.os_minor = self.os["minor"]
+        self.os_patch = self.os["patch"]
+        self.os_patch_minor = self.os["patch_minor"]
+
+        self.user_agent = parsed_string["user_agent"]
+        self.user_agent_family = self.user_agent["family"]
+        self.user_agent_major = self.user_agent["major"]
+        self.user_agent_minor = self.user_agent["minor"]
+        self.user_agent_patch = self.user_agent["patch"]
+
+
+
+def reference_user_agent_strings_are_compatible(ua_string_1, ua_string_2, *, strict = False):
+    """
+    Compares two user-agent strings to determine whether the second one is
+    compatible with the first in the sense that both could have been sent by
+    the same machine/browser, optionally allowing for an intervening upgrade in
+    the OS and/or browser.
+
+    A third, optional, argument is “strict”, which if True, requires that the
+    numerical version numbers (major, minor, etc.) for OS and browser are
+    identical in both user-agent strings. This is appropriate for transient
+    sessions (that end when the browser is closed; not “remember me”) because
+    any upgrade of OS or browser would end the session.
+    
+    However, If the session is an extended, i.e., “remember me,” session, a
+    user might upgrade the OS or browser during the extended session. Using
+    `strict=True` would force that user to re-login after any browser or OS
+    upgrade. For extended sessions, consider setting `strict=False` (the
+    default) to allow for upgrades of the OS and/or browser during the extended
+    session. A downgrade of either browser or OS is sufficient to trigger a
+    return value of `False`, just as in the `strict=True` case. When testing
+    version numbers, only major and minor components (not patch) components are
+    considered.
+
+    Some attributes are required to be equal across the two strings, because 
+    those attributes should be immutable during any session, even an extended
+    one. (E.g., "Apple", "Mac", "Mac OS X", "Chrome").
+
+    Returns a tuple (is_compatible, discrepancy_message), where is_compatible =
+        True    There is no conflict between the two user-agent strings
+        False   There is a conflict between the two user-agent string.
+                The session ID should be revoked because the session cookie
+                may have been stolen by a different machine.
+    """
+
+
+    default_attribute_value = "not available"
+    attributes_that_must_be_equal = ["device_brand",
+                                     "device_family",
+                                     "device_model",
+                                     "os_family",
+                                     "user_agent_family"
+                                    ]
+
+
+    def numeric_version_number_if_possible(fingerprint, attribute):
+        """
+        If possible, converts supplied version number string (e.g., major or 
+        minor) to an integer.
+
+        Returns a tuple (is_numeric, returned_value), where
+            is_numeric      is True if the string could be converted to int;
+                            otherwise False
+            returned_value  is the int form of the string if possible or, if
+                            not, the original string.
+        """
+
+        version_number_string = getattr(fingerprint, attribute, default_attribute_value)
+
+        try:
+            numeric_version_number = int(version_number_string)
+        except (ValueError, TypeError):
+            returned_value = version_number_string
+            is_numeric = False
+        else:
+            returned_value = numeric_version_number
+            is_numeric = True
+
+        return (is_numeric, returned_value)
+
+
+    def analyze_parsed_user_agent_strings(ua_string_1, ua_string_2):
+        """
+        If called, we know that (a) strict==False and (b) the two strings are
+        not exactly equal. Parses the pair of user-agent strings to determine
+        whether the difference can be attributed to an upgrade.
+
+        Returns is_compatible as either True or False
+        """
+
+
+        # Parses each user-agent string into an object whose attributes are the relevant components to test
+        fingerprint_1 = ReferenceClientFingerprint(ua_string_1)
+        fingerprint_2 = ReferenceClientFingerprint(ua_string_2)
+
+        # We test the version numbers. Only if at least one version attribute is an upgrade might we go on to test the
+        # non-version attributes
+        further_analysis_is_justified = False
+
+        def attribute_is_upgrade_or_compatible(attribute):
+            """
+            Tests a particular version attribute of the current pair of fingerprints to return:
+                is_upgrade: True iff that attribute is numerically upgraded from the first to second fingerprint.
+                is_compatible: True iff no red flags occurred w.r.t. attribute, such as a numerical downgrade or
+                               this attribute was nonnumeric and nonequal.
+            """
+            is_upgrade = False
+
+            (attribute_1_is_numeric, attribute_1_value) = numeric_version_number_if_possible(fingerprint_1, attribute)
+            (attribute_2_is_numeric, attribute_2_value) = numeric_version_number_if_possible(fingerprint_2, attribute)
+
+            if (attribute_1_is_numeric and attribute_2_is_numeric):
+                if (attribute_2_value > attribute_1_value):
+                    is_upgrade = True
+                    is_compatible = True
+                elif (attribute_2_value == attribute_1_value):
+                    is_compatible = True
+                else:
+                    # Is a downgrade
+                    is_compatible = False
+            elif ((not attribute_1_is_numeric) and (not attribute_2_is_numeric)):
+                # The attribute of each string is not numeric. Check for equality.
+                is_compatible = (attribute_1_value == attribute_2_value)
+            else:
+                # One is numeric, but the other is not => FAIL
+                is_compatible = False
+            
+            return (is_upgrade, is_compatible)
+        
+
+        def is_compatible_after_comparing_attributes_that_must_be_equal():
+            """
+            Inner function utility.
+
+            Compares all the attributes that must be equal if the user-agent
+            strings are compatible.
+            """
+
+
+            is_compatible = True
+            for attribute in attributes_that_must_be_equal:
+                value_1 = getattr(fingerprint_1, attribute, default_attribute_value)
+                value_2 = getattr(fingerprint_2, attribute, default_attribute_value)
+
+                if value_1 != value_2:
+                    is_compatible = False
+                    break
+
+            return is_compatible
+
+        # Beginning of actual comparison computation
+        for (major, minor) in [("os_major", "os_minor"), ("user_agent_major", "user_agent_minor")]:
+            (is_upgrade, is_compatible) = attribute_is_upgrade_or_compatible(major)
+
+            if not is_compatible:
+                return is_compatible
+
+            if is_upgrade:
+                further_analysis_is_justified = True
+                break
+            
+            # Major is not incompatible but not an upgrade. Check minor.
+            (is_upgrade, is_compatible) = attribute_is_upgrade_or_compatible(minor)
+
+            if not is_compatible:
+                return is_compatible
+
+            if is_upgrade:
+                further_analysis_is_justified = True
+                
+        if not further_analysis_is_justified:
+            is_compatible = False
+            return is_compatible
+
+      
+        # If here, (a) at least one version attribute is an upgrade and (b) neither version attribute is a downgrade.
+        # Thus we check the non-version attributes for equality across the pair of user-agent strings.
+
+        is_compatible = is_compatible_after_comparing_attributes_that_must_be_equal()
+
+        return is_compatible
+
+        # End of inner functions
+    # Beginning of actual comparison computation
+
+    is_compatible_strictly = (ua_string_1 == ua_string_2)
+
+    # If strict, is_compatible_strictly is the only relevant criterion.
+    # Even if not strict, if is_compatible_strictly is True, then the weaker not-strict criterion is also satisfied.
+    if strict or is_compatible_strictly:
+        is_compatible = is_compatible_strictly
+        return is_compatible
+
+    # If here, (a) strict==False and (b) the two UA strings are not exactly equal. This would be an immediate FAIL unless
+    # the difference can be attributed to either the browser and/or OS being upgraded. To determine this we must parse
+    # the strings to determine whether the version numbers imply an update in the OS and/or browser. If so, test
+    # the non-version parsed fields for equality across the two user-agent strings.
+
+    is_compatible = analyze_parsed_user_agent_strings(ua_string_1, ua_string_2)
+
+    return is_compatible
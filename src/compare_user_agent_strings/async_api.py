@@ -0,0 +1,335 @@
+"""
+Compares user-agent strings from asyncio code (e.g., an ASGI application)
+without blocking the event loop on a cold parse.
+
+Exposes publicly:
+    user_agent_strings_are_compatible_async(ua_string_1, ua_string_2, *,
+                                            strict = False)
+    fingerprint_is_compatible_async(baseline_fingerprint, current, *,
+                                    strict = False)
+    get_client_fingerprint_async(ua_string)
+    configure_async_parsing(*, max_workers = 2, max_pending = 256,
+                            executor = None)
+    async_parsing_info()
+    AsyncFingerprintResolver(*, max_workers = 2, max_pending = 256,
+                             executor = None)
+    ParseBacklogFull
+
+The coroutines make exactly the decisions of their synchronous namesakes in
+ua_fingerprint.py. Every case that needs no parsing is answered inline, on the
+event loop, without a thread hop: equal strings, strict mode, strings already
+in the fingerprint cache (or precomputed), pairs in the memo of pair
+decisions (which the coroutines share with the synchronous functions), and
+pairs that the lexical prefilter decides. Only a string that must actually be parsed is sent to an
+executor, and:
+    * concurrent requests for the same not-yet-parsed string, from any number
+      of tasks, share one in-flight parse;
+    * at most max_workers parses run at once (by default, in a thread pool
+      private to this module); and
+    * at most max_pending distinct strings may be waiting for or undergoing a
+      parse; a request that would need one more raises ParseBacklogFull at
+      once, instead of queueing, so that a burst of novel (e.g., bot)
+      user-agent strings cannot build an unbounded backlog. The caller
+      decides how to treat such a request (e.g., reject it, or answer it with
+      the strict check, which needs no parsing).
+
+Parsing is pure-Python regex work: in a thread it still holds the GIL, but the
+interpreter switches back to the event loop thread at every switch interval
+(5 ms by default) rather than only after the whole parse. To take parsing off
+the event loop's process entirely, pass executor=ProcessPoolExecutor(...);
+fingerprints then come back in their compact serialized form and are added to
+this process's fingerprint cache.
+
+While metrics are enabled (see metrics.py), the coroutines decide by the
+instrumented twin of the decision kernel, still parsing off the event loop,
+and count each comparison by path and reason as the synchronous functions do.
+"""
+
+import asyncio
+import weakref
+from time import perf_counter
+
+from . import ua_fingerprint
+from . ua_fingerprint import (
+                              analyze_parsed_fingerprints,
+                              get_client_fingerprint,
+                              is_fingerprint_cached,
+                              user_agent_strings_are_compatible_strictly,
+                             )
+
+
+class ParseBacklogFull(RuntimeError):
+    """
+    Raised when a user-agent string would have to be parsed while max_pending
+    distinct strings are already waiting for or undergoing a parse.
+    """
+
+
+class AsyncFingerprintResolver():
+    """
+    Serves ClientFingerprint objects to coroutines, parsing uncached strings
+    in a bounded executor and coalescing concurrent parses of the same string.
+    """
+
+    def __init__(self, *, max_workers = 2, max_pending = 256, executor = None):
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be >= 1, not {max_workers!r}")
+        if max_pending < 1:
+            raise ValueError(f"max_pending must be >= 1, not {max_pending!r}")
+
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = executor
+        self._owns_executor = executor is None
+        # Futures are bound to an event loop, so in-flight parses are tracked per loop.
+        self._in_flight_by_loop = weakref.WeakKeyDictionary()
+        self.offloaded = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ua-parse")
+        return self._executor
+
+    async def get_client_fingerprint(self, ua_string):
+        """
+        Returns the ClientFingerprint of ua_string: at once if it is cached,
+        and otherwise once the (possibly shared) parse completes.
+
+        Raises ParseBacklogFull if a new parse is needed but max_pending
+        parses are already pending.
+        """
+
+        if is_fingerprint_cached(ua_string):
+            return get_client_fingerprint(ua_string)
+
+        loop = asyncio.get_running_loop()
+        in_flight = self._in_flight_by_loop.get(loop)
+        if in_flight is None:
+            in_flight = self._in_flight_by_loop[loop] = {}
+
+        future = in_flight.get(ua_string)
+        if future is None:
+            if len(in_flight) >= self.max_pending:
+                self.rejected += 1
+                raise ParseBacklogFull(f"{len(in_flight)} user-agent strings are already being parsed")
+            future = loop.run_in_executor(self._get_executor(), get_client_fingerprint, ua_string)
+            in_flight[ua_string] = future
+            future.add_done_callback(lambda _: in_flight.pop(ua_string, None))
+            self.offloaded += 1
+        else:
+            self.coalesced += 1
+
+        # A waiter that is cancelled must not cancel the parse that other waiters share.
+        fingerprint = await asyncio.shield(future)
+
+        # A parse in another process filled only that process's cache.
+        if not is_fingerprint_cached(ua_string):
+            fingerprint = ua_fingerprint._fingerprint_cache.put(ua_string, fingerprint)
+        return fingerprint
+
+    async def _get_client_fingerprints(self, ua_string_1, ua_string_2, fingerprint_1, fingerprint_2):
+        """
+        Returns the pair of ClientFingerprints of the two strings, keeping a
+        supplied (not None) fingerprint and parsing the strings concurrently
+        if neither is cached.
+        """
+
+        if fingerprint_1 is None:
+            if (fingerprint_2 is None) and not (is_fingerprint_cached(ua_string_1)
+                                                or is_fingerprint_cached(ua_string_2)):
+                return tuple(await asyncio.gather(self.get_client_fingerprint(ua_string_1),
+                                                  self.get_client_fingerprint(ua_string_2)))
+            fingerprint_1 = await self.get_client_fingerprint(ua_string_1)
+        if fingerprint_2 is None:
+            fingerprint_2 = await self.get_client_fingerprint(ua_string_2)
+        return (fingerprint_1, fingerprint_2)
+
+    async def _analyze(self, ua_string_1, ua_string_2, fingerprint_1 = None, fingerprint_2 = None):
+        """
+        The non-strict decision on two differing user-agent strings (given
+        the fingerprints supplied, if any), consulting and filling the memo of
+        pair decisions as the synchronous functions do.
+        """
+
+        # The memo may be turned on or off while this awaits a parse.
+        key = (ua_string_1, ua_string_2)
+        if ua_fingerprint._pair_decisions_enabled:
+            is_compatible = ua_fingerprint._pair_decision_cache.get(key)
+            if is_compatible is not None:
+                return is_compatible
+
+        is_parse_needed = not (((fingerprint_1 is not None) or is_fingerprint_cached(ua_string_1))
+                               and ((fingerprint_2 is not None) or is_fingerprint_cached(ua_string_2)))
+        is_compatible = None
+        if is_parse_needed and ua_fingerprint._lexical_prefilter_enabled:
+            is_compatible = ua_fingerprint._lexical_decision(ua_string_1, ua_string_2)
+        if is_compatible is None:
+            (fingerprint_1, fingerprint_2) = await self._get_client_fingerprints(ua_string_1, ua_string_2,
+                                                                                 fingerprint_1, fingerprint_2)
+            is_compatible = analyze_parsed_fingerprints(fingerprint_1, fingerprint_2)
+
+        if ua_fingerprint._pair_decisions_enabled:
+            ua_fingerprint._pair_decision_cache.put(key, is_compatible)
+        return is_compatible
+
+    async def _compare_instrumented(self, ua_string_1, ua_string_2, strict, fingerprint_1 = None,
+                                    fingerprint_2 = None):
+        """
+        Same decision as the comparison coroutines, by the same route, which
+        it records, with the reason and the latency, in the metrics.
+        """
+
+        metrics = ua_fingerprint._metrics
+        start = perf_counter()
+        is_memoizable = not (strict or (ua_string_1 == ua_string_2)) and ua_fingerprint._pair_decisions_enabled
+        is_compatible = None
+        key = (ua_string_1, ua_string_2)
+        if is_memoizable:
+            is_compatible = ua_fingerprint._pair_decision_cache.get(key)
+
+        if is_compatible is None:
+            decision = ua_fingerprint._decide_with_reason(ua_string_1, ua_string_2, strict, fingerprint_1,
+                                                          fingerprint_2, parse=False)
+            if decision is None:
+                (fingerprint_1, fingerprint_2) = await self._get_client_fingerprints(ua_string_1, ua_string_2,
+                                                                                     fingerprint_1, fingerprint_2)
+                (is_compatible, _, reason, _, _, _) = ua_fingerprint._decide_with_reason(ua_string_1, ua_string_2,
+                                                                                          strict, fingerprint_1,
+                                                                                          fingerprint_2)
+                path = ua_fingerprint._PATH_PARSED
+            else:
+                (is_compatible, path, reason, _, _, _) = decision
+            if is_memoizable:
+                ua_fingerprint._pair_decision_cache.put(key, is_compatible)
+            reason_label = reason.value
+        else:
+            path = ua_fingerprint._PATH_MEMOIZED
+            reason_label = ua_fingerprint._memoized_reason_label(is_compatible)
+
+        if metrics is not None:
+            metrics.record_comparison(path, reason_label, perf_counter() - start)
+        return is_compatible
+
+    async def user_agent_strings_are_compatible(self, ua_string_1, ua_string_2, *, strict = False):
+        """
+        Same decision as `user_agent_strings_are_compatible()`.
+        """
+
+        if ua_fingerprint._metrics is not None:
+            return await self._compare_instrumented(ua_string_1, ua_string_2, strict)
+
+        is_compatible_strictly = user_agent_strings_are_compatible_strictly(ua_string_1, ua_string_2)
+        if strict or is_compatible_strictly:
+            return is_compatible_strictly
+        return await self._analyze(ua_string_1, ua_string_2)
+
+    async def fingerprint_is_compatible(self, baseline_fingerprint, current, *, strict = False):
+        """
+        Same decision as `fingerprint_is_compatible()`.
+        """
+
+        if current.__class__ is str:
+            current_string = current
+            current_fingerprint = None
+        else:
+            current_string = current.string
+            current_fingerprint = current
+
+        if ua_fingerprint._metrics is not None:
+            return await self._compare_instrumented(baseline_fingerprint.string, current_string, strict,
+                                                    baseline_fingerprint, current_fingerprint)
+
+        is_compatible_strictly = user_agent_strings_are_compatible_strictly(baseline_fingerprint.string,
+                                                                            current_string)
+        if strict or is_compatible_strictly:
+            return is_compatible_strictly
+        return await self._analyze(baseline_fingerprint.string, current_string, baseline_fingerprint,
+                                   current_fingerprint)
+
+    def info(self):
+        """
+        Returns a dict of the limits and the counts of parses offloaded,
+        requests coalesced onto an in-flight parse, and requests rejected.
+        """
+
+        return {"max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": sum(len(in_flight) for in_flight in self._in_flight_by_loop.values()),
+                "offloaded": self.offloaded,
+                "coalesced": self.coalesced,
+                "rejected": self.rejected,
+               }
+
+    def shutdown(self):
+        """
+        Shuts down the executor if this resolver created it.
+        """
+
+        if self._owns_executor and (self._executor is not None):
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+_default_resolver = None
+
+
+def _get_default_resolver():
+    global _default_resolver
+
+    if _default_resolver is None:
+        _default_resolver = AsyncFingerprintResolver()
+    return _default_resolver
+
+
+def configure_async_parsing(*, max_workers = 2, max_pending = 256, executor = None):
+    """
+    Replaces the AsyncFingerprintResolver used by the module-level coroutines
+    with one of the supplied limits (see AsyncFingerprintResolver). Parses
+    in flight in the previous resolver complete normally.
+    """
+
+    global _default_resolver
+
+    previous_resolver = _default_resolver
+    _default_resolver = AsyncFingerprintResolver(max_workers=max_workers, max_pending=max_pending,
+                                                 executor=executor)
+    if previous_resolver is not None:
+        previous_resolver.shutdown()
+
+
+def async_parsing_info():
+    """
+    Returns the `info()` dict of the resolver used by the module-level
+    coroutines.
+    """
+
+    return _get_default_resolver().info()
+
+
+async def get_client_fingerprint_async(ua_string):
+    """
+    Coroutine version of `get_client_fingerprint()`.
+    """
+
+    return await _get_default_resolver().get_client_fingerprint(ua_string)
+
+
+async def user_agent_strings_are_compatible_async(ua_string_1, ua_string_2, *, strict = False):
+    """
+    Coroutine version of `user_agent_strings_are_compatible()`; raises
+    ParseBacklogFull if a parse is needed but too many are pending.
+    """
+
+    return await _get_default_resolver().user_agent_strings_are_compatible(ua_string_1, ua_string_2, strict=strict)
+
+
+async def fingerprint_is_compatible_async(baseline_fingerprint, current, *, strict = False):
+    """
+    Coroutine version of `fingerprint_is_compatible()`; raises
+    ParseBacklogFull if a parse is needed but too many are pending.
+    """
+
+    return await _get_default_resolver().fingerprint_is_compatible(baseline_fingerprint, current, strict=strict)
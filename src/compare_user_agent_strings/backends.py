@@ -0,0 +1,210 @@
+"""
+Selects the engine that parses user-agent strings into ClientFingerprints.
+
+Exposes publicly:
+    configure_parser_backend(backend, *, name = None)
+    parser_backend_info()
+    available_parser_backends()
+    resolver_backend(resolver, *, name = None)
+    backend_conformance_mismatches(backend, ua_strings, *,
+                                   reference = "legacy")
+    PARSER_BACKENDS
+
+A backend is a function that takes a user-agent string and returns a dict of
+the form returned by `ua_parser.user_agent_parser.Parse()`. The named
+backends all apply the same uap-core regexes, bundled with ua-parser, and
+differ only in the engine that matches them:
+    "legacy"    `ua_parser.user_agent_parser.Parse()`, the pure-Python regex
+                cascade of ua-parser 0.x (the default)
+    "basic"     ua-parser's newer resolver API, in pure Python
+                (`ua_parser.BasicResolver`)
+    "re2"       the same resolver API on Google's RE2 engine, which matches
+                all the regexes in one pass (pip install ua-parser[re2])
+    "regex"     the same resolver API on a Rust regex-set engine (pip install
+                ua-parser[regex]); in our benchmarks, tens of times faster
+                than "legacy"
+    "best"      the fastest of "regex", "re2", and "basic" that is installed
+A function (e.g., one built with `resolver_backend()` around any other
+ua-parser Resolver) may be passed instead of a name. Its name, which becomes
+part of `parser_signature()` (as "custom:<name>"), must tell it apart from
+every other backend that shares a persistent fingerprint store: it is the
+name= given to `configure_parser_backend()` or `resolver_backend()`, or else
+the function's module and qualified name; a function without a unique
+module-level name (e.g., a lambda or a closure) must be given one.
+
+Every backend must yield the same device, os, and user_agent fields as
+"legacy" does, because the fingerprint cache, the precomputed fingerprints,
+the persistent store, and the lexical prefilter all assume so;
+`backend_conformance_mismatches()` checks a backend against a corpus, and
+tests/test_backends.py checks every installed named backend.
+
+`configure_parser_backend()` empties the in-memory fingerprint cache and the
+memo of pair decisions, so that no entry made by the previous backend
+survives, and the persistent fingerprint store (if any) then serves only the
+entries made under the new backend (whose name is part of
+`parser_signature()`). The setting is per process: worker processes created by fork
+inherit it, but those created by spawn start with "legacy".
+"""
+
+from . import ua_fingerprint
+from . ua_fingerprint import ClientFingerprint
+
+PARSER_BACKENDS = ("legacy", "basic", "re2", "regex", "best")
+
+_DEFAULT_BACKEND = "legacy"
+_backend_name = _DEFAULT_BACKEND
+
+
+def _legacy_parse(ua_string):
+    return (ua_fingerprint._user_agent_parser or ua_fingerprint._load_ua_parser()).Parse(ua_string)
+
+
+def resolver_backend(resolver, *, name = None):
+    """
+    Returns a backend that parses with resolver, a ua-parser Resolver (i.e.,
+    a callable resolver(ua_string, domains) returning a PartialResult),
+    named name (see the module docstring) if it is not None.
+    """
+
+    from ua_parser import Domain
+
+    all_domains = Domain.ALL
+
+    def parse(ua_string):
+        result = resolver(ua_string, all_domains).complete().with_defaults()
+        user_agent = result.user_agent
+        os = result.os
+        device = result.device
+        return {"device": {"brand": device.brand, "family": device.family, "model": device.model},
+                "os": {"family": os.family, "major": os.major, "minor": os.minor, "patch": os.patch,
+                       "patch_minor": os.patch_minor},
+                "string": ua_string,
+                "user_agent": {"family": user_agent.family, "major": user_agent.major, "minor": user_agent.minor,
+                               "patch": user_agent.patch},
+               }
+
+    parse.backend_name = name
+    return parse
+
+
+def _resolver_class(name):
+    """
+    Returns the ua-parser Resolver class behind a named backend, or None if
+    its engine is not installed.
+    """
+
+    import ua_parser
+
+    if name == "basic":
+        return ua_parser.BasicResolver
+    if name == "re2":
+        return ua_parser.Re2Resolver
+    if name == "regex":
+        return ua_parser.RegexResolver
+    return ua_parser.BestAvailableResolver
+
+
+def _build_backend(name):
+    if name not in PARSER_BACKENDS:
+        raise ValueError(f"backend must be one of {PARSER_BACKENDS} or a function, not {name!r}")
+    if name == "legacy":
+        return _legacy_parse
+
+    resolver_class = _resolver_class(name)
+    if resolver_class is None:
+        raise ImportError(f"the {name!r} parser backend is not installed: pip install ua-parser[{name}]")
+
+    from ua_parser import load_builtins, load_lazy_builtins
+
+    # The compiled engines build their own automaton from the patterns, so they need not compile Python regexes.
+    matchers = load_builtins() if name == "basic" else load_lazy_builtins()
+    return resolver_backend(resolver_class(matchers), name=name)
+
+
+def available_parser_backends():
+    """
+    Returns the names of the backends whose engine is installed.
+    """
+
+    return tuple(name for name in PARSER_BACKENDS if (name == "legacy") or (_resolver_class(name) is not None))
+
+
+def _custom_backend_name(backend, name):
+    """
+    Returns the name under which a backend function is configured (see the
+    module docstring).
+    """
+
+    if name is None:
+        name = getattr(backend, "backend_name", None)
+    if name is None:
+        qualified_name = getattr(backend, "__qualname__", None)
+        if (qualified_name is None) or ("<" in qualified_name):
+            raise ValueError(f"the backend function {backend!r} has no unique module-level name; pass name=")
+        name = f"{backend.__module__}.{qualified_name}"
+    return f"custom:{name}"
+
+
+def configure_parser_backend(backend, *, name = None):
+    """
+    Parses all later user-agent strings with backend: one of the names in
+    PARSER_BACKENDS, or a function from a user-agent string to a dict of the
+    form returned by `ua_parser.user_agent_parser.Parse()`, optionally named
+    name (see the module docstring). None restores the default, "legacy".
+
+    Empties the fingerprint cache and the memo of pair decisions, and reopens
+    the persistent fingerprint store (if any), with the options it was
+    configured with, under the new backend's signature.
+
+    Raises ValueError for an unknown name or an unnamed function without a
+    unique module-level name, and ImportError if the named backend's engine
+    is not installed.
+    """
+
+    global _backend_name
+
+    if backend is None:
+        backend = _DEFAULT_BACKEND
+    if callable(backend):
+        (parse, name) = (backend, _custom_backend_name(backend, name))
+    else:
+        (parse, name) = (_build_backend(backend), backend)
+
+    # The default stays on ClientFingerprint's own path to ua_parser, with no extra call.
+    ua_fingerprint._parser_backend = None if parse is _legacy_parse else parse
+    _backend_name = name
+    ua_fingerprint.clear_fingerprint_cache()
+
+    store = ua_fingerprint._persistent_store
+    if store is not None:
+        # Reopened under the signature of the new backend, so that it reads and writes only that backend's entries
+        ua_fingerprint.configure_persistent_fingerprint_cache(store.path, **ua_fingerprint._persistent_store_options)
+
+
+def parser_backend_info():
+    """
+    Returns a dict of the name of the configured backend and the names of
+    the installed ones.
+    """
+
+    return {"backend": _backend_name, "available": available_parser_backends()}
+
+
+def backend_conformance_mismatches(backend, ua_strings, *, reference = "legacy"):
+    """
+    Parses each user-agent string with backend and with reference (each a
+    name or a function, as for `configure_parser_backend()`) and returns the
+    list of (ua_string, reference_fields, backend_fields) for the strings on
+    which the fingerprint fields differ; empty if the backend conforms.
+    """
+
+    parse = backend if callable(backend) else _build_backend(backend)
+    parse_reference = reference if callable(reference) else _build_backend(reference)
+
+    mismatches = []
+    for ua_string in ua_strings:
+        reference_fields = ClientFingerprint.from_parsed(parse_reference(ua_string)).as_dict()
+        backend_fields = ClientFingerprint.from_parsed(parse(ua_string)).as_dict()
+        if backend_fields != reference_fields:
+            mismatches.append((ua_string, reference_fields, backend_fields))
+    return mismatches
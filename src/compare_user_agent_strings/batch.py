@@ -0,0 +1,209 @@
+"""
+Compares many (baseline, current) pairs of user-agent strings in one call.
+
+Exposes publicly:
+    compare_many(pairs, currents = None, *, strict = False, workers = None,
+                 chunksize = 256)
+
+The decision for every pair is exactly the one that
+`user_agent_strings_are_compatible(baseline, current, strict=strict)` would
+return. Compared with calling that function once per pair, `compare_many()`:
+    * decides identical pairs (and, if strict, all pairs) without any function
+      call per pair beyond the string comparison;
+    * collects the distinct user-agent strings that actually need parsing and
+      parses each of them exactly once, however many pairs it appears in; and
+    * returns the answers as a compact bytearray (one byte per pair, 1 for
+      compatible, 0 for incompatible) in input order.
+
+Parsing is pure-Python regex work that holds the GIL, so for large sweeps it
+can be spread over several processes: with workers=N (N > 1), the distinct
+strings not already in the fingerprint cache are split into chunks of
+`chunksize` strings and parsed by a pool of N worker processes, which send
+back compact serialized fingerprints (see `ClientFingerprint.to_bytes()`).
+The pairs are then evaluated in the calling process exactly as in the serial
+path, so the results are identical.
+
+Unless the lexical prefilter is turned off (see
+`configure_lexical_prefilter()`), pairs involving a string that is not in the
+fingerprint cache are first tried on the prefilter, and a string is parsed
+only if some pair it occurs in remains undecided. Fingerprints parsed by the workers are
+not added to the calling process's fingerprint cache.
+
+While metrics are enabled (see metrics.py), every pair is instead decided, in
+this process, by the instrumented twin of the single-pair path, so that each
+is counted by path and reason exactly as a call of
+`user_agent_strings_are_compatible()` would be; workers is then ignored.
+"""
+
+from . import ua_fingerprint
+from . ua_fingerprint import (
+                              ClientFingerprint,
+                              _decide_lexically,
+                              analyze_parsed_fingerprints,
+                              get_client_fingerprint,
+                              is_fingerprint_cached,
+                             )
+
+
+def _as_parallel_lists(pairs, currents):
+    """
+    Normalizes the two accepted input shapes into two lists of equal length:
+        compare_many([(baseline, current), ...])
+        compare_many([baseline, ...], [current, ...])
+    """
+
+    if currents is None:
+        baselines = []
+        currents_list = []
+        for (baseline, current) in pairs:
+            baselines.append(baseline)
+            currents_list.append(current)
+        return (baselines, currents_list)
+
+    baselines = list(pairs)
+    currents_list = list(currents)
+    if len(baselines) != len(currents_list):
+        raise ValueError(f"baselines and currents differ in length: {len(baselines)} != {len(currents_list)}")
+    return (baselines, currents_list)
+
+
+def _serialized_fingerprints(ua_strings):
+    """
+    Runs in a worker process: parses each user-agent string and returns the
+    list of serialized fingerprints.
+    """
+
+    return [get_client_fingerprint(ua_string).to_bytes() for ua_string in ua_strings]
+
+
+def _parse_in_worker_processes(ua_strings, workers, chunksize):
+    """
+    Parses ua_strings in a pool of worker processes.
+
+    Returns a dict from user-agent string to ClientFingerprint.
+    """
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    chunks = [ua_strings[start:start + chunksize] for start in range(0, len(ua_strings), chunksize)]
+    fingerprints = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for (chunk, serialized_chunk) in zip(chunks, executor.map(_serialized_fingerprints, chunks)):
+            for (ua_string, serialized) in zip(chunk, serialized_chunk):
+                fingerprints[ua_string] = ClientFingerprint.from_bytes(serialized)
+    return fingerprints
+
+
+def _decide_lexically_where_uncached(baselines, currents, indices_to_analyze, results):
+    """
+    Sets results[index] for each pair that involves a string not in the
+    fingerprint cache and that the lexical prefilter decides; classifies each
+    such string only once.
+
+    Returns the indices still to be analyzed.
+    """
+
+    classify = ua_fingerprint._load_lexical_classifier()
+    lexical_fingerprints = {}
+
+    def lexical_fingerprint(ua_string):
+        try:
+            return lexical_fingerprints[ua_string]
+        except KeyError:
+            lexical_fingerprints[ua_string] = value = classify(ua_string)
+            return value
+
+    remaining_indices = []
+    for index in indices_to_analyze:
+        baseline = baselines[index]
+        current = currents[index]
+        is_compatible = None
+        if not (is_fingerprint_cached(baseline) and is_fingerprint_cached(current)):
+            lexical_fingerprint_1 = lexical_fingerprint(baseline)
+            if lexical_fingerprint_1 is not None:
+                lexical_fingerprint_2 = lexical_fingerprint(current)
+                if lexical_fingerprint_2 is not None:
+                    is_compatible = _decide_lexically(lexical_fingerprint_1, lexical_fingerprint_2)
+        if is_compatible is None:
+            remaining_indices.append(index)
+        elif is_compatible:
+            results[index] = 1
+    return remaining_indices
+
+
+def compare_many(pairs, currents = None, *, strict = False, workers = None, chunksize = 256):
+    """
+    Compares each (baseline, current) pair of user-agent strings for
+    compatibility, exactly as `user_agent_strings_are_compatible()` would.
+
+    Accepts either
+        pairs       an iterable of (baseline_ua_string, current_ua_string)
+                    tuples, with currents omitted; or
+        pairs       a sequence of baseline user-agent strings, together with
+        currents    a sequence of current user-agent strings of the same length.
+
+    Optional keyword arguments:
+        workers     if greater than 1, the number of worker processes among
+                    which parsing is spread (default: parse in this process)
+        chunksize   the number of user-agent strings sent to a worker at a time
+
+    Returns a bytearray whose i-th byte is 1 if the i-th pair is compatible and
+    0 otherwise. (Use `bool(result[i])` or `list(map(bool, result))` if actual
+    Booleans are needed.)
+    """
+
+    if (workers is not None) and (workers < 1):
+        raise ValueError(f"workers must be None or >= 1, not {workers!r}")
+    if chunksize < 1:
+        raise ValueError(f"chunksize must be >= 1, not {chunksize!r}")
+
+    (baselines, currents) = _as_parallel_lists(pairs, currents)
+
+    number_of_pairs = len(baselines)
+    results = bytearray(number_of_pairs)
+
+    if ua_fingerprint._metrics is not None:
+        compare_instrumented = ua_fingerprint._compare_instrumented
+        for index in range(number_of_pairs):
+            if compare_instrumented(baselines[index], currents[index], strict):
+                results[index] = 1
+        return results
+
+    # First pass: decide every pair that can be decided by string equality alone and remember the others.
+    indices_to_analyze = []
+    for index in range(number_of_pairs):
+        if baselines[index] == currents[index]:
+            results[index] = 1
+        elif not strict:
+            indices_to_analyze.append(index)
+
+    if not indices_to_analyze:
+        return results
+
+    # Decide lexically, without parsing, the pairs in which a string is not cached and the prefilter is certain.
+    if ua_fingerprint._lexical_prefilter_enabled:
+        indices_to_analyze = _decide_lexically_where_uncached(baselines, currents, indices_to_analyze, results)
+        if not indices_to_analyze:
+            return results
+
+    # Parse each distinct user-agent string that occurs in an undecided pair exactly once.
+    distinct_ua_strings = {}
+    for index in indices_to_analyze:
+        distinct_ua_strings[baselines[index]] = None
+        distinct_ua_strings[currents[index]] = None
+
+    if (workers is not None) and (workers > 1):
+        uncached = [ua_string for ua_string in distinct_ua_strings if not is_fingerprint_cached(ua_string)]
+        fingerprints = _parse_in_worker_processes(uncached, workers, chunksize) if uncached else {}
+        for ua_string in distinct_ua_strings:
+            if ua_string not in fingerprints:
+                fingerprints[ua_string] = get_client_fingerprint(ua_string)
+    else:
+        fingerprints = {ua_string: get_client_fingerprint(ua_string) for ua_string in distinct_ua_strings}
+
+    # Second pass: apply the same analysis as the single-pair path to the parsed fingerprints.
+    for index in indices_to_analyze:
+        if analyze_parsed_fingerprints(fingerprints[baselines[index]], fingerprints[currents[index]]):
+            results[index] = 1
+
+    return results
@@ -0,0 +1,644 @@
+"""
+Benchmarks of the parse and compare hot paths, reported as JSON so that
+results can be tracked across releases.
+
+Run with either of:
+    python -m compare_user_agent_strings bench [options]
+    python -m compare_user_agent_strings.benchmarks [options]
+(see `--help`). The suite measures, over a synthetic corpus of realistic
+user-agent strings with a controllable number of distinct strings (see
+`corpus.py`):
+    single_pair_us      latency of one `user_agent_strings_are_compatible()`
+                        call for: identical strings; strict mode with
+                        differing strings; a non-strict accepted upgrade; and
+                        a non-strict rejection (the last two with warm caches)
+    parsing_us          latency of building a fingerprint cold (every parse
+                        cache cleared) and warm (a fingerprint-cache hit)
+    parser_backends     for each installed parser backend (see backends.py),
+                        its set-up time and cold parse latency
+    batch               throughput of `compare_many()` over the session pairs,
+                        starting with cold caches (parsing every string, and
+                        again deciding what it can on the lexical prefilter)
+                        and with warm ones
+    vectorized          (only if NumPy is installed) throughput of
+                        `compare_columns()` over the session pairs, cold and
+                        warm, and of `compare_codes()` on already-factorized
+                        columns
+    memory              bytes retained per stored fingerprint (excluding the
+                        user-agent string itself) and bytes per serialized
+                        fingerprint
+    session_memory      bytes retained per live session (one per session
+                        pair) for keeping each session's baseline as its own
+                        ClientFingerprint versus as an id in a
+                        FingerprintRegistry (see registry.py)
+    session_tracking    for sessions whose user agent is upgraded once, the
+                        fraction of the later requests that take the full
+                        non-strict decision path (rather than string
+                        equality) and the latency per request, comparing
+                        every request with the login-time baseline versus
+                        with a SessionTracker (see session_tracker.py)
+    parallel_scaling    (only with --workers) cold-cache compare_many()
+                        throughput and speedup for each worker count
+    decision_microbenchmark
+                        per-pair latency of the current implementation versus
+                        the frozen original one in `_reference.py`, on the
+                        equal-string, warm-parse, and cold-parse paths, and
+                        of the current one on the cold lexical path
+
+Timings are the best of several runs, in the unit given in each key. Every
+measurement of parsing ("cold" or "parse" in its key) is made with the lexical
+prefilter and the memo of pair decisions off, so that every comparison of
+differing strings that misses the fingerprint cache does parse; the prefilter
+is measured in rows of its own ("lexical" in their key).
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from importlib import metadata
+
+from . __version__ import __version__
+from . _reference import reference_user_agent_strings_are_compatible
+from . batch import compare_many
+from . corpus import generate_session_pairs
+from . import ua_fingerprint
+from . ua_fingerprint import (
+                              ClientFingerprint,
+                              clear_fingerprint_cache,
+                              configure_fingerprint_cache,
+                              configure_lexical_prefilter,
+                              configure_pair_decision_cache,
+                              fingerprint_cache_info,
+                              get_client_fingerprint,
+                              user_agent_strings_are_compatible,
+                             )
+
+BASELINE_UA = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/105.1'
+
+# (current UA, expected result) pairs against BASELINE_UA under strict=False: upgrades and rejections
+DIFFERING_UAS = [
+    ('Mozilla/5.0 (Macintosh; Intel Mac OS X 10.16; rv:104.1) Gecko/20100101 Firefox/105.1', True),
+    ('Mozilla/5.0 (Macintosh; Intel Mac OS X 11.14; rv:104.1) Gecko/20100101 Firefox/105.1', True),
+    ('Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/106.0', True),
+    ('Mozilla/5.0 (Macintosh; Intel Mac OS X 10.14; rv:104.1) Gecko/20100101 Firefox/105.1', False),
+    ('Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/104.2', False),
+    ("Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/105.0.0.0 Safari/537.36", False),
+    ("Mozilla/5.0 (Windows NT 5.1; rv:7.0.1) Gecko/20100101 Firefox/7.0.1", False),
+    ]
+
+
+def clear_all_parse_caches():
+    """
+    Empties the fingerprint cache and ua-parser's own internal parse cache.
+    """
+
+    from ua_parser import user_agent_parser
+
+    clear_fingerprint_cache()
+    user_agent_parser._PARSE_CACHE.clear()
+
+
+def without_parse_shortcuts(measure):
+    """
+    Returns measure() run with the lexical prefilter and the memo of pair
+    decisions off, so that it times parsing rather than the paths that avoid
+    it; both are restored afterwards.
+    """
+
+    pair_decision_cache = ua_fingerprint._pair_decision_cache
+    saved = (ua_fingerprint._lexical_prefilter_enabled, pair_decision_cache.maxsize, pair_decision_cache.policy,
+             ua_fingerprint._pair_decisions_enabled)
+    configure_lexical_prefilter(False)
+    configure_pair_decision_cache(0)
+    try:
+        return measure()
+    finally:
+        (prefilter_enabled, maxsize, policy, pair_decisions_enabled) = saved
+        configure_pair_decision_cache(maxsize, policy=policy)
+        ua_fingerprint._pair_decisions_enabled = pair_decisions_enabled
+        configure_lexical_prefilter(prefilter_enabled)
+
+
+def best_time_per_call(run_once, calls_per_run, *, runs = 5):
+    """
+    Calls run_once() `runs` times; each call is expected to make
+    calls_per_run calls of the function being measured.
+
+    Returns the best (smallest) observed time per measured call, in seconds.
+    """
+
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        run_once()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+    return best / calls_per_run
+
+
+def time_decision_paths(compare, *, loops = 2000, cold_loops = 20):
+    """
+    Times compare(ua_string_1, ua_string_2, strict=False) on the equal-string,
+    warm-parse, and cold-parse paths. Should be run through
+    `without_parse_shortcuts()`, so that the parse paths do parse.
+
+    Returns a dict of microseconds per pair.
+    """
+
+    pairs = [(BASELINE_UA, ua_string) for (ua_string, _) in DIFFERING_UAS]
+
+    def equal_strings():
+        for _ in range(loops):
+            compare(BASELINE_UA, BASELINE_UA, strict=False)
+
+    def parse_warm():
+        for _ in range(loops):
+            for (ua_string_1, ua_string_2) in pairs:
+                compare(ua_string_1, ua_string_2, strict=False)
+
+    def parse_cold():
+        for _ in range(cold_loops):
+            for (ua_string_1, ua_string_2) in pairs:
+                clear_all_parse_caches()
+                compare(ua_string_1, ua_string_2, strict=False)
+
+    for (ua_string, expected) in DIFFERING_UAS:
+        assert compare(BASELINE_UA, ua_string, strict=False) is expected
+
+    return {
+        "equal_strings": 1e6 * best_time_per_call(equal_strings, loops),
+        "parse_warm": 1e6 * best_time_per_call(parse_warm, loops * len(pairs)),
+        "parse_cold": 1e6 * best_time_per_call(parse_cold, cold_loops * len(pairs), runs=3),
+    }
+
+
+def run_decision_microbenchmark():
+    """
+    Returns {"reference": {...}, "current": {...}, "speedup": {...}} with the
+    per-pair latencies of both implementations (see time_decision_paths()).
+    """
+
+    reference = time_decision_paths(reference_user_agent_strings_are_compatible)
+    current = without_parse_shortcuts(lambda: time_decision_paths(user_agent_strings_are_compatible))
+    speedup = {path: reference[path] / current[path] for path in current}
+    # The cold-parse pairs again, with the prefilter and the memo left as configured
+    lexical_cold = time_decision_paths(user_agent_strings_are_compatible, loops=1)["parse_cold"]
+
+    return {"unit": "microseconds per pair", "reference": reference, "current": current, "speedup": speedup,
+            "current_lexical_cold": lexical_cold}
+
+
+def _environment():
+    try:
+        ua_parser_version = metadata.version("ua-parser")
+    except metadata.PackageNotFoundError:
+        ua_parser_version = None
+    return {
+        "package_version": __version__,
+        "ua_parser_version": ua_parser_version,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def _classify_pairs(pairs):
+    """
+    Splits the distinct differing pairs into non-strict accepted and rejected ones.
+    """
+
+    accepted = []
+    rejected = []
+    for pair in dict.fromkeys(pairs):
+        (ua_string_1, ua_string_2) = pair
+        if ua_string_1 == ua_string_2:
+            continue
+        if user_agent_strings_are_compatible(ua_string_1, ua_string_2):
+            accepted.append(pair)
+        else:
+            rejected.append(pair)
+    return (accepted, rejected)
+
+
+def _time_pairs(pairs, *, strict, loops):
+    # Microseconds per call of user_agent_strings_are_compatible() over pairs
+    if not pairs:
+        return None
+
+    def run_once():
+        for _ in range(loops):
+            for (ua_string_1, ua_string_2) in pairs:
+                user_agent_strings_are_compatible(ua_string_1, ua_string_2, strict=strict)
+
+    return 1e6 * best_time_per_call(run_once, loops * len(pairs))
+
+
+def measure_single_pair_latency(pairs, *, loops = 20):
+    """
+    Returns the per-call latency, in microseconds, of identical strings, of
+    strict mode with differing strings, and of warm non-strict accepted
+    upgrades and rejections.
+    """
+
+    (accepted, rejected) = _classify_pairs(pairs)
+    accepted = accepted[:500]
+    rejected = rejected[:500]
+    equal = [(ua_string, ua_string) for (ua_string, _) in (accepted + rejected)[:500]]
+
+    # Warm the fingerprint cache so that the non-strict timings are those of the decision.
+    for (ua_string_1, ua_string_2) in accepted + rejected:
+        get_client_fingerprint(ua_string_1)
+        get_client_fingerprint(ua_string_2)
+
+    return {
+        "equal_strings": _time_pairs(equal, strict=False, loops=loops),
+        "strict_differing": _time_pairs(rejected, strict=True, loops=loops),
+        "non_strict_upgrade": _time_pairs(accepted, strict=False, loops=loops),
+        "non_strict_rejection": _time_pairs(rejected, strict=False, loops=loops),
+        "accepted_pairs_timed": len(accepted),
+        "rejected_pairs_timed": len(rejected),
+    }
+
+
+def measure_parsing_latency(ua_strings, *, warm_loops = 20):
+    """
+    Returns the latency, in microseconds, of building a ClientFingerprint from
+    scratch (cold) and of looking one up in the fingerprint cache (warm).
+    """
+
+    from ua_parser import user_agent_parser
+
+    def cold():
+        for ua_string in ua_strings:
+            user_agent_parser._PARSE_CACHE.clear()
+            ClientFingerprint(ua_string)
+
+    for ua_string in ua_strings:
+        get_client_fingerprint(ua_string)
+
+    def warm():
+        for _ in range(warm_loops):
+            for ua_string in ua_strings:
+                get_client_fingerprint(ua_string)
+
+    return {
+        "cold": 1e6 * best_time_per_call(cold, len(ua_strings), runs=2),
+        "warm": 1e6 * best_time_per_call(warm, warm_loops * len(ua_strings)),
+        "strings_timed": len(ua_strings),
+    }
+
+
+def measure_parser_backends(ua_strings):
+    """
+    Returns, for each installed parser backend, the seconds taken to set it
+    up and the latency, in microseconds, of parsing a user-agent string cold.
+    """
+
+    from ua_parser import user_agent_parser
+
+    from . backends import _build_backend, available_parser_backends
+
+    by_backend = {}
+    for name in available_parser_backends():
+        start = time.perf_counter()
+        parse = _build_backend(name)
+        parse(BASELINE_UA)
+        setup_seconds = time.perf_counter() - start
+
+        def cold():
+            for ua_string in ua_strings:
+                user_agent_parser._PARSE_CACHE.clear()
+                parse(ua_string)
+
+        by_backend[name] = {"setup_seconds": setup_seconds,
+                            "cold_parse_us": 1e6 * best_time_per_call(cold, len(ua_strings), runs=2)}
+    return by_backend
+
+
+def _cold_seconds(compare):
+    """
+    Returns the seconds taken by compare() starting from cold caches.
+    """
+
+    clear_all_parse_caches()
+    start = time.perf_counter()
+    compare()
+    return time.perf_counter() - start
+
+
+def measure_batch_throughput(pairs):
+    """
+    Returns compare_many() throughput, in pairs per second, starting from cold
+    caches (with the prefilter and the memo off, and again with them as
+    configured) and again with warm ones.
+    """
+
+    cold_seconds = without_parse_shortcuts(lambda: _cold_seconds(lambda: compare_many(pairs)))
+    cold_lexical_seconds = _cold_seconds(lambda: compare_many(pairs))
+
+    warm_seconds = best_time_per_call(lambda: compare_many(pairs), 1, runs=3)
+
+    return {
+        "pairs": len(pairs),
+        "cold_pairs_per_second": len(pairs) / cold_seconds,
+        "cold_lexical_pairs_per_second": len(pairs) / cold_lexical_seconds,
+        "warm_pairs_per_second": len(pairs) / warm_seconds,
+    }
+
+
+def measure_vectorized_throughput(pairs):
+    """
+    Returns the throughput, in pairs per second, of compare_columns() starting
+    from cold caches (with the prefilter and the memo off) and again with warm
+    ones, and of compare_codes() on the
+    same columns already factorized; or None if NumPy is not installed.
+    """
+
+    try:
+        from . vectorized import _factorize, compare_codes, compare_columns
+    except ImportError:
+        return None
+
+    baselines = [baseline for (baseline, _) in pairs]
+    currents = [current for (_, current) in pairs]
+
+    cold_seconds = without_parse_shortcuts(lambda: _cold_seconds(lambda: compare_columns(baselines, currents)))
+
+    warm_seconds = best_time_per_call(lambda: compare_columns(baselines, currents), 1, runs=3)
+
+    index = {}
+    (baseline_codes, current_codes) = (_factorize(baselines, index), _factorize(currents, index))
+    categories = list(index)
+    codes_seconds = best_time_per_call(lambda: compare_codes(baseline_codes, current_codes, categories), 1, runs=3)
+
+    return {
+        "pairs": len(pairs),
+        "cold_pairs_per_second": len(pairs) / cold_seconds,
+        "warm_pairs_per_second": len(pairs) / warm_seconds,
+        "factorized_pairs_per_second": len(pairs) / codes_seconds,
+    }
+
+
+def measure_parallel_scaling(pairs, worker_counts, *, chunksize = 64):
+    """
+    Returns, for each worker count, the throughput of compare_many() starting
+    from cold caches, with the prefilter and the memo off (so that parsing
+    dominates), and the speedup relative to the first worker count.
+    """
+
+    os_cpu_count = os.cpu_count()
+    by_workers = {}
+    for workers in worker_counts:
+        seconds = without_parse_shortcuts(
+            lambda: _cold_seconds(lambda: compare_many(pairs, workers=workers, chunksize=chunksize)))
+        by_workers[str(workers)] = {"seconds": seconds, "pairs_per_second": len(pairs) / seconds}
+
+    first = by_workers[str(worker_counts[0])]["seconds"]
+    for timing in by_workers.values():
+        timing["speedup"] = first / timing["seconds"]
+
+    return {"pairs": len(pairs), "chunksize": chunksize, "cpu_count": os_cpu_count, "by_workers": by_workers}
+
+
+def measure_memory_per_fingerprint(ua_strings):
+    """
+    Returns the bytes retained per ClientFingerprint (the user-agent strings
+    themselves, which the caller holds anyway, are not counted) and the mean
+    size of the serialized form. The figure is a steady-state one: identity
+    and version tuples already shared with earlier fingerprints are not
+    counted again.
+    """
+
+    from ua_parser import user_agent_parser
+
+    user_agent_parser._PARSE_CACHE.clear()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        fingerprints = []
+        for ua_string in ua_strings:
+            fingerprints.append(ClientFingerprint(ua_string))
+            user_agent_parser._PARSE_CACHE.clear()
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+    serialized_bytes = sum(len(fingerprint.to_bytes()) for fingerprint in fingerprints)
+
+    return {
+        "bytes_per_fingerprint": retained / len(fingerprints),
+        "serialized_bytes_per_fingerprint": serialized_bytes / len(fingerprints),
+        "fingerprints_measured": len(fingerprints),
+    }
+
+
+def _retained_bytes(build):
+    """
+    Returns (the object built by build(), the bytes it retains).
+    """
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        built = build()
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    return (built, retained)
+
+
+def measure_memory_per_session(baseline_ua_strings):
+    """
+    Returns the bytes retained per session, for one session per baseline
+    user-agent string, when each session keeps:
+        fingerprint     its own ClientFingerprint, restored from the
+                        serialized form stored in the session record
+        registry_id     the id of its baseline in a FingerprintRegistry,
+                        in an array("I"), plus its share of the registry
+    The user-agent strings themselves are not counted.
+    """
+
+    from array import array
+
+    from . registry import FingerprintRegistry
+
+    serialized = {ua_string: get_client_fingerprint(ua_string).to_bytes() for ua_string in baseline_ua_strings}
+    sessions = len(baseline_ua_strings)
+
+    def fingerprint_per_session():
+        return [ClientFingerprint.from_bytes(serialized[ua_string]) for ua_string in baseline_ua_strings]
+
+    def registry_id_per_session():
+        registry = FingerprintRegistry()
+        return (registry, array("I", [registry.intern(ua_string) for ua_string in baseline_ua_strings]))
+
+    (_, fingerprint_bytes) = _retained_bytes(fingerprint_per_session)
+    ((registry, _), registry_bytes) = _retained_bytes(registry_id_per_session)
+
+    return {
+        "sessions": sessions,
+        "distinct_baselines": len(registry),
+        "fingerprint_bytes_per_session": fingerprint_bytes / sessions,
+        "registry_id_bytes_per_session": registry_bytes / sessions,
+    }
+
+
+def measure_session_tracking(pairs, *, requests_per_session = 10):
+    """
+    For each pair (baseline, current) whose current string is a
+    non-strictly compatible upgrade, replays a session that logs in with
+    baseline and then makes requests_per_session requests with current.
+
+    Returns, for the stateless check against the login-time baseline (a
+    SessionUserAgentChecker) and for a SessionTracker, the fraction of those
+    requests that took the full non-strict decision path, counted from the
+    verdicts of each, and the latency per request, in microseconds (with warm
+    fingerprint caches).
+    """
+
+    from . middleware import IDENTICAL, SessionUserAgentChecker
+    from . session_tracker import SessionTracker
+
+    upgrades = [(baseline, current) for (baseline, current) in pairs
+                if (baseline != current) and user_agent_strings_are_compatible(baseline, current)]
+    requests = len(upgrades) * requests_per_session
+    if not requests:
+        return None
+
+    def stateless_once():
+        checker = SessionUserAgentChecker({})
+        verdict_counts = dict.fromkeys(checker.verdict_counts, 0)
+        for (session_id, (baseline, current)) in enumerate(upgrades):
+            checker.record_baseline(session_id, baseline)
+            for _ in range(requests_per_session):
+                verdict_counts[checker.check(session_id, False, current)] += 1
+        return verdict_counts
+
+    def tracker_once():
+        tracker = SessionTracker()
+        for (session_id, (baseline, current)) in enumerate(upgrades):
+            tracker.observe(session_id, baseline)
+            for _ in range(requests_per_session):
+                tracker.observe(session_id, current)
+        return tracker.verdict_counts
+
+    # Requests answered other than by string equality with the baseline took the full path.
+    stateless_full_path_requests = requests - stateless_once()[IDENTICAL]
+    tracker_full_path_requests = requests - tracker_once()[IDENTICAL]
+
+    return {
+        "upgraded_sessions": len(upgrades),
+        "requests_per_session": requests_per_session,
+        # Each time per request includes the sessions' logins.
+        "stateless": {"full_path_fraction": stateless_full_path_requests / requests,
+                      "us_per_request": 1e6 * best_time_per_call(stateless_once, requests, runs=3)},
+        "session_tracker": {"full_path_fraction": tracker_full_path_requests / requests,
+                            "us_per_request": 1e6 * best_time_per_call(tracker_once, requests, runs=3)},
+    }
+
+
+def run_benchmark_suite(*, distinct = 2000, pairs = 100000, seed = 0, include_reference = True,
+                        worker_counts = None):
+    """
+    Runs every benchmark over a synthetic corpus and returns the results as a
+    JSON-serializable dict.
+    """
+
+    session_pairs = generate_session_pairs(pairs, distinct=distinct, seed=seed)
+    ua_strings = list(dict.fromkeys(ua_string for pair in session_pairs for ua_string in pair))
+
+    # The suite must measure parsing, not cache thrashing.
+    saved_maxsize = fingerprint_cache_info().maxsize
+    configure_fingerprint_cache(max(saved_maxsize or 0, 2 * distinct))
+    try:
+        clear_all_parse_caches()
+        results = {
+            "single_pair_us": measure_single_pair_latency(session_pairs),
+            "parsing_us": measure_parsing_latency(ua_strings[:300]),
+            "parser_backends": measure_parser_backends(ua_strings[:300]),
+            "batch": measure_batch_throughput(session_pairs),
+            "memory": measure_memory_per_fingerprint(ua_strings[:2000]),
+            "session_memory": measure_memory_per_session([baseline for (baseline, _) in session_pairs]),
+            "session_tracking": measure_session_tracking(session_pairs[:20000]),
+        }
+        vectorized = measure_vectorized_throughput(session_pairs)
+        if vectorized is not None:
+            results["vectorized"] = vectorized
+        if worker_counts:
+            results["parallel_scaling"] = measure_parallel_scaling(session_pairs, worker_counts)
+        if include_reference:
+            results["decision_microbenchmark"] = run_decision_microbenchmark()
+    finally:
+        configure_fingerprint_cache(saved_maxsize)
+        clear_all_parse_caches()
+
+    return {
+        "environment": _environment(),
+        "parameters": {"distinct": distinct, "pairs": pairs, "seed": seed,
+                       "distinct_strings_in_pairs": len(ua_strings)},
+        "results": results,
+    }
+
+
+def _worker_counts(text):
+    try:
+        worker_counts = [int(count) for count in text.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected comma-separated integers, not {text!r}") from None
+    if any(count < 1 for count in worker_counts):
+        raise argparse.ArgumentTypeError("worker counts must be >= 1")
+    return worker_counts
+
+
+def build_argument_parser(parser = None):
+    """
+    Adds the benchmark options to parser (or to a new ArgumentParser).
+    """
+
+    if parser is None:
+        parser = argparse.ArgumentParser(prog="python -m compare_user_agent_strings.benchmarks",
+                                         description="Benchmark the parse and compare hot paths; print JSON.")
+    parser.add_argument("--distinct", type=int, default=2000,
+                        help="number of distinct user-agent strings in the synthetic corpus (default: 2000)")
+    parser.add_argument("--pairs", type=int, default=100000,
+                        help="number of (baseline, current) session pairs (default: 100000)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the corpus (default: 0)")
+    parser.add_argument("--no-reference", action="store_true",
+                        help="skip the comparison with the frozen original implementation")
+    parser.add_argument("--workers", type=_worker_counts, default=None, metavar="N[,N...]",
+                        help="also measure compare_many() with these numbers of worker processes, e.g. 1,2,4,8")
+    parser.add_argument("--output", "-o", default="-", help="file to write the JSON results to (default: stdout)")
+    return parser
+
+
+def run_from_arguments(arguments):
+    results = run_benchmark_suite(distinct=arguments.distinct, pairs=arguments.pairs, seed=arguments.seed,
+                                  include_reference=not arguments.no_reference,
+                                  worker_counts=arguments.workers)
+    if arguments.output == "-":
+        json.dump(results, sys.stdout, indent=4)
+        print()
+    else:
+        with open(arguments.output, "w", encoding="utf-8") as output_file:
+            json.dump(results, output_file, indent=4)
+            output_file.write("\n")
+    return 0
+
+
+def main(argv = None):
+    return run_from_arguments(build_argument_parser().parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+Provides a size-bounded, thread-safe mapping used to memoize expensive
+computations keyed by strings (e.g., parsing a user-agent string into a
+`ClientFingerprint`).
+
+Exposes publicly:
+    BoundedCache(maxsize=4096, *, policy="lru")
+    CacheInfo
+
+The counters mirror those of `functools.lru_cache().cache_info()`, with the
+addition of an eviction counter:
+    CacheInfo(hits, misses, evictions, maxsize, currsize)
+
+Two eviction policies are supported:
+    "lru"   when full, evict the least-recently *used* entry. (A hit moves the
+            entry to the most-recent end.)
+    "fifo"  when full, evict the least-recently *inserted* entry. (A hit does
+            not reorder the entries, which makes hits slightly cheaper.)
+
+maxsize=None means “unbounded”; maxsize=0 disables caching altogether (every
+lookup is a miss and nothing is stored).
+"""
+
+import threading
+from collections import OrderedDict, namedtuple
+
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "evictions", "maxsize", "currsize"])
+
+EVICTION_POLICIES = ("lru", "fifo")
+
+# Distinguishes a missing key from a stored None without the cost of raising KeyError on every miss
+_MISSING = object()
+
+
+class BoundedCache():
+    """
+    A size-bounded mapping from key to value with LRU or FIFO eviction.
+
+    All operations are protected by a lock, so a single instance can be shared
+    by all threads of a process. The value factory passed to
+    `get_or_create()` is called *outside* the lock, so that a slow computation
+    for one key does not block lookups of other keys. (Two threads that miss on
+    the same key at the same moment may therefore both compute the value; the
+    first one stored wins.)
+    """
+
+    def __init__(self, maxsize=4096, *, policy="lru"):
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"policy must be one of {EVICTION_POLICIES}, not {policy!r}")
+        if (maxsize is not None) and (maxsize < 0):
+            raise ValueError(f"maxsize must be None or >= 0, not {maxsize!r}")
+
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self._maxsize = maxsize
+        self._policy = policy
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def maxsize(self):
+        return self._maxsize
+
+    @property
+    def policy(self):
+        return self._policy
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        # Does not count as a hit or miss and does not reorder.
+        return key in self._data
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value for key (counting a hit) or default (counting
+        a miss).
+        """
+
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self._misses += 1
+                return default
+            self._hits += 1
+            if self._policy == "lru":
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        """
+        Stores value under key, evicting the oldest entries if the cache is
+        full. Returns the value actually stored under key (which is the
+        previously stored value if key was already present).
+        """
+
+        with self._lock:
+            return self._put_locked(key, value)
+
+    def get_or_create(self, key, factory):
+        """
+        Returns the cached value for key; on a miss, computes factory(key),
+        stores it, and returns it.
+        """
+
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is not _MISSING:
+                self._hits += 1
+                if self._policy == "lru":
+                    self._data.move_to_end(key)
+                return value
+            self._misses += 1
+
+        value = factory(key)
+
+        with self._lock:
+            return self._put_locked(key, value)
+
+    def _put_locked(self, key, value):
+        maxsize = self._maxsize
+        if maxsize == 0:
+            return value
+
+        data = self._data
+        if key in data:
+            return data[key]
+
+        data[key] = value
+        if (maxsize is not None) and (len(data) > maxsize):
+            data.popitem(last=False)
+            self._evictions += 1
+        return value
+
+    def resize(self, maxsize):
+        """
+        Changes the capacity, evicting the oldest entries if the cache now
+        holds more than maxsize entries.
+        """
+
+        if (maxsize is not None) and (maxsize < 0):
+            raise ValueError(f"maxsize must be None or >= 0, not {maxsize!r}")
+
+        with self._lock:
+            self._maxsize = maxsize
+            if maxsize is None:
+                return
+            data = self._data
+            while len(data) > maxsize:
+                data.popitem(last=False)
+                self._evictions += 1
+
+    def cache_info(self):
+        """
+        Returns a CacheInfo(hits, misses, evictions, maxsize, currsize) snapshot.
+        """
+
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._evictions, self._maxsize, len(self._data))
+
+    def cache_clear(self):
+        """
+        Removes all entries and resets the counters.
+        """
+
+        with self._lock:
+            self._data.clear()
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
@@ -0,0 +1,389 @@
+"""
+Generates synthetic, realistic user-agent strings and (baseline, current)
+session pairs, for benchmarks and tests.
+
+Exposes publicly:
+    UserAgentProfile
+    random_profile(random_generator)
+    generate_user_agent_strings(distinct, *, seed = 0)
+    generate_session_pairs(number_of_pairs, *, distinct = 1000, seed = 0,
+                           equal_fraction = 0.9, same_lineage_fraction = 0.07)
+    generate_differential_pairs(number_of_pairs, *, distinct = 800, seed = 0)
+    DIFFERENTIAL_PAIR_KINDS
+
+Every user-agent string is rendered from a template (desktop Firefox, Chrome,
+Edge and Safari; mobile Safari and Chrome; old Internet Explorer) and a set
+of integer parameters (e.g., os_major, ua_major). Strings rendered from the
+same template and the same non-version parameters (e.g., the Android device
+model) form a *lineage*: they differ only in version numbers, like successive
+releases installed on one machine.
+
+`generate_user_agent_strings(distinct)` returns exactly `distinct` distinct
+strings, grouped in lineages of one to four versions each, so that the
+cardinality of a benchmark corpus is controlled exactly.
+
+`generate_session_pairs()` draws baseline strings from such a corpus with a
+Zipf-like popularity (a few strings dominate, as in real traffic) and pairs
+each with a current string that is:
+    * the same string, with probability equal_fraction;
+    * another version in the same lineage (an upgrade or a downgrade), with
+      probability same_lineage_fraction; or
+    * an arbitrary other string of the corpus, otherwise.
+
+`generate_differential_pairs()` instead aims at the edges of the decision
+rule, for differential tests of the optimized code paths against the original
+implementation (see differential.py). It adds edge-case templates that are
+never drawn for realistic traffic (Firefox on every Windows NT version from
+XP, whose OS major versions are the non-numeric "XP" and "Vista"; macOS with
+no OS minor version; command-line tools with and without a minor version),
+and pairs each baseline with a variant of a given kind (see
+DIFFERENTIAL_PAIR_KINDS).
+"""
+
+import random
+from collections import namedtuple
+
+
+# Each template is (name, relative weight in traffic, format string, {parameter: (low, high)}, non-version parameters).
+# Version parameters are bumped to produce successive versions within a lineage.
+_TEMPLATES = [
+    ("firefox_mac", 6,
+     "Mozilla/5.0 (Macintosh; Intel Mac OS X {os_major}.{os_minor}; rv:{ua_major}.0) Gecko/20100101 Firefox/{ua_major}.{ua_minor}",
+     {"os_major": (10, 14), "os_minor": (9, 15), "ua_major": (90, 130), "ua_minor": (0, 3)},
+     ()),
+    ("firefox_windows", 10,
+     "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:{ua_major}.0) Gecko/20100101 Firefox/{ua_major}.{ua_minor}",
+     {"ua_major": (90, 130), "ua_minor": (0, 3)},
+     ()),
+    ("firefox_linux", 3,
+     "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:{ua_major}.0) Gecko/20100101 Firefox/{ua_major}.{ua_minor}",
+     {"ua_major": (90, 130), "ua_minor": (0, 3)},
+     ()),
+    ("chrome_mac", 12,
+     "Mozilla/5.0 (Macintosh; Intel Mac OS X {os_major}_{os_minor}_{os_patch}) AppleWebKit/537.36 (KHTML, like Gecko) "
+     "Chrome/{ua_major}.0.{ua_build}.{ua_patch} Safari/537.36",
+     {"os_major": (10, 14), "os_minor": (11, 15), "os_patch": (0, 7), "ua_major": (90, 130), "ua_build": (4000, 6800),
+      "ua_patch": (0, 200)},
+     ()),
+    ("chrome_windows", 30,
+     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+     "Chrome/{ua_major}.0.{ua_build}.{ua_patch} Safari/537.36",
+     {"ua_major": (90, 130), "ua_build": (4000, 6800), "ua_patch": (0, 200)},
+     ()),
+    ("chrome_linux", 3,
+     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+     "Chrome/{ua_major}.0.{ua_build}.{ua_patch} Safari/537.36",
+     {"ua_major": (90, 130), "ua_build": (4000, 6800), "ua_patch": (0, 200)},
+     ()),
+    ("edge_windows", 8,
+     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+     "Chrome/{ua_major}.0.0.0 Safari/537.36 Edg/{ua_major}.0.{ua_build}.{ua_patch}",
+     {"ua_major": (90, 130), "ua_build": (1000, 2900), "ua_patch": (0, 100)},
+     ()),
+    ("safari_mac", 8,
+     "Mozilla/5.0 (Macintosh; Intel Mac OS X {os_major}_{os_minor}_{os_patch}) AppleWebKit/605.1.15 "
+     "(KHTML, like Gecko) Version/{ua_major}.{ua_minor} Safari/605.1.15",
+     {"os_major": (10, 10), "os_minor": (13, 15), "os_patch": (0, 7), "ua_major": (13, 17), "ua_minor": (0, 6)},
+     ()),
+    ("safari_iphone", 12,
+     "Mozilla/5.0 (iPhone; CPU iPhone OS {os_major}_{os_minor} like Mac OS X) AppleWebKit/605.1.15 "
+     "(KHTML, like Gecko) Version/{ua_major}.{ua_minor} Mobile/15E148 Safari/604.1",
+     {"os_major": (13, 17), "os_minor": (0, 7), "ua_major": (13, 17), "ua_minor": (0, 6)},
+     ()),
+    ("chrome_android", 12,
+     "Mozilla/5.0 (Linux; Android {os_major}; {device_model}) AppleWebKit/537.36 (KHTML, like Gecko) "
+     "Chrome/{ua_major}.0.{ua_build}.{ua_patch} Mobile Safari/537.36",
+     {"os_major": (9, 14), "ua_major": (90, 130), "ua_build": (4000, 6800), "ua_patch": (0, 200),
+      "device_model": (0, 11)},
+     ("device_model",)),
+    ("internet_explorer", 1,
+     "Mozilla/4.0 (compatible; MSIE {ua_major}.0; Windows NT {windows_nt}; SV1)",
+     {"ua_major": (6, 8), "windows_nt": (0, 2)},
+     ("windows_nt",)),
+    ]
+
+# Templates of the edge cases of the decision rule, used only by generate_differential_pairs(); same form as above
+_EDGE_CASE_TEMPLATES = [
+    # OS major "XP", "Vista", 7, 8, 8 (with minor 1), 10: non-numeric versions, and mixes of numeric and non-numeric
+    ("firefox_windows_nt", 3,
+     "Mozilla/5.0 (Windows NT {windows_nt}; rv:{ua_major}.0) Gecko/20100101 Firefox/{ua_major}.{ua_minor}",
+     {"windows_nt": (0, 5), "ua_major": (40, 60), "ua_minor": (0, 3)},
+     ()),
+    # No OS version at all: the twin of firefox_mac with missing OS components
+    ("firefox_mac_no_os_minor", 1,
+     "Mozilla/5.0 (Macintosh; Intel Mac OS X {os_major}; rv:{ua_major}.0) Gecko/20100101 Firefox/{ua_major}.{ua_minor}",
+     {"os_major": (10, 14), "ua_major": (90, 130), "ua_minor": (0, 3)},
+     ()),
+    ("curl", 1, "curl/{ua_major}.{ua_minor}.{ua_patch}", {"ua_major": (7, 8), "ua_minor": (60, 90), "ua_patch": (0, 3)},
+     ()),
+    # No user-agent minor version: the twin of curl
+    ("curl_no_minor", 1, "curl/{ua_major}", {"ua_major": (7, 8)}, ()),
+    ("wget", 1, "Wget/{ua_major}.{ua_minor}", {"ua_major": (1, 2), "ua_minor": (18, 24)}, ()),
+    ("wget_no_minor", 1, "Wget/{ua_major}", {"ua_major": (1, 2)}, ()),
+    ]
+
+# Pairs of templates rendering the same client with and without a minor version component
+_MISSING_MINOR_TWINS = {"firefox_mac": "firefox_mac_no_os_minor", "firefox_mac_no_os_minor": "firefox_mac",
+                        "curl": "curl_no_minor", "curl_no_minor": "curl",
+                        "wget": "wget_no_minor", "wget_no_minor": "wget"}
+
+# Rendered values of the non-numeric parameters, indexed by the integer parameter
+_PARAMETER_VALUES = {
+    "device_model": ["SM-G991B", "SM-A515F", "SM-S908U", "Pixel 6", "Pixel 7 Pro", "Pixel 4a", "Moto G (5S)",
+                     "Redmi Note 8 Pro", "M2101K6G", "CPH1803", "ONEPLUS A6013", "LM-Q720"],
+    "windows_nt": ["5.1", "6.0", "6.1", "6.2", "6.3", "10.0"],
+}
+
+_TEMPLATES_BY_NAME = {template[0]: template for template in _TEMPLATES + _EDGE_CASE_TEMPLATES}
+_TEMPLATE_NAMES = [template[0] for template in _TEMPLATES]
+_TEMPLATE_WEIGHTS = [template[1] for template in _TEMPLATES]
+
+
+class UserAgentProfile(namedtuple("UserAgentProfile", ["template", "parameters"])):
+    """
+    A template name and a tuple of sorted (parameter, int value) items, from
+    which a user-agent string is rendered.
+    """
+
+    __slots__ = ()
+
+    def render(self):
+        (_, _, format_string, _, _) = _TEMPLATES_BY_NAME[self.template]
+        values = {}
+        for (parameter, value) in self.parameters:
+            rendered_values = _PARAMETER_VALUES.get(parameter)
+            values[parameter] = value if rendered_values is None else rendered_values[value]
+        return format_string.format(**values)
+
+    def lineage(self):
+        """
+        Returns the key shared by all versions of this profile: the template
+        and its non-version parameters.
+        """
+
+        non_version_parameters = _TEMPLATES_BY_NAME[self.template][4]
+        return (self.template,) + tuple(item for item in self.parameters if item[0] in non_version_parameters)
+
+    def version_parameters(self):
+        non_version_parameters = _TEMPLATES_BY_NAME[self.template][4]
+        return [parameter for (parameter, _) in self.parameters if parameter not in non_version_parameters]
+
+    def with_parameter(self, parameter, value):
+        return UserAgentProfile(self.template,
+                                tuple((name, value if name == parameter else old_value)
+                                      for (name, old_value) in self.parameters))
+
+
+def random_profile(random_generator, template = None):
+    """
+    Returns a UserAgentProfile with a template chosen by traffic weight (unless
+    template is given) and random parameter values within realistic ranges.
+    """
+
+    if template is None:
+        template = random_generator.choices(_TEMPLATE_NAMES, weights=_TEMPLATE_WEIGHTS)[0]
+    parameter_ranges = _TEMPLATES_BY_NAME[template][3]
+    parameters = tuple(sorted((parameter, random_generator.randint(low, high))
+                              for (parameter, (low, high)) in parameter_ranges.items()))
+    return UserAgentProfile(template, parameters)
+
+
+def _bumped(profile, random_generator):
+    # One step of a plausible upgrade: a browser release, now and then an OS release.
+    version_parameters = profile.version_parameters()
+    ua_parameters = [parameter for parameter in version_parameters if parameter.startswith("ua_")]
+    os_parameters = [parameter for parameter in version_parameters if parameter.startswith("os_")]
+    if os_parameters and (random_generator.random() < 0.3):
+        parameter = random_generator.choice(os_parameters)
+    else:
+        parameter = random_generator.choice(ua_parameters)
+    value = dict(profile.parameters)[parameter]
+    return profile.with_parameter(parameter, value + random_generator.randint(1, 3))
+
+
+def _generate_lineages(distinct, random_generator):
+    """
+    Returns a list of lineages (lists of distinct user-agent strings, oldest
+    version first) holding exactly `distinct` strings in total.
+    """
+
+    seen = set()
+    lineages = []
+    remaining = distinct
+    attempts = 0
+    while remaining > 0:
+        attempts += 1
+        if attempts > 100 * distinct + 1000:
+            raise ValueError(f"cannot generate {distinct} distinct user-agent strings from the templates")
+
+        profile = random_profile(random_generator)
+        lineage = []
+        for _ in range(min(remaining, random_generator.randint(1, 4))):
+            ua_string = profile.render()
+            if ua_string in seen:
+                break
+            seen.add(ua_string)
+            lineage.append(ua_string)
+            profile = _bumped(profile, random_generator)
+        if lineage:
+            lineages.append(lineage)
+            remaining -= len(lineage)
+    return lineages
+
+
+def generate_user_agent_strings(distinct, *, seed = 0):
+    """
+    Returns a list of exactly `distinct` distinct, realistic user-agent strings.
+    """
+
+    random_generator = random.Random(seed)
+    return [ua_string for lineage in _generate_lineages(distinct, random_generator) for ua_string in lineage]
+
+
+def generate_session_pairs(number_of_pairs, *, distinct = 1000, seed = 0,
+                           equal_fraction = 0.9, same_lineage_fraction = 0.07):
+    """
+    Returns a list of number_of_pairs (baseline, current) user-agent string
+    pairs drawn from a corpus of `distinct` strings (see the module docstring).
+    """
+
+    random_generator = random.Random(seed)
+    lineages = _generate_lineages(distinct, random_generator)
+
+    corpus = []
+    lineage_of = {}
+    for lineage in lineages:
+        for ua_string in lineage:
+            corpus.append(ua_string)
+            lineage_of[ua_string] = lineage
+    random_generator.shuffle(corpus)
+
+    # Zipf-like popularity: the string of rank r is drawn with weight 1 / r.
+    cumulative_weights = []
+    total = 0.0
+    for rank in range(1, len(corpus) + 1):
+        total += 1.0 / rank
+        cumulative_weights.append(total)
+
+    baselines = random_generator.choices(corpus, cum_weights=cumulative_weights, k=number_of_pairs)
+    pairs = []
+    for baseline in baselines:
+        draw = random_generator.random()
+        if draw < equal_fraction:
+            current = baseline
+        elif draw < equal_fraction + same_lineage_fraction:
+            current = random_generator.choice(lineage_of[baseline])
+        else:
+            current = random_generator.choice(corpus)
+        pairs.append((baseline, current))
+    return pairs
+
+
+# The kinds of (baseline, current) pairs made by generate_differential_pairs()
+DIFFERENTIAL_PAIR_KINDS = (
+    "equal",            # the same string
+    "upgrade",          # one version component raised
+    "downgrade",        # one version component lowered
+    "major_up_minor_down",
+                        # a major version raised and its minor version lowered
+    "mixed_versions",   # every version component moved independently, up, down, or not at all
+    "family_swap",      # another template (another browser, OS, or device) with the same versions where shared
+    "missing_minor",    # the same client rendered with (or without) a minor version component (the same string
+                        # for templates with no such rendering)
+    "unrelated",        # an arbitrary other profile
+    )
+
+
+def _moved(profile, parameter, delta):
+    """
+    Returns profile with parameter moved by delta, kept within the values that
+    can be rendered.
+    """
+
+    value = dict(profile.parameters)[parameter] + delta
+    rendered_values = _PARAMETER_VALUES.get(parameter)
+    highest = float("inf") if rendered_values is None else len(rendered_values) - 1
+    return profile.with_parameter(parameter, int(min(max(value, 0), highest)))
+
+
+def _same_versions_with_template(profile, template, random_generator):
+    """
+    Returns a profile of template whose parameters take the values of profile
+    where both templates have them, and random values otherwise.
+    """
+
+    shared_values = dict(profile.parameters)
+    new_profile = random_profile(random_generator, template)
+    return UserAgentProfile(template, tuple((parameter, shared_values.get(parameter, value))
+                                            for (parameter, value) in new_profile.parameters))
+
+
+def _variant(profile, kind, random_generator):
+    """
+    Returns a profile of the given kind of variant of profile (see
+    DIFFERENTIAL_PAIR_KINDS).
+    """
+
+    version_parameters = profile.version_parameters()
+    if (kind == "equal") or not version_parameters:
+        return profile
+    if kind == "upgrade":
+        return _moved(profile, random_generator.choice(version_parameters), random_generator.randint(1, 3))
+    if kind == "downgrade":
+        return _moved(profile, random_generator.choice(version_parameters), -random_generator.randint(1, 3))
+    if kind == "major_up_minor_down":
+        prefix = random_generator.choice(sorted({parameter.split("_")[0] + "_" for parameter in version_parameters}))
+        for parameter in version_parameters:
+            if parameter.startswith(prefix):
+                delta = 1 if parameter.endswith("major") else -random_generator.randint(1, 3)
+                profile = _moved(profile, parameter, delta)
+        return profile
+    if kind == "mixed_versions":
+        for parameter in version_parameters:
+            profile = _moved(profile, parameter, random_generator.randint(-2, 2))
+        return profile
+    if kind == "family_swap":
+        template = random_generator.choice([name for name in _TEMPLATES_BY_NAME if name != profile.template])
+        return _same_versions_with_template(profile, template, random_generator)
+    if kind == "missing_minor":
+        twin_template = _MISSING_MINOR_TWINS.get(profile.template)
+        if twin_template is None:
+            # Windows 8 has no OS minor version, Windows 8.1 has one.
+            return (profile.with_parameter("windows_nt", 3 + random_generator.randint(0, 1))
+                    if profile.template == "firefox_windows_nt" else profile)
+        return _same_versions_with_template(profile, twin_template, random_generator)
+    return random_profile(random_generator)
+
+
+def generate_differential_pairs(number_of_pairs, *, distinct = 800, seed = 0):
+    """
+    Returns a list of number_of_pairs (baseline, current, kind) triples, kind
+    being one of DIFFERENTIAL_PAIR_KINDS, drawn from at most about `distinct`
+    distinct user-agent strings (so that any number of pairs can be checked
+    against a parser whose cache holds them all).
+
+    Baselines are drawn from all the templates, a third of them from the
+    edge-case templates; each has one variant of every kind.
+    """
+
+    random_generator = random.Random(seed)
+    edge_case_names = [template[0] for template in _EDGE_CASE_TEMPLATES]
+    edge_case_weights = [template[1] for template in _EDGE_CASE_TEMPLATES]
+
+    neighbourhoods = []
+    for _ in range(max(1, distinct // len(DIFFERENTIAL_PAIR_KINDS))):
+        if random_generator.random() < 1 / 3:
+            profile = random_profile(random_generator,
+                                     random_generator.choices(edge_case_names, weights=edge_case_weights)[0])
+        else:
+            profile = random_profile(random_generator)
+        baseline = profile.render()
+        neighbourhoods.append((baseline, [_variant(profile, kind, random_generator).render()
+                                          for kind in DIFFERENTIAL_PAIR_KINDS]))
+
+    triples = []
+    for _ in range(number_of_pairs):
+        (baseline, variants) = random_generator.choice(neighbourhoods)
+        kind_index = random_generator.randrange(len(DIFFERENTIAL_PAIR_KINDS))
+        triples.append((baseline, variants[kind_index], DIFFERENTIAL_PAIR_KINDS[kind_index]))
+    return triples
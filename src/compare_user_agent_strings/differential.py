@@ -0,0 +1,433 @@
+"""
+Checks every accelerated decision path differentially against the frozen
+original implementation in `_reference.py`, over any number of generated
+pairs, and reports the timings of each.
+
+Exposes publicly:
+    DIFFERENTIAL_MODES
+    available_differential_modes()
+    run_differential_check(triples, *, modes = None, max_examples = 10)
+    main(argv = None)
+
+Run with either of:
+    python -m compare_user_agent_strings differential [options]
+    python -m compare_user_agent_strings.differential [options]
+(see `--help`); the exit status is 1 if any mode disagrees with the
+reference. The pairs come from `corpus.generate_differential_pairs()`: version
+bumps and downgrades of the OS and the browser, family swaps, non-numeric
+versions (Windows "XP", "Vista"), missing minor versions, and unrelated
+strings.
+
+Each mode makes the decision for every pair, with strict=False and with
+strict=True, in one of the ways this package offers:
+    default             `user_agent_strings_are_compatible()` as configured
+                        by default (fingerprint cache, memo of pair
+                        decisions, lexical prefilter)
+    uncached            the same with the prefilter and the memo off, so that
+                        every pair goes through the fingerprints
+    small_caches        the same with a fingerprint cache and a memo of 16
+                        entries, so that both evict constantly (and with
+                        ua-parser's parse cache enlarged, as for the
+                        reference)
+    fingerprint         `fingerprint_is_compatible()` against the baseline's
+                        fingerprint
+    serialized_fingerprint
+                        the same against a baseline restored by
+                        `ClientFingerprint.from_bytes()`
+    explain             `explain_compatibility().is_compatible`
+    metrics             `user_agent_strings_are_compatible()` with metrics on
+    precomputed         with every fingerprint loaded from a precomputed
+                        artifact
+    persistent          with a persistent fingerprint store, which serves the
+                        warm pass after the in-memory cache is emptied
+    batch, parallel     `compare_many()`, in this process and with 2 workers
+    async               `user_agent_strings_are_compatible_async()`
+    vectorized          `compare_columns()` (if NumPy is installed)
+    registry            `FingerprintRegistry.ids_are_compatible()` and
+                        `is_compatible()`
+    session_tracker     the first verdict of a SessionTracker session
+    backend_basic, backend_re2, backend_regex
+                        `user_agent_strings_are_compatible()` with another
+                        parser backend (each if installed)
+Each mode runs twice over the pairs: a cold pass, starting with every cache
+of this package empty, and a warm pass, in which the caches (and, for
+registry, the interned ids) built by the cold pass serve. Both are checked.
+
+The configuration of the process (caches, prefilter, metrics, parser backend,
+precomputed and persistent fingerprints) is restored after each mode. The
+reference's decisions are computed once, with ua-parser's own parse cache
+temporarily enlarged to hold every string, so that the reference does not
+dominate the run time.
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import os
+import sys
+import tempfile
+import time
+
+from . import backends, ua_fingerprint
+from . _reference import reference_user_agent_strings_are_compatible
+from . batch import compare_many
+from . corpus import generate_differential_pairs
+from . ua_fingerprint import (
+                              ClientFingerprint,
+                              clear_fingerprint_cache,
+                              configure_fingerprint_cache,
+                              configure_lexical_prefilter,
+                              configure_pair_decision_cache,
+                              explain_compatibility,
+                              fingerprint_is_compatible,
+                              get_client_fingerprint,
+                              user_agent_strings_are_compatible,
+                             )
+
+DIFFERENTIAL_MODES = ("default", "uncached", "small_caches", "fingerprint", "serialized_fingerprint", "explain",
+                      "metrics", "precomputed", "persistent", "batch", "parallel", "async", "vectorized", "registry",
+                      "session_tracker", "backend_basic", "backend_re2", "backend_regex")
+
+
+def _decide_default(baselines, currents, strict):
+    return [user_agent_strings_are_compatible(baseline, current, strict=strict)
+            for (baseline, current) in zip(baselines, currents)]
+
+
+def _decide_with_fingerprints(baselines, currents, strict):
+    return [fingerprint_is_compatible(get_client_fingerprint(baseline), current, strict=strict)
+            for (baseline, current) in zip(baselines, currents)]
+
+
+def _decide_with_serialized_fingerprints(baselines, currents, strict):
+    from_bytes = ClientFingerprint.from_bytes
+    return [fingerprint_is_compatible(from_bytes(get_client_fingerprint(baseline).to_bytes()), current,
+                                      strict=strict)
+            for (baseline, current) in zip(baselines, currents)]
+
+
+def _decide_with_explanations(baselines, currents, strict):
+    return [explain_compatibility(baseline, current, strict=strict).is_compatible
+            for (baseline, current) in zip(baselines, currents)]
+
+
+def _decide_in_batch(baselines, currents, strict):
+    return [bool(result) for result in compare_many(baselines, currents, strict=strict)]
+
+
+def _decide_in_parallel(baselines, currents, strict):
+    return [bool(result) for result in compare_many(baselines, currents, strict=strict, workers=2)]
+
+
+def _decide_asynchronously(baselines, currents, strict):
+    from . async_api import user_agent_strings_are_compatible_async
+
+    async def decide_all():
+        return [await user_agent_strings_are_compatible_async(baseline, current, strict=strict)
+                for (baseline, current) in zip(baselines, currents)]
+
+    return asyncio.run(decide_all())
+
+
+def _decide_vectorized(baselines, currents, strict):
+    from . vectorized import compare_columns
+    return compare_columns(baselines, currents, strict=strict).tolist()
+
+
+def _timed_passes(decide, baselines, currents, strict, *, between_passes = None):
+    """
+    Returns {"cold": (results, seconds), "warm": (results, seconds)} for two
+    passes of decide(baselines, currents, strict).
+    """
+
+    passes = {}
+    for pass_name in ("cold", "warm"):
+        if (pass_name == "warm") and (between_passes is not None):
+            between_passes()
+        start = time.perf_counter()
+        results = decide(baselines, currents, strict)
+        passes[pass_name] = (results, time.perf_counter() - start)
+    return passes
+
+
+def _run_mode(mode, baselines, currents, strict):
+    """
+    Sets the process up for mode, runs its two passes (see
+    `_timed_passes()`), and returns them. The caller restores the
+    configuration.
+    """
+
+    if mode == "small_caches":
+        configure_fingerprint_cache(16)
+        configure_pair_decision_cache(16, policy="fifo")
+        # Under test are the evictions from this package's caches, not the cost of ua-parser's re-parsing.
+        with _LargeParserCache(baselines + currents):
+            return _timed_passes(_decide_default, baselines, currents, strict)
+
+    if mode in ("default", "uncached", "metrics") or mode.startswith("backend_"):
+        if mode == "uncached":
+            configure_lexical_prefilter(False)
+            configure_pair_decision_cache(0)
+        elif mode == "metrics":
+            from . metrics import enable_metrics
+            enable_metrics()
+        elif mode != "default":
+            backends.configure_parser_backend(mode[len("backend_"):])
+        return _timed_passes(_decide_default, baselines, currents, strict)
+
+    if mode == "precomputed":
+        from . precompute import build_fingerprint_artifact, load_fingerprint_artifact
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "fingerprints.bin")
+            build_fingerprint_artifact(baselines + currents, path)
+            load_fingerprint_artifact(path)
+        clear_fingerprint_cache()
+        return _timed_passes(_decide_default, baselines, currents, strict)
+
+    if mode == "persistent":
+        with tempfile.TemporaryDirectory() as directory:
+            ua_fingerprint.configure_persistent_fingerprint_cache(os.path.join(directory, "fingerprints.sqlite3"))
+            try:
+                return _timed_passes(_decide_default, baselines, currents, strict,
+                                     between_passes=clear_fingerprint_cache)
+            finally:
+                ua_fingerprint.configure_persistent_fingerprint_cache(None)
+
+    if mode == "registry":
+        from . registry import FingerprintRegistry
+        registry = FingerprintRegistry(max_fingerprints=len(baselines) + len(currents))
+
+        def decide_by_registry(baselines, currents, strict):
+            (intern, ids_are_compatible, is_compatible) = (registry.intern, registry.ids_are_compatible,
+                                                           registry.is_compatible)
+            if not len(registry):
+                return [ids_are_compatible(intern(baseline), intern(current), strict=strict)
+                        for (baseline, current) in zip(baselines, currents)]
+            return [is_compatible(intern(baseline), current, strict=strict)
+                    for (baseline, current) in zip(baselines, currents)]
+
+        return _timed_passes(decide_by_registry, baselines, currents, strict)
+
+    if mode == "session_tracker":
+        from . middleware import COMPATIBLE, IDENTICAL
+        from . session_tracker import SessionTracker
+        tracker = SessionTracker()
+
+        def decide_by_tracker(baselines, currents, strict):
+            (start_session, observe) = (tracker.start_session, tracker.observe)
+            results = []
+            for (baseline, current) in zip(baselines, currents):
+                start_session(0, baseline)
+                results.append(observe(0, current, strict=strict) in (IDENTICAL, COMPATIBLE))
+            return results
+
+        return _timed_passes(decide_by_tracker, baselines, currents, strict)
+
+    decide = {"fingerprint": _decide_with_fingerprints,
+              "serialized_fingerprint": _decide_with_serialized_fingerprints,
+              "explain": _decide_with_explanations,
+              "batch": _decide_in_batch,
+              "parallel": _decide_in_parallel,
+              "async": _decide_asynchronously,
+              "vectorized": _decide_vectorized,
+             }[mode]
+    return _timed_passes(decide, baselines, currents, strict)
+
+
+class _LargeParserCache():
+    """
+    Enlarges the parse cache of `ua_parser.user_agent_parser.Parse()` (which
+    otherwise holds 200 strings) to hold all of ua_strings, and restores it.
+    """
+
+    def __init__(self, ua_strings):
+        self.capacity = 2 * len(set(ua_strings))
+
+    def __enter__(self):
+        from ua_parser import user_agent_parser
+
+        self.saved_max_cache_size = user_agent_parser.MAX_CACHE_SIZE
+        user_agent_parser.MAX_CACHE_SIZE = max(self.saved_max_cache_size, self.capacity)
+        return self
+
+    def __exit__(self, *exception_information):
+        from ua_parser import user_agent_parser
+
+        user_agent_parser.MAX_CACHE_SIZE = self.saved_max_cache_size
+        if len(user_agent_parser._PARSE_CACHE) > self.saved_max_cache_size:
+            user_agent_parser._PARSE_CACHE.clear()
+        return False
+
+
+class _SavedConfiguration():
+    """
+    Records the process-wide configuration that the modes change, and
+    restores it (emptying the caches).
+    """
+
+    def __enter__(self):
+        fingerprint_cache = ua_fingerprint._fingerprint_cache
+        pair_decision_cache = ua_fingerprint._pair_decision_cache
+        self.fingerprint_cache = (fingerprint_cache.maxsize, fingerprint_cache.policy)
+        self.pair_decision_cache = (pair_decision_cache.maxsize, pair_decision_cache.policy,
+                                    ua_fingerprint._pair_decisions_enabled)
+        self.lexical_prefilter_enabled = ua_fingerprint._lexical_prefilter_enabled
+        self.metrics = ua_fingerprint._metrics
+        self.parser_backend = (ua_fingerprint._parser_backend, backends._backend_name)
+        self.precomputed_fingerprints = ua_fingerprint._precomputed_fingerprints
+        self.persistent_store = ua_fingerprint._persistent_store
+        # Each mode starts from the default configuration (apart from the caches' contents and sizes).
+        ua_fingerprint._precomputed_fingerprints = {}
+        ua_fingerprint._persistent_store = None
+        ua_fingerprint._metrics = None
+        clear_fingerprint_cache()
+        return self
+
+    def __exit__(self, *exception_information):
+        (maxsize, policy) = self.fingerprint_cache
+        configure_fingerprint_cache(maxsize, policy=policy)
+        (maxsize, policy, enabled) = self.pair_decision_cache
+        configure_pair_decision_cache(maxsize, policy=policy)
+        ua_fingerprint._pair_decisions_enabled = enabled
+        configure_lexical_prefilter(self.lexical_prefilter_enabled)
+        ua_fingerprint._metrics = self.metrics
+        (ua_fingerprint._parser_backend, backends._backend_name) = self.parser_backend
+        ua_fingerprint._precomputed_fingerprints = self.precomputed_fingerprints
+        ua_fingerprint._persistent_store = self.persistent_store
+        clear_fingerprint_cache()
+        return False
+
+
+def available_differential_modes():
+    """
+    Returns the modes that can run here: all but vectorized without NumPy and
+    the backends whose engines are not installed.
+    """
+
+    import importlib.util
+
+    installed_backends = backends.available_parser_backends()
+    return tuple(mode for mode in DIFFERENTIAL_MODES
+                 if ((mode != "vectorized") or (importlib.util.find_spec("numpy") is not None))
+                 and ((not mode.startswith("backend_")) or (mode[len("backend_"):] in installed_backends)))
+
+
+def _reference_decisions(baselines, currents, strict):
+    """
+    Returns (the reference's decisions, the seconds they took).
+    """
+
+    with _LargeParserCache(baselines + currents):
+        start = time.perf_counter()
+        results = [reference_user_agent_strings_are_compatible(baseline, current, strict=strict)
+                   for (baseline, current) in zip(baselines, currents)]
+        return (results, time.perf_counter() - start)
+
+
+def run_differential_check(triples, *, modes = None, max_examples = 10):
+    """
+    Decides every (baseline, current, kind) triple (see
+    `corpus.generate_differential_pairs()`) with strict=False and
+    strict=True in each mode (all available ones if modes is None) and with
+    the reference implementation.
+
+    Returns a JSON-serializable dict: the counts of the pairs by kind, the
+    reference's timing, and for each mode the number of disagreements with
+    the reference, up to max_examples of them, and the timing of each pass.
+
+    Raises ValueError for an unknown or unavailable mode.
+    """
+
+    available_modes = available_differential_modes()
+    modes = available_modes if modes is None else tuple(modes)
+    for mode in modes:
+        if mode not in available_modes:
+            raise ValueError(f"mode must be one of {available_modes}, not {mode!r}")
+
+    baselines = [baseline for (baseline, _, _) in triples]
+    currents = [current for (_, current, _) in triples]
+    kinds = [kind for (_, _, kind) in triples]
+    number_of_decisions = 2 * len(triples)
+
+    expected_by_strict = {}
+    reference_seconds = 0.0
+    for strict in (False, True):
+        (expected_by_strict[strict], seconds) = _reference_decisions(baselines, currents, strict)
+        reference_seconds += seconds
+
+    report_by_mode = {}
+    for mode in modes:
+        mismatches = 0
+        examples = []
+        seconds_by_pass = {"cold": 0.0, "warm": 0.0}
+        for strict in (False, True):
+            expected = expected_by_strict[strict]
+            with _SavedConfiguration():
+                passes = _run_mode(mode, baselines, currents, strict)
+            for (pass_name, (results, seconds)) in passes.items():
+                seconds_by_pass[pass_name] += seconds
+                for (position, is_compatible) in enumerate(results):
+                    if is_compatible != expected[position]:
+                        mismatches += 1
+                        if len(examples) < max_examples:
+                            examples.append({"baseline": baselines[position], "current": currents[position],
+                                             "kind": kinds[position], "strict": strict, "pass": pass_name,
+                                             "expected": expected[position], "got": is_compatible})
+        report_by_mode[mode] = {
+            "mismatches": mismatches,
+            "examples": examples,
+            **{f"{pass_name}_us_per_pair": 1e6 * seconds / number_of_decisions
+               for (pass_name, seconds) in seconds_by_pass.items()},
+        }
+
+    return {
+        "pairs": len(triples),
+        "distinct_strings": len(set(baselines) | set(currents)),
+        "pairs_by_kind": dict(collections.Counter(kinds)),
+        "reference_us_per_pair": 1e6 * reference_seconds / number_of_decisions,
+        "modes": report_by_mode,
+        "mismatches": sum(report["mismatches"] for report in report_by_mode.values()),
+    }
+
+
+def build_argument_parser(parser = None):
+    """
+    Adds the differential-check options to parser (or to a new
+    ArgumentParser).
+    """
+
+    if parser is None:
+        parser = argparse.ArgumentParser(prog="python -m compare_user_agent_strings.differential",
+                                         description="Check every accelerated decision path against the original "
+                                                     "implementation; print JSON.")
+    parser.add_argument("--pairs", type=int, default=200000,
+                        help="number of generated (baseline, current) pairs (default: 200000)")
+    parser.add_argument("--distinct", type=int, default=800,
+                        help="approximate number of distinct user-agent strings (default: 800)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the pairs (default: 0)")
+    parser.add_argument("--mode", action="append", dest="modes", choices=DIFFERENTIAL_MODES, default=None,
+                        help="check only this mode (repeatable; default: every available mode)")
+    parser.add_argument("--output", "-o", default="-", help="file to write the JSON report to (default: stdout)")
+    return parser
+
+
+def run_from_arguments(arguments):
+    triples = generate_differential_pairs(arguments.pairs, distinct=arguments.distinct, seed=arguments.seed)
+    report = run_differential_check(triples, modes=arguments.modes)
+    if arguments.output == "-":
+        json.dump(report, sys.stdout, indent=4)
+        print()
+    else:
+        with open(arguments.output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=4)
+            output_file.write("\n")
+    return 1 if report["mismatches"] else 0
+
+
+def main(argv = None):
+    return run_from_arguments(build_argument_parser().parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,319 @@
+"""
+Replays access-log records through the compatibility check, to audit past
+sessions offline and to compare the strict and non-strict policies.
+
+Exposes publicly:
+    SessionAuditor(*, strict = False)
+    iter_records(text_stream, input_format, *, session_field = "session_id",
+                 timestamp_field = "timestamp", user_agent_field = "user_agent",
+                 has_header = True)
+    open_text(path)
+    main(argv = None)
+
+Run with either of:
+    ua-log-replay requests.jsonl.gz --flagged flagged.csv --summary summary.json
+    python -m compare_user_agent_strings replay requests.csv ...
+
+Each input record is (session_id, timestamp, user_agent). The first record of
+a session sets its baseline user-agent string; every later record of that
+session is compared with the baseline under *both* policies
+(`user_agent_strings_are_compatible(..., strict=True)` and `strict=False`),
+so a single pass yields the counts needed to tune the policy. The first record
+that fails the selected policy (non-strict unless `--strict`) flags the
+session: a row is written to the flagged-sessions CSV, and later requests of
+that session are only counted.
+
+Input is read as a stream, one record at a time, through a large read buffer
+(gzip-compressed files and standard input are supported), so memory does not
+grow with the size of the file; it grows only with the number of distinct
+sessions, for each of which a reference to its baseline string and two flags
+are kept. Records are expected in time order within each session; the
+timestamp is carried through to the output but not interpreted.
+
+Supported formats (by default inferred from the file extension, ignoring .gz):
+    csv     comma-separated values with a header row (.csv)
+    tsv     tab-separated values with a header row (.tsv, .tab)
+    jsonl   one JSON object per line (.jsonl, .ndjson, .json)
+With `--no-header`, csv/tsv columns are taken in the order session_id,
+timestamp, user_agent. Malformed records are counted and skipped.
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+
+from . text_input import open_text
+from . ua_fingerprint import fingerprint_cache_info, user_agent_strings_are_compatible
+
+INPUT_FORMATS = ("csv", "tsv", "jsonl")
+
+_FORMAT_BY_EXTENSION = {".csv": "csv", ".tsv": "tsv", ".tab": "tsv", ".jsonl": "jsonl", ".ndjson": "jsonl",
+                        ".json": "jsonl"}
+
+# Sessions sharing a user-agent string share one string object, up to this many distinct strings.
+_CANONICAL_STRINGS_LIMIT = 100000
+
+_FLAGGED_STRICT = 1
+_FLAGGED_NON_STRICT = 2
+
+
+def infer_input_format(path):
+    """
+    Returns the input format implied by the extension of path, or None.
+    """
+
+    name = path.lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    for (extension, input_format) in _FORMAT_BY_EXTENSION.items():
+        if name.endswith(extension):
+            return input_format
+    return None
+
+
+def iter_records(text_stream, input_format, *, session_field = "session_id", timestamp_field = "timestamp",
+                 user_agent_field = "user_agent", has_header = True):
+    """
+    Yields (session_id, timestamp, user_agent) for each record of text_stream,
+    or None for a record that is malformed or lacks a session_id or
+    user_agent.
+    """
+
+    if input_format == "jsonl":
+        for line in text_stream:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                session_id = record[session_field]
+                user_agent = record[user_agent_field]
+            except (ValueError, KeyError, TypeError):
+                yield None
+                continue
+            if (session_id is None) or (not isinstance(user_agent, str)):
+                yield None
+                continue
+            yield (str(session_id), record.get(timestamp_field), user_agent)
+        return
+
+    if input_format not in ("csv", "tsv"):
+        raise ValueError(f"input_format must be one of {INPUT_FORMATS}, not {input_format!r}")
+
+    reader = csv.reader(text_stream, delimiter="," if input_format == "csv" else "\t")
+    if has_header:
+        header = next(reader, None)
+        if header is None:
+            return
+        try:
+            session_index = header.index(session_field)
+            user_agent_index = header.index(user_agent_field)
+        except ValueError:
+            raise ValueError(f"header must name the columns {session_field!r} and {user_agent_field!r}: "
+                             f"{header!r}") from None
+        timestamp_index = header.index(timestamp_field) if timestamp_field in header else None
+    else:
+        (session_index, timestamp_index, user_agent_index) = (0, 1, 2)
+
+    minimum_length = max(session_index, user_agent_index) + 1
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error:
+            yield None
+            continue
+        if len(row) < minimum_length:
+            if row:
+                yield None
+            continue
+        timestamp = row[timestamp_index] if (timestamp_index is not None) and (timestamp_index < len(row)) else None
+        yield (row[session_index], timestamp, row[user_agent_index])
+
+
+class SessionAuditor():
+    """
+    Tracks the baseline user-agent string of every session and accumulates
+    the outcomes of comparing each later request with it, under both the
+    strict and the non-strict policy.
+
+    `observe()` returns a flag row (session_id, timestamp, baseline_user_agent,
+    user_agent) when a request makes a not-yet-flagged session fail the
+    selected policy, and otherwise None.
+    """
+
+    def __init__(self, *, strict = False):
+        self.strict = strict
+        self._sessions = {}
+        self._canonical_strings = {}
+        self.records = 0
+        self.malformed_records = 0
+        self.comparisons = 0
+        self.identical_user_agent = 0
+        self.strict_incompatible = 0
+        self.non_strict_incompatible = 0
+        self.strict_flagged_sessions = 0
+        self.non_strict_flagged_sessions = 0
+        self.requests_after_flag = 0
+
+    def _canonical(self, ua_string):
+        canonical_strings = self._canonical_strings
+        canonical = canonical_strings.get(ua_string)
+        if canonical is not None:
+            return canonical
+        if len(canonical_strings) < _CANONICAL_STRINGS_LIMIT:
+            canonical_strings[ua_string] = ua_string
+        return ua_string
+
+    def observe_malformed(self):
+        self.records += 1
+        self.malformed_records += 1
+
+    def observe(self, session_id, timestamp, user_agent):
+        self.records += 1
+
+        state = self._sessions.get(session_id)
+        if state is None:
+            self._sessions[session_id] = [self._canonical(user_agent), 0]
+            return None
+
+        (baseline, flags) = state
+        self.comparisons += 1
+        selected_flag = _FLAGGED_STRICT if self.strict else _FLAGGED_NON_STRICT
+        if flags & selected_flag:
+            self.requests_after_flag += 1
+
+        if baseline == user_agent:
+            self.identical_user_agent += 1
+            return None
+
+        # Strict compatibility is string equality, so a differing string always fails the strict policy.
+        self.strict_incompatible += 1
+        if not (flags & _FLAGGED_STRICT):
+            flags |= _FLAGGED_STRICT
+            self.strict_flagged_sessions += 1
+
+        if not user_agent_strings_are_compatible(baseline, user_agent, strict=False):
+            self.non_strict_incompatible += 1
+            if not (flags & _FLAGGED_NON_STRICT):
+                flags |= _FLAGGED_NON_STRICT
+                self.non_strict_flagged_sessions += 1
+
+        newly_flagged = (flags & selected_flag) and not (state[1] & selected_flag)
+        state[1] = flags
+        if newly_flagged:
+            return (session_id, timestamp, baseline, user_agent)
+        return None
+
+    def summary(self):
+        """
+        Returns the aggregate counts as a JSON-serializable dict.
+        """
+
+        return {
+            "policy": "strict" if self.strict else "non_strict",
+            "records": self.records,
+            "malformed_records": self.malformed_records,
+            "sessions": len(self._sessions),
+            "comparisons": self.comparisons,
+            "identical_user_agent": self.identical_user_agent,
+            "strict": {"incompatible_requests": self.strict_incompatible,
+                       "flagged_sessions": self.strict_flagged_sessions},
+            "non_strict": {"incompatible_requests": self.non_strict_incompatible,
+                           "flagged_sessions": self.non_strict_flagged_sessions},
+            "requests_after_flag": self.requests_after_flag,
+        }
+
+
+def replay(records, *, strict = False, flagged_writer = None):
+    """
+    Feeds records (as yielded by iter_records()) through a SessionAuditor,
+    writing each flag row to flagged_writer (a csv.writer) if given.
+
+    Returns the SessionAuditor.
+    """
+
+    auditor = SessionAuditor(strict=strict)
+    observe = auditor.observe
+    for record in records:
+        if record is None:
+            auditor.observe_malformed()
+            continue
+        flag_row = observe(*record)
+        if (flag_row is not None) and (flagged_writer is not None):
+            flagged_writer.writerow(flag_row)
+    return auditor
+
+
+def build_argument_parser(parser = None):
+    """
+    Adds the replay options to parser (or to a new ArgumentParser).
+    """
+
+    if parser is None:
+        parser = argparse.ArgumentParser(prog="ua-log-replay",
+                                         description="Replay access-log records through the user-agent "
+                                                     "compatibility check and report flagged sessions.")
+    parser.add_argument("input", help="CSV, TSV, or JSONL file of records, optionally .gz; '-' for stdin")
+    parser.add_argument("--format", choices=INPUT_FORMATS, dest="input_format",
+                        help="input format (default: inferred from the file extension)")
+    parser.add_argument("--strict", action="store_true", help="flag sessions under the strict policy")
+    parser.add_argument("--session-field", default="session_id", help="name of the session-ID field")
+    parser.add_argument("--timestamp-field", default="timestamp", help="name of the timestamp field")
+    parser.add_argument("--user-agent-field", default="user_agent", help="name of the user-agent field")
+    parser.add_argument("--no-header", action="store_true",
+                        help="csv/tsv input has no header; columns are session_id, timestamp, user_agent")
+    parser.add_argument("--flagged", default="-",
+                        help="CSV file to write flagged sessions to (default: stdout)")
+    parser.add_argument("--summary", default=None,
+                        help="JSON file to write the aggregate counts to (default: stderr)")
+    return parser
+
+
+def run_from_arguments(arguments):
+    input_format = arguments.input_format or infer_input_format(arguments.input)
+    if input_format is None:
+        raise SystemExit(f"cannot infer the format of {arguments.input!r}; use --format")
+
+    start = time.perf_counter()
+
+    if arguments.flagged == "-":
+        flagged_file = sys.stdout
+    else:
+        flagged_file = open(arguments.flagged, "w", encoding="utf-8", newline="")
+    try:
+        flagged_writer = csv.writer(flagged_file)
+        flagged_writer.writerow(("session_id", "timestamp", "baseline_user_agent", "user_agent"))
+        with open_text(arguments.input) as text_stream:
+            records = iter_records(text_stream, input_format,
+                                   session_field=arguments.session_field,
+                                   timestamp_field=arguments.timestamp_field,
+                                   user_agent_field=arguments.user_agent_field,
+                                   has_header=not arguments.no_header)
+            auditor = replay(records, strict=arguments.strict, flagged_writer=flagged_writer)
+    finally:
+        if flagged_file is not sys.stdout:
+            flagged_file.close()
+
+    summary = auditor.summary()
+    summary["elapsed_seconds"] = time.perf_counter() - start
+    summary["fingerprint_cache"] = fingerprint_cache_info()._asdict()
+
+    if arguments.summary is None:
+        json.dump(summary, sys.stderr, indent=4)
+        sys.stderr.write("\n")
+    else:
+        with open(arguments.summary, "w", encoding="utf-8") as summary_file:
+            json.dump(summary, summary_file, indent=4)
+            summary_file.write("\n")
+    return 0
+
+
+def main(argv = None):
+    return run_from_arguments(build_argument_parser().parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
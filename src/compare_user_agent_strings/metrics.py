@@ -0,0 +1,226 @@
+"""
+Optional instrumentation of the comparison and parsing hot paths.
+
+Exposes publicly:
+    enable_metrics(*, callback = None, buckets = DEFAULT_LATENCY_BUCKETS)
+    disable_metrics()
+    metrics_snapshot()
+    format_prometheus(snapshot, *, prefix = "ua_compare")
+    Metrics(*, callback = None, buckets = DEFAULT_LATENCY_BUCKETS)
+    LatencyHistogram(upper_bounds)
+    DEFAULT_LATENCY_BUCKETS
+
+Metrics are off by default, and then cost one `is not None` test per
+comparison and per parse. While they are on (`enable_metrics()`), every call
+of `user_agent_strings_are_compatible()` and `fingerprint_is_compatible()` is
+decided by an instrumented twin of the decision kernel, which makes the same
+decision by the same route and also reports:
+    path        how the pair was decided: "identical" (string equality),
+                "strict" (strict mode, strings differ), "lexical" (the lexical
+                prefilter), "cached" (from cached fingerprints), "parsed"
+                (at least one string had to be parsed), or "memoized" (from
+                the memo of pair decisions)
+    reason      why: "identical", "strict_mismatch", "upgrade" (compatible),
+                "downgrade", "non_numeric_mismatch", "no_upgrade", or
+                "identity_mismatch"; or "memoized" for a rejection answered
+                from the memo, which keeps only the decision (so that
+                counting a memo hit costs no analysis and no parse)
+and every parse of a user-agent string is timed. The metrics object counts
+comparisons by (path, reason) and keeps latency histograms of comparisons by
+reason and of parses. `compare_many()` and the async API count every pair
+the same way (see batch.py and async_api.py).
+
+Two ways to export them:
+    * pull: `metrics_snapshot()` returns a JSON-serializable dict of the
+      counters and histograms, together with the statistics of the
+      fingerprint cache (`fingerprint_cache_info()`,
+      `fingerprint_source_info()`) and of the memo of pair decisions
+      (`pair_decision_cache_info()`), and
+      `format_prometheus(snapshot)` renders it in the Prometheus text
+      exposition format, e.g., for a /metrics endpoint; or
+    * push: `enable_metrics(callback=f)` calls f(event, labels, seconds) for
+      every comparison (event "comparison", labels {"path": ..., "reason":
+      ...}) and every parse (event "parse", labels {}), e.g., to observe a
+      prometheus_client Histogram or a StatsD timer.
+"""
+
+import threading
+from bisect import bisect_left
+
+from . import ua_fingerprint
+
+# Upper bounds, in seconds, of the latency histogram buckets: from a cache hit (about 1 us) to a cold parse (ms).
+DEFAULT_LATENCY_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2,
+                           2.5e-2)
+
+
+class LatencyHistogram():
+    """
+    Counts of observed durations by bucket, as in a Prometheus histogram.
+    """
+
+    __slots__ = ("upper_bounds", "bucket_counts", "count", "sum")
+
+    def __init__(self, upper_bounds):
+        self.upper_bounds = tuple(upper_bounds)
+        # One count per upper bound, plus one for the +Inf bucket; not cumulative
+        self.bucket_counts = [0] * (len(self.upper_bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.bucket_counts[bisect_left(self.upper_bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def as_dict(self):
+        """
+        Returns {"buckets": [[upper_bound, cumulative_count], ...], "count":
+        ..., "sum": ...}, where the last upper bound is "+Inf".
+        """
+
+        buckets = []
+        cumulative_count = 0
+        for (upper_bound, bucket_count) in zip((*self.upper_bounds, "+Inf"), self.bucket_counts):
+            cumulative_count += bucket_count
+            buckets.append([upper_bound, cumulative_count])
+        return {"buckets": buckets, "count": self.count, "sum": self.sum}
+
+
+class Metrics():
+    """
+    Counters and latency histograms of comparisons and parses. Thread-safe.
+    """
+
+    def __init__(self, *, callback = None, buckets = DEFAULT_LATENCY_BUCKETS):
+        self.callback = callback
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.comparisons = {}
+            self.comparison_latency = {}
+            self.parse_latency = LatencyHistogram(self.buckets)
+
+    def record_comparison(self, path, reason, seconds):
+        with self._lock:
+            key = (path, reason)
+            self.comparisons[key] = self.comparisons.get(key, 0) + 1
+            histogram = self.comparison_latency.get(reason)
+            if histogram is None:
+                histogram = self.comparison_latency[reason] = LatencyHistogram(self.buckets)
+            histogram.observe(seconds)
+        if self.callback is not None:
+            self.callback("comparison", {"path": path, "reason": reason}, seconds)
+
+    def record_parse(self, seconds):
+        with self._lock:
+            self.parse_latency.observe(seconds)
+        if self.callback is not None:
+            self.callback("parse", {}, seconds)
+
+    def snapshot(self):
+        """
+        Returns the counters, the histograms, and the fingerprint cache
+        statistics as a JSON-serializable dict.
+        """
+
+        with self._lock:
+            comparisons = {}
+            for ((path, reason), count) in sorted(self.comparisons.items()):
+                comparisons.setdefault(path, {})[reason] = count
+            comparison_latency = {reason: histogram.as_dict()
+                                  for (reason, histogram) in sorted(self.comparison_latency.items())}
+            parse_latency = self.parse_latency.as_dict()
+
+        return {"comparisons": comparisons,
+                "comparison_latency_seconds": comparison_latency,
+                "parse_latency_seconds": parse_latency,
+                "fingerprint_cache": ua_fingerprint.fingerprint_cache_info()._asdict(),
+                "fingerprint_sources": ua_fingerprint.fingerprint_source_info(),
+                "pair_decision_cache": ua_fingerprint.pair_decision_cache_info()._asdict(),
+               }
+
+
+def enable_metrics(*, callback = None, buckets = DEFAULT_LATENCY_BUCKETS):
+    """
+    Starts collecting metrics in a new Metrics object (replacing any earlier
+    one) and returns it. If callback is given, it is also called for every
+    comparison and parse (see the module docstring).
+    """
+
+    metrics = Metrics(callback=callback, buckets=buckets)
+    ua_fingerprint._metrics = metrics
+    return metrics
+
+
+def disable_metrics():
+    """
+    Stops collecting metrics; the hot paths return to their uninstrumented
+    form.
+    """
+
+    ua_fingerprint._metrics = None
+
+
+def metrics_snapshot():
+    """
+    Returns the snapshot of the metrics being collected, or None if metrics
+    are off.
+    """
+
+    metrics = ua_fingerprint._metrics
+    return None if metrics is None else metrics.snapshot()
+
+
+def _format_labels(labels):
+    return "{" + ",".join(f'{name}="{value}"' for (name, value) in labels) + "}" if labels else ""
+
+
+def _format_histogram(lines, name, labels, histogram):
+    for (upper_bound, cumulative_count) in histogram["buckets"]:
+        lines.append(f"{name}_bucket{_format_labels((*labels, ('le', upper_bound)))} {cumulative_count}")
+    lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']}")
+    lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+
+
+def format_prometheus(snapshot, *, prefix = "ua_compare"):
+    """
+    Renders a snapshot (see `metrics_snapshot()`) in the Prometheus text
+    exposition format.
+    """
+
+    lines = [f"# TYPE {prefix}_comparisons_total counter"]
+    for (path, counts) in snapshot["comparisons"].items():
+        for (reason, count) in counts.items():
+            lines.append(f"{prefix}_comparisons_total{_format_labels((('path', path), ('reason', reason)))} {count}")
+
+    lines.append(f"# TYPE {prefix}_comparison_seconds histogram")
+    for (reason, histogram) in snapshot["comparison_latency_seconds"].items():
+        _format_histogram(lines, f"{prefix}_comparison_seconds", (("reason", reason),), histogram)
+
+    lines.append(f"# TYPE {prefix}_parse_seconds histogram")
+    _format_histogram(lines, f"{prefix}_parse_seconds", (), snapshot["parse_latency_seconds"])
+
+    cache = snapshot["fingerprint_cache"]
+    for counter in ("hits", "misses", "evictions"):
+        lines.append(f"# TYPE {prefix}_fingerprint_cache_{counter}_total counter")
+        lines.append(f"{prefix}_fingerprint_cache_{counter}_total {cache[counter]}")
+    lines.append(f"# TYPE {prefix}_fingerprint_cache_size gauge")
+    lines.append(f"{prefix}_fingerprint_cache_size {cache['currsize']}")
+
+    pair_decisions = snapshot["pair_decision_cache"]
+    for counter in ("hits", "misses", "evictions"):
+        lines.append(f"# TYPE {prefix}_pair_decision_cache_{counter}_total counter")
+        lines.append(f"{prefix}_pair_decision_cache_{counter}_total {pair_decisions[counter]}")
+    lines.append(f"# TYPE {prefix}_pair_decision_cache_size gauge")
+    lines.append(f"{prefix}_pair_decision_cache_size {pair_decisions['currsize']}")
+
+    lines.append(f"# TYPE {prefix}_fingerprint_lookups_total counter")
+    sources = snapshot["fingerprint_sources"]
+    for source in ("memory_hits", "precomputed_hits", "persistent_hits", "parsed"):
+        lines.append(f"{prefix}_fingerprint_lookups_total{_format_labels((('source', source),))} {sources[source]}")
+
+    return "\n".join(lines) + "\n"
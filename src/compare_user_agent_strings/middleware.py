@@ -0,0 +1,372 @@
+"""
+Reference WSGI and ASGI middleware that checks every request of an
+authenticated session against the user-agent string the session started with.
+
+Exposes publicly:
+    SessionUserAgentChecker(session_store, *, session_cookie = "session",
+                            remember_me_cookie = "remember_me",
+                            fingerprint_key = "ua_fingerprint",
+                            baseline_cache_size = 4096,
+                            record_missing_baselines = False)
+    UserAgentWSGIMiddleware(app, checker, *,
+                            incompatible_status = "401 Unauthorized")
+    UserAgentASGIMiddleware(app, checker, *, incompatible_status = 401)
+    NO_SESSION, NO_BASELINE, BASELINE_RECORDED, IDENTICAL, COMPATIBLE,
+    INCOMPATIBLE, PARSE_BACKLOG_FULL      (the verdicts)
+
+The session store is whatever the application keeps its server-side sessions
+in, seen through a minimal mapping interface: `session_store.get(session_id)`
+returns the session's mutable dict (or None for an unknown session),
+`session_store[session_id] = session` saves it, and
+`session_store.pop(session_id, None)` deletes it. (A dict works, as does a
+thin wrapper around Redis or a database table.)
+
+The kind of cookie selects the mode, as described in ua_fingerprint.py: the
+session of a transient session cookie (session_cookie) is checked with
+strict=True, that of a persistent "remember me" cookie (remember_me_cookie)
+with strict=False. A request that carries both has both sessions checked, so
+that a made-up session cookie cannot shield a stolen "remember me" cookie
+from the check; the request then gets the most severe of the verdicts.
+
+The application records the baseline at login, by calling
+`checker.record_baseline(session_id, ua_string)` in its login handler, which
+stores the compact serialized fingerprint of the user-agent string (see
+`ClientFingerprint.to_bytes()`) in the session under fingerprint_key. A
+request of a session without a baseline is NO_BASELINE, and a stored
+baseline that cannot be decoded (e.g., after an upgrade of this package)
+makes it INCOMPATIBLE; either way the session is revoked and the request
+answered with 401, rather than the session being given the baseline of a
+request that may not come from its owner. (With
+record_missing_baselines=True, a session without a baseline instead takes
+that of its first checked request, BASELINE_RECORDED: trust on first use,
+e.g., while sessions that predate the middleware are still live.) Each
+request of a session with a baseline then:
+    * is passed on at once if its user-agent string is identical to the
+      baseline string (decoded baselines are cached by their serialized form,
+      so this costs a dictionary lookup, not a decode);
+    * is otherwise checked with `fingerprint_is_compatible()`, which parses
+      at most the current string, and only if it is neither cached nor
+      decided by the lexical prefilter; and
+    * if incompatible, has its sessions deleted from the store (the session
+      IDs are revoked) and is answered with 401 without reaching the
+      application.
+
+The ASGI middleware checks with `fingerprint_is_compatible_async()`, so a
+cold parse does not block the event loop; if the parse backlog is full it
+answers 503 with Retry-After rather than either trusting or revoking the
+session.
+
+Every checked request's verdict and the time the check took are put in the
+WSGI environ (or ASGI scope) under "compare_user_agent_strings.check", and
+`checker.info()` reports the counts of each verdict and the mean and maximum
+per-request overhead.
+"""
+
+import time
+
+from . bounded_cache import BoundedCache
+from . ua_fingerprint import ClientFingerprint, fingerprint_is_compatible, get_client_fingerprint
+
+NO_SESSION = "no_session"
+NO_BASELINE = "no_baseline"
+BASELINE_RECORDED = "baseline_recorded"
+IDENTICAL = "identical"
+COMPATIBLE = "compatible"
+INCOMPATIBLE = "incompatible"
+PARSE_BACKLOG_FULL = "parse_backlog_full"
+
+CHECK_KEY = "compare_user_agent_strings.check"
+
+_VERDICTS = (NO_SESSION, NO_BASELINE, BASELINE_RECORDED, IDENTICAL, COMPATIBLE, INCOMPATIBLE, PARSE_BACKLOG_FULL)
+# Of the verdicts for the sessions of one request, the most severe is the request's.
+_SEVERITY_OF_VERDICT = {NO_SESSION: 0, IDENTICAL: 1, BASELINE_RECORDED: 2, COMPATIBLE: 3, PARSE_BACKLOG_FULL: 4,
+                        NO_BASELINE: 5, INCOMPATIBLE: 6}
+# The verdicts that revoke the request's sessions and answer it with 401
+_REVOKING_VERDICTS = frozenset((NO_BASELINE, INCOMPATIBLE))
+_INCOMPATIBLE_BODY = b"Session revoked: the user agent does not match the one that started the session.\n"
+_NO_BASELINE_BODY = b"Session revoked: no user agent was recorded when the session started.\n"
+_REVOKED_BODY_OF_VERDICT = {INCOMPATIBLE: _INCOMPATIBLE_BODY, NO_BASELINE: _NO_BASELINE_BODY}
+_BACKLOG_BODY = b"Temporarily unable to verify the session; retry shortly.\n"
+
+
+def _cookie_values(cookie_header, names):
+    """
+    Returns a dict of the values of the named cookies in a Cookie header.
+    """
+
+    values = {}
+    if not cookie_header:
+        return values
+    for part in cookie_header.split(";"):
+        (name, separator, value) = part.strip().partition("=")
+        if separator and (name in names) and (name not in values):
+            values[name] = value.strip().strip('"')
+    return values
+
+
+class SessionUserAgentChecker():
+    """
+    Holds the session store and the cookie configuration, makes the check for
+    one request, and accumulates the verdict counts and overhead timings.
+    """
+
+    def __init__(self, session_store, *, session_cookie = "session", remember_me_cookie = "remember_me",
+                 fingerprint_key = "ua_fingerprint", baseline_cache_size = 4096, record_missing_baselines = False):
+        self.session_store = session_store
+        self.session_cookie = session_cookie
+        self.remember_me_cookie = remember_me_cookie
+        self.fingerprint_key = fingerprint_key
+        self.record_missing_baselines = record_missing_baselines
+        self._cookie_names = (session_cookie, remember_me_cookie)
+        # Decoded baseline fingerprints, keyed by their serialized form
+        self._baselines = BoundedCache(baseline_cache_size)
+        self.verdict_counts = dict.fromkeys(_VERDICTS, 0)
+        self.checked_requests = 0
+        self.total_overhead_seconds = 0.0
+        self.max_overhead_seconds = 0.0
+
+    def sessions_for(self, cookie_header):
+        """
+        Returns the list of (session_id, strict) for the session cookies in
+        cookie_header, the transient session cookie first; empty if it carries
+        neither kind.
+        """
+
+        values = _cookie_values(cookie_header, self._cookie_names)
+        sessions = []
+        session_id = values.get(self.session_cookie)
+        if session_id:
+            sessions.append((session_id, True))
+        session_id = values.get(self.remember_me_cookie)
+        if session_id:
+            sessions.append((session_id, False))
+        return sessions
+
+    def session_for(self, cookie_header):
+        """
+        Returns (session_id, strict) for the first session cookie in
+        cookie_header (see `sessions_for()`), or (None, None) if it carries
+        neither kind of session cookie.
+        """
+
+        sessions = self.sessions_for(cookie_header)
+        return sessions[0] if sessions else (None, None)
+
+    def record_baseline(self, session_id, ua_string, session = None):
+        """
+        Stores the fingerprint of ua_string in the session as its baseline
+        (e.g., at login), replacing any earlier one.
+        """
+
+        if session is None:
+            session = self.session_store.get(session_id)
+            if session is None:
+                session = {}
+        session[self.fingerprint_key] = get_client_fingerprint(ua_string).to_bytes()
+        self.session_store[session_id] = session
+
+    def _baseline(self, serialized):
+        return self._baselines.get_or_create(bytes(serialized), ClientFingerprint.from_bytes)
+
+    def _prepare(self, session_id, ua_string):
+        """
+        Returns (verdict, baseline_fingerprint): a final verdict with None, or
+        None with the baseline to compare ua_string with.
+        """
+
+        session = self.session_store.get(session_id)
+        if session is None:
+            return (NO_SESSION, None)
+
+        serialized = session.get(self.fingerprint_key)
+        if serialized is None:
+            # Not recorded at login: fail closed, unless trust on first use was chosen.
+            if not self.record_missing_baselines:
+                return (NO_BASELINE, None)
+            self.record_baseline(session_id, ua_string, session)
+            return (BASELINE_RECORDED, None)
+
+        try:
+            baseline = self._baseline(serialized)
+        except ValueError:
+            # Written by an incompatible version of this package: fail closed; the owner logs in again.
+            return (INCOMPATIBLE, None)
+        if baseline.string == ua_string:
+            return (IDENTICAL, None)
+        return (None, baseline)
+
+    def check(self, session_id, strict, ua_string):
+        """
+        Returns the verdict for a request of session_id with ua_string.
+        (Does not revoke the session; see `revoke()`.)
+        """
+
+        (verdict, baseline) = self._prepare(session_id, ua_string)
+        if verdict is None:
+            verdict = COMPATIBLE if fingerprint_is_compatible(baseline, ua_string, strict=strict) else INCOMPATIBLE
+        return verdict
+
+    async def check_async(self, session_id, strict, ua_string):
+        """
+        Coroutine version of `check()`, which never blocks the event loop on a
+        parse and returns PARSE_BACKLOG_FULL if the parse backlog is full.
+        """
+
+        from . async_api import ParseBacklogFull, fingerprint_is_compatible_async
+
+        (verdict, baseline) = self._prepare(session_id, ua_string)
+        if verdict is None:
+            try:
+                is_compatible = await fingerprint_is_compatible_async(baseline, ua_string, strict=strict)
+            except ParseBacklogFull:
+                return PARSE_BACKLOG_FULL
+            verdict = COMPATIBLE if is_compatible else INCOMPATIBLE
+        return verdict
+
+    def check_request(self, cookie_header, ua_string):
+        """
+        Checks every session of a request (see `sessions_for()`) and returns
+        the most severe verdict, NO_SESSION if it carries no known session.
+        If that is INCOMPATIBLE or NO_BASELINE, revokes all its sessions.
+        """
+
+        sessions = self.sessions_for(cookie_header)
+        verdict = NO_SESSION
+        for (session_id, strict) in sessions:
+            verdict = max(verdict, self.check(session_id, strict, ua_string), key=_SEVERITY_OF_VERDICT.__getitem__)
+            if verdict == INCOMPATIBLE:
+                break
+        self._revoke_if_incompatible(verdict, sessions)
+        return verdict
+
+    async def check_request_async(self, cookie_header, ua_string):
+        """
+        Coroutine version of `check_request()` (see `check_async()`).
+        """
+
+        sessions = self.sessions_for(cookie_header)
+        verdict = NO_SESSION
+        for (session_id, strict) in sessions:
+            verdict = max(verdict, await self.check_async(session_id, strict, ua_string),
+                          key=_SEVERITY_OF_VERDICT.__getitem__)
+            if verdict == INCOMPATIBLE:
+                break
+        self._revoke_if_incompatible(verdict, sessions)
+        return verdict
+
+    def _revoke_if_incompatible(self, verdict, sessions):
+        if verdict in _REVOKING_VERDICTS:
+            for (session_id, _) in sessions:
+                self.revoke(session_id)
+
+    def revoke(self, session_id):
+        """
+        Deletes the session from the store.
+        """
+
+        self.session_store.pop(session_id, None)
+
+    def _record(self, verdict, overhead_seconds):
+        self.verdict_counts[verdict] += 1
+        if verdict != NO_SESSION:
+            self.checked_requests += 1
+            self.total_overhead_seconds += overhead_seconds
+            if overhead_seconds > self.max_overhead_seconds:
+                self.max_overhead_seconds = overhead_seconds
+
+    def info(self):
+        """
+        Returns a dict of the count of each verdict and the mean and maximum
+        overhead, in microseconds, of the requests that carried a session
+        cookie.
+        """
+
+        checked_requests = self.checked_requests
+        return {"verdicts": dict(self.verdict_counts),
+                "checked_requests": checked_requests,
+                "mean_overhead_microseconds": ((self.total_overhead_seconds / checked_requests) * 1e6
+                                               if checked_requests else None),
+                "max_overhead_microseconds": self.max_overhead_seconds * 1e6,
+               }
+
+
+class UserAgentWSGIMiddleware():
+    """
+    WSGI middleware that checks each request's user-agent string against its
+    session's baseline (see SessionUserAgentChecker) before calling app.
+    """
+
+    def __init__(self, app, checker, *, incompatible_status = "401 Unauthorized"):
+        self.app = app
+        self.checker = checker
+        self.incompatible_status = incompatible_status
+
+    def __call__(self, environ, start_response):
+        checker = self.checker
+        start = time.perf_counter()
+
+        verdict = checker.check_request(environ.get("HTTP_COOKIE"), environ.get("HTTP_USER_AGENT", ""))
+
+        overhead_seconds = time.perf_counter() - start
+        checker._record(verdict, overhead_seconds)
+        environ[CHECK_KEY] = {"verdict": verdict, "overhead_seconds": overhead_seconds}
+
+        if verdict in _REVOKING_VERDICTS:
+            body = _REVOKED_BODY_OF_VERDICT[verdict]
+            start_response(self.incompatible_status, [("Content-Type", "text/plain; charset=utf-8"),
+                                                      ("Content-Length", str(len(body)))])
+            return [body]
+        return self.app(environ, start_response)
+
+
+class UserAgentASGIMiddleware():
+    """
+    ASGI middleware that checks each HTTP request's user-agent string against
+    its session's baseline (see SessionUserAgentChecker) before calling app.
+    Other scopes (lifespan, websocket) are passed through unchecked.
+    """
+
+    def __init__(self, app, checker, *, incompatible_status = 401):
+        self.app = app
+        self.checker = checker
+        self.incompatible_status = incompatible_status
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        checker = self.checker
+        start = time.perf_counter()
+
+        cookie_header = None
+        ua_string = ""
+        for (name, value) in scope.get("headers", ()):
+            if name == b"cookie":
+                cookie_header = value.decode("latin-1") if cookie_header is None \
+                                else f"{cookie_header}; {value.decode('latin-1')}"
+            elif name == b"user-agent":
+                ua_string = value.decode("latin-1")
+
+        verdict = await checker.check_request_async(cookie_header, ua_string)
+
+        overhead_seconds = time.perf_counter() - start
+        checker._record(verdict, overhead_seconds)
+        scope[CHECK_KEY] = {"verdict": verdict, "overhead_seconds": overhead_seconds}
+
+        if verdict in _REVOKING_VERDICTS:
+            await self._respond(send, self.incompatible_status, _REVOKED_BODY_OF_VERDICT[verdict])
+        elif verdict == PARSE_BACKLOG_FULL:
+            await self._respond(send, 503, _BACKLOG_BODY, [(b"retry-after", b"1")])
+        else:
+            await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _respond(send, status, body, extra_headers = ()):
+        await send({"type": "http.response.start",
+                    "status": status,
+                    "headers": [(b"content-type", b"text/plain; charset=utf-8"),
+                                (b"content-length", str(len(body)).encode("ascii")),
+                                *extra_headers],
+                   })
+        await send({"type": "http.response.body", "body": body})
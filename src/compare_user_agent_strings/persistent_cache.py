@@ -0,0 +1,221 @@
+"""
+Provides an on-disk store of serialized `ClientFingerprint` objects, backed by
+an SQLite file, that survives restarts and that many processes (e.g., all the
+workers of a gunicorn deployment) can read and write concurrently.
+
+Exposes publicly:
+    PersistentFingerprintStore(path, *, signature = None, timeout = 0.1)
+    parser_signature()
+
+Typically used through `configure_persistent_fingerprint_cache(path)` in
+`ua_fingerprint.py`, which makes every miss of the in-memory fingerprint
+cache consult the store before parsing, and store what it parses.
+
+Entries are keyed by the `parser_signature()` under which they were parsed
+(the installed versions of ua-parser and of its regex set, ua-parser-builtins
+or the file named by the UA_PARSER_YAML environment variable, the configured
+parser backend, and the versions of this package and of the fingerprint
+serialization format) and by the user-agent string,
+each as a 16-byte BLAKE2b hash. A process reads and writes only the entries of
+its own signature, so processes of different signatures can share one file,
+e.g., the old and new workers during a rolling deploy, or processes with
+different parser backends: neither ever sees the other's entries, and
+opening the store deletes nothing. Once no process of an old signature is
+left, `delete_other_signatures()` reclaims the space of their entries. The
+stored fingerprint carries the full string, which is checked on every read, so
+a hash collision can only cause a miss, never a wrong fingerprint.
+
+The store is a cache, not a source of truth: if the database is locked for
+longer than `timeout` seconds or otherwise unavailable, a read is treated as a
+miss and a write is skipped, rather than delaying the request.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+
+from . __version__ import __version__
+from . ua_fingerprint import SERIALIZATION_FORMAT_VERSION, ClientFingerprint
+
+# (Files written by earlier versions also hold unsigned "meta" and "fingerprints" tables, which are no longer read.)
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS signed_fingerprints (
+    signature_hash BLOB NOT NULL,
+    ua_hash BLOB NOT NULL,
+    fingerprint BLOB NOT NULL,
+    PRIMARY KEY (signature_hash, ua_hash)
+) WITHOUT ROWID;
+"""
+
+
+def _installed_version(distribution):
+    from importlib import metadata
+
+    try:
+        return metadata.version(distribution)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def parser_signature():
+    """
+    Returns a string that changes whenever the installed parser, its regex
+    set, the configured parser backend, this package, or the fingerprint
+    serialization format changes.
+    """
+
+    from . backends import parser_backend_info
+
+    parts = [f"compare-user-agent-strings={__version__}",
+             f"format={SERIALIZATION_FORMAT_VERSION}",
+             f"ua-parser={_installed_version('ua-parser')}",
+             f"ua-parser-builtins={_installed_version('ua-parser-builtins')}",
+            ]
+
+    backend = parser_backend_info()["backend"]
+    if backend != "legacy":
+        parts.append(f"backend={backend}")
+
+    regexes_path = os.environ.get("UA_PARSER_YAML")
+    if regexes_path:
+        with open(regexes_path, "rb") as regexes_file:
+            parts.append(f"UA_PARSER_YAML={hashlib.blake2b(regexes_file.read(), digest_size=16).hexdigest()}")
+
+    return ";".join(parts)
+
+
+def _ua_hash(ua_string):
+    return hashlib.blake2b(ua_string.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+def _signature_hash(signature):
+    return hashlib.blake2b(signature.encode("utf-8"), digest_size=16, person=b"signature").digest()
+
+
+class PersistentFingerprintStore():
+    """
+    An SQLite-backed map from user-agent string to ClientFingerprint.
+
+    Each thread (and, after a fork, each process) uses its own connection;
+    the database runs in WAL mode, so readers never block one another and are
+    not blocked by a writer.
+    """
+
+    def __init__(self, path, *, signature = None, timeout = 0.1):
+        self.path = os.fspath(path)
+        self.signature = parser_signature() if signature is None else signature
+        self._signature_hash = _signature_hash(self.signature)
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+        self._local = threading.local()
+
+        # Create the schema once, waiting as long as necessary.
+        connection = sqlite3.connect(self.path, timeout=30.0)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+        finally:
+            connection.close()
+
+    def _connection(self):
+        local = self._local
+        connection = getattr(local, "connection", None)
+        if (connection is None) or (local.pid != os.getpid()):
+            connection = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            local.connection = connection
+            local.pid = os.getpid()
+        return connection
+
+    def get(self, ua_string):
+        """
+        Returns the stored ClientFingerprint of ua_string, or None.
+        """
+
+        try:
+            row = self._connection().execute("SELECT fingerprint FROM signed_fingerprints "
+                                             "WHERE signature_hash = ? AND ua_hash = ?",
+                                             (self._signature_hash, _ua_hash(ua_string))).fetchone()
+        except sqlite3.Error:
+            self.errors += 1
+            return None
+
+        if row is not None:
+            try:
+                fingerprint = ClientFingerprint.from_bytes(row[0])
+            except ValueError:
+                fingerprint = None
+            if (fingerprint is not None) and (fingerprint.string == ua_string):
+                self.hits += 1
+                return fingerprint
+
+        self.misses += 1
+        return None
+
+    def put_many(self, fingerprints):
+        """
+        Stores the supplied ClientFingerprint objects in one transaction.
+        """
+
+        signature_hash = self._signature_hash
+        rows = [(signature_hash, _ua_hash(fingerprint.string), fingerprint.to_bytes()) for fingerprint in fingerprints]
+        try:
+            connection = self._connection()
+            with connection:
+                connection.executemany("INSERT OR REPLACE INTO signed_fingerprints "
+                                       "(signature_hash, ua_hash, fingerprint) VALUES (?, ?, ?)", rows)
+        except sqlite3.Error:
+            self.errors += 1
+            return
+        self.writes += len(rows)
+
+    def put(self, fingerprint):
+        self.put_many((fingerprint,))
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM signed_fingerprints WHERE signature_hash = ?",
+                                          (self._signature_hash,)).fetchone()[0]
+
+    def clear(self):
+        """
+        Deletes every fingerprint stored under this store's signature.
+        """
+
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM signed_fingerprints WHERE signature_hash = ?", (self._signature_hash,))
+
+    def delete_other_signatures(self):
+        """
+        Deletes every fingerprint stored under another signature (and the
+        tables of earlier versions of this package), e.g., once a deploy has
+        replaced every process of the old signature. Returns the number of
+        fingerprints deleted.
+        """
+
+        connection = self._connection()
+        with connection:
+            deleted = connection.execute("DELETE FROM signed_fingerprints WHERE signature_hash != ?",
+                                         (self._signature_hash,)).rowcount
+            connection.execute("DROP TABLE IF EXISTS fingerprints")
+            connection.execute("DROP TABLE IF EXISTS meta")
+        return deleted
+
+    def info(self):
+        return {"path": self.path, "signature": self.signature, "hits": self.hits, "misses": self.misses,
+                "writes": self.writes, "errors": self.errors}
+
+    def close(self):
+        """
+        Closes this thread's connection (others close when their threads end).
+        """
+
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            if self._local.pid == os.getpid():
+                connection.close()
+            self._local.connection = None
@@ -0,0 +1,227 @@
+"""
+Precomputes the fingerprints of the most common user-agent strings into an
+artifact file that a process can load at start-up, so that the first requests
+after a deploy are not slowed by parsing.
+
+Exposes publicly:
+    most_common_user_agent_strings(ua_strings, top = None)
+    build_fingerprint_artifact(ua_strings, path, *, top = None)
+    read_fingerprint_artifact(path, *, signature = None)
+    load_fingerprint_artifact(path)
+    clear_precomputed_fingerprints()
+    main(argv = None)
+
+Build the artifact at build time (or from a cron job) from a sample of live
+traffic, one user-agent string per line, duplicates included so that the
+strings can be ranked by frequency:
+    python -m compare_user_agent_strings precompute user_agents.txt.gz \\
+        --top 10000 --output ua-fingerprints.bin
+and load it at process start-up (before forking, if the server preforks):
+    load_fingerprint_artifact("ua-fingerprints.bin")
+
+Loaded fingerprints are kept in a table beside the size-bounded fingerprint
+cache and are never evicted; a miss of the cache is served from that table
+before the persistent store (if any) or the parser is consulted.
+`fingerprint_source_info()` then reports the fraction of lookups served
+without parsing.
+
+The artifact is the marshal-serialized list of the fingerprints' fields,
+which loads at about 2 µs per fingerprint (about 20 ms for 10,000). It records
+the `parser_signature()` under which it was built, together with the Python
+version (marshal's format may change from one Python version to the next);
+loading an artifact built under a different ua-parser regex set, with a
+different version of this package, or by a different Python version raises
+ValueError rather than serving stale fingerprints. Records of the wrong shape
+(e.g., in a damaged file that still unmarshals) are skipped.
+"""
+
+import argparse
+import collections
+import json
+import marshal
+import os
+import sys
+import time
+
+from . import ua_fingerprint
+from . persistent_cache import parser_signature
+from . text_input import open_text
+from . ua_fingerprint import _SERIALIZED_ATTRIBUTES, ClientFingerprint
+
+ARTIFACT_FORMAT_VERSION = 1
+_ARTIFACT_MAGIC = b"UAFP"
+
+# The classes that a field of a record may have (see ClientFingerprint._set_fields())
+_FIELD_CLASSES = frozenset((str, int, type(None)))
+
+
+def _artifact_signature(signature):
+    """
+    Returns the signature recorded in an artifact built under the parser
+    signature by this Python version.
+    """
+
+    (major, minor) = sys.version_info[:2]
+    return f"{signature};python={major}.{minor}"
+
+
+def most_common_user_agent_strings(ua_strings, top = None):
+    """
+    Returns the distinct strings of the iterable ua_strings, most frequent
+    first (ties in order of first occurrence), limited to the top ones if top
+    is not None.
+    """
+
+    return [ua_string for (ua_string, _) in collections.Counter(ua_strings).most_common(top)]
+
+
+def build_fingerprint_artifact(ua_strings, path, *, top = None):
+    """
+    Parses the top most common strings of the iterable ua_strings (all of
+    them if top is None) and writes their fingerprints to the artifact file at
+    path, replacing it atomically.
+
+    Returns the number of fingerprints written.
+    """
+
+    fields = [tuple(getattr(fingerprint, attribute) for attribute in _SERIALIZED_ATTRIBUTES)
+              for fingerprint in map(ClientFingerprint, most_common_user_agent_strings(ua_strings, top))]
+    payload = marshal.dumps((ARTIFACT_FORMAT_VERSION, _artifact_signature(parser_signature()), fields))
+
+    path = os.fspath(path)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as artifact_file:
+        artifact_file.write(_ARTIFACT_MAGIC)
+        artifact_file.write(payload)
+    os.replace(temporary_path, path)
+    return len(fields)
+
+
+def read_fingerprint_artifact(path, *, signature = None):
+    """
+    Returns the list of ClientFingerprint objects stored in the artifact file
+    at path.
+
+    Raises ValueError if the file is not a fingerprint artifact of the current
+    format version, or if it was built under a parser signature other than
+    signature (by default, the current `parser_signature()`) or by another
+    Python version. Records of the wrong shape are skipped.
+    """
+
+    with open(path, "rb") as artifact_file:
+        data = artifact_file.read()
+
+    if not data.startswith(_ARTIFACT_MAGIC):
+        raise ValueError(f"{os.fspath(path)!r} is not a fingerprint artifact")
+    try:
+        (format_version, artifact_signature, fields) = marshal.loads(data[len(_ARTIFACT_MAGIC):])
+    except (EOFError, TypeError, ValueError):
+        raise ValueError(f"{os.fspath(path)!r} is a corrupt fingerprint artifact") from None
+    if fields.__class__ is not list:
+        raise ValueError(f"{os.fspath(path)!r} is a corrupt fingerprint artifact")
+
+    if format_version != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(f"fingerprint artifact format {format_version} is not {ARTIFACT_FORMAT_VERSION}")
+    if signature is None:
+        signature = parser_signature()
+    signature = _artifact_signature(signature)
+    if artifact_signature != signature:
+        raise ValueError(f"fingerprint artifact was built under {artifact_signature!r}, not {signature!r}; "
+                         "rebuild it")
+
+    new = ClientFingerprint.__new__
+    (number_of_fields, field_classes) = (len(_SERIALIZED_ATTRIBUTES), _FIELD_CLASSES)
+    fingerprints = []
+    for values in fields:
+        if ((values.__class__ is not tuple) or (len(values) != number_of_fields) or (values[0].__class__ is not str)
+                or not field_classes.issuperset(map(type, values))):
+            continue
+        fingerprint = new(ClientFingerprint)
+        fingerprint._set_fields(*values)
+        fingerprints.append(fingerprint)
+    return fingerprints
+
+
+def load_fingerprint_artifact(path):
+    """
+    Replaces the precomputed fingerprints consulted by
+    `get_client_fingerprint()` with those in the artifact file at path.
+
+    Returns the number of fingerprints loaded. Raises ValueError as
+    `read_fingerprint_artifact()` does, leaving the precomputed fingerprints
+    unchanged.
+    """
+
+    fingerprints = read_fingerprint_artifact(path)
+    ua_fingerprint._precomputed_fingerprints = {fingerprint.string: fingerprint for fingerprint in fingerprints}
+    return len(fingerprints)
+
+
+def clear_precomputed_fingerprints():
+    """
+    Discards the precomputed fingerprints. (Copies already taken into the
+    fingerprint cache remain there until evicted or cleared.)
+    """
+
+    ua_fingerprint._precomputed_fingerprints = {}
+
+
+def read_user_agent_strings(text_stream):
+    """
+    Yields each non-blank line of text_stream, without its line ending.
+    """
+
+    for line in text_stream:
+        ua_string = line.rstrip("\r\n")
+        if ua_string.strip():
+            yield ua_string
+
+
+def build_argument_parser(parser = None):
+    """
+    Adds the precompute options to parser (or to a new ArgumentParser).
+    """
+
+    if parser is None:
+        parser = argparse.ArgumentParser(prog="python -m compare_user_agent_strings precompute",
+                                         description="Precompute the fingerprints of the most common "
+                                                     "user-agent strings into a fast-loading artifact.")
+    parser.add_argument("input", help="file of user-agent strings, one per line, optionally .gz; '-' for stdin")
+    parser.add_argument("--output", "-o", required=True, help="artifact file to write")
+    parser.add_argument("--top", type=int, default=None,
+                        help="keep only the N most frequent strings (default: all distinct strings)")
+    return parser
+
+
+def run_from_arguments(arguments):
+    if (arguments.top is not None) and (arguments.top < 1):
+        raise SystemExit(f"--top must be >= 1, not {arguments.top}")
+
+    start = time.perf_counter()
+    with open_text(arguments.input) as text_stream:
+        written = build_fingerprint_artifact(read_user_agent_strings(text_stream), arguments.output,
+                                             top=arguments.top)
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    read_fingerprint_artifact(arguments.output)
+    load_seconds = time.perf_counter() - start
+
+    summary = {"output": arguments.output,
+               "fingerprints": written,
+               "bytes": os.path.getsize(arguments.output),
+               "build_seconds": build_seconds,
+               "load_seconds": load_seconds,
+               "signature": _artifact_signature(parser_signature()),
+              }
+    json.dump(summary, sys.stdout, indent=4)
+    sys.stdout.write("\n")
+    return 0
+
+
+def main(argv = None):
+    return run_from_arguments(build_argument_parser().parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
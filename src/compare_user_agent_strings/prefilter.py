@@ -0,0 +1,120 @@
+"""
+Classifies common desktop user-agent strings lexically, without running
+ua-parser's regex cascade, so that many non-strict comparisons can be decided
+without parsing.
+
+Exposes publicly:
+    LexicalFingerprint(identity, versions)
+    classify_user_agent_string(ua_string)
+    PARSED_IDENTITIES
+
+Each template below matches, in full, one exact shape of user-agent string
+sent by a current desktop browser (Firefox, Chrome, or Safari on macOS,
+Windows, or Linux), with only its version numbers varying. For a string that
+matches a template, ua-parser is known to return:
+    * an os_family and a user_agent_family determined by the template alone,
+      and different for every template; and
+    * for the macOS templates, the OS and browser major and minor versions
+      that appear in the string; for the Linux templates, no OS version and
+      the browser versions that appear in the string; for the Windows
+      templates, the browser versions that appear in the string and OS
+      versions determined by the "Windows NT x.y" token (which ua-parser maps
+      onto release names, e.g., 6.1 onto 7, 5.1 onto XP).
+
+`classify_user_agent_string()` returns a LexicalFingerprint whose identity is
+(template name, Windows NT token or None) and whose versions are (os_major,
+os_minor, user_agent_major, user_agent_minor), with the OS versions None
+where they cannot be read off the string (Linux, Windows). Two strings that
+match different templates therefore differ in identity (and are
+incompatible); two strings that match the same template, with the same
+Windows NT token if any, have the same parsed identity, and their parsed
+versions compare exactly as the lexical ones do. For any other string, or
+two Windows strings with different NT tokens, the caller must parse.
+
+The templates are deliberately narrow (e.g., Edge, Opera, and Ubuntu Firefox
+strings, which add or change a token, do not match) and are checked against
+ua-parser by tests/test_prefilter.py.
+"""
+
+import re
+from collections import namedtuple
+
+LexicalFingerprint = namedtuple("LexicalFingerprint", ("identity", "versions"))
+
+# (template name, pattern, True if the OS versions are in groups 1 and 2 / False if group 1 is the Windows NT token /
+# None if the string has no OS version); the browser major and minor versions are always the last two groups.
+_TEMPLATES = (
+    ("firefox_mac",
+     r"Mozilla/5\.0 \(Macintosh; Intel Mac OS X (\d+)[._](\d+)(?:[._]\d+)?; rv:\d+\.\d+\) Gecko/20100101 "
+     r"Firefox/(\d+)\.(\d+)",
+     True),
+    ("chrome_mac",
+     r"Mozilla/5\.0 \(Macintosh; Intel Mac OS X (\d+)_(\d+)(?:_\d+)?\) AppleWebKit/537\.36 \(KHTML, like Gecko\) "
+     r"Chrome/(\d+)\.(\d+)\.\d+\.\d+ Safari/537\.36",
+     True),
+    ("safari_mac",
+     r"Mozilla/5\.0 \(Macintosh; Intel Mac OS X (\d+)_(\d+)(?:_\d+)?\) AppleWebKit/605\.1\.15 \(KHTML, like Gecko\) "
+     r"Version/(\d+)\.(\d+)(?:\.\d+)? Safari/605\.1\.15",
+     True),
+    ("firefox_windows",
+     r"Mozilla/5\.0 \(Windows NT (\d+\.\d+)(?:; Win64; x64|; WOW64)?; rv:\d+\.\d+\) Gecko/20100101 "
+     r"Firefox/(\d+)\.(\d+)",
+     False),
+    ("chrome_windows",
+     r"Mozilla/5\.0 \(Windows NT (\d+\.\d+)(?:; Win64; x64|; WOW64)?\) AppleWebKit/537\.36 \(KHTML, like Gecko\) "
+     r"Chrome/(\d+)\.(\d+)\.\d+\.\d+ Safari/537\.36",
+     False),
+    ("firefox_linux",
+     r"Mozilla/5\.0 \(X11; Linux x86_64; rv:\d+\.\d+\) Gecko/20100101 Firefox/(\d+)\.(\d+)",
+     None),
+    ("chrome_linux",
+     r"Mozilla/5\.0 \(X11; Linux x86_64\) AppleWebKit/537\.36 \(KHTML, like Gecko\) "
+     r"Chrome/(\d+)\.(\d+)\.\d+\.\d+ Safari/537\.36",
+     None),
+    )
+
+# What ua-parser returns for (device_brand, device_family, device_model, os_family, user_agent_family) for every
+# string that matches each template (see `attributes_that_must_be_equal` in ua_fingerprint.py)
+PARSED_IDENTITIES = {
+    "firefox_mac": ("Apple", "Mac", "Mac", "Mac OS X", "Firefox"),
+    "chrome_mac": ("Apple", "Mac", "Mac", "Mac OS X", "Chrome"),
+    "safari_mac": ("Apple", "Mac", "Mac", "Mac OS X", "Safari"),
+    "firefox_windows": (None, "Other", None, "Windows", "Firefox"),
+    "chrome_windows": (None, "Other", None, "Windows", "Chrome"),
+    "firefox_linux": (None, "Other", None, "Linux", "Firefox"),
+    "chrome_linux": (None, "Other", None, "Linux", "Chrome"),
+    }
+
+# The templates, grouped by the browser token that every string they match contains, tried in that order.
+_TEMPLATES_BY_BROWSER_TOKEN = (
+    ("Firefox/", tuple((name, re.compile(pattern).fullmatch, os_versions)
+                       for (name, pattern, os_versions) in _TEMPLATES if name.startswith("firefox"))),
+    ("Chrome/", tuple((name, re.compile(pattern).fullmatch, os_versions)
+                      for (name, pattern, os_versions) in _TEMPLATES if name.startswith("chrome"))),
+    ("Version/", tuple((name, re.compile(pattern).fullmatch, os_versions)
+                       for (name, pattern, os_versions) in _TEMPLATES if name.startswith("safari"))),
+    )
+
+
+def classify_user_agent_string(ua_string):
+    """
+    Returns the LexicalFingerprint of ua_string if it matches one of the
+    templates, and otherwise None.
+    """
+
+    for (browser_token, templates) in _TEMPLATES_BY_BROWSER_TOKEN:
+        if browser_token not in ua_string:
+            continue
+        for (name, fullmatch, os_versions) in templates:
+            match = fullmatch(ua_string)
+            if match is None:
+                continue
+            groups = match.groups()
+            if os_versions:
+                return LexicalFingerprint((name, None),
+                                          (int(groups[0]), int(groups[1]), int(groups[2]), int(groups[3])))
+            if os_versions is None:
+                return LexicalFingerprint((name, None), (None, None, int(groups[0]), int(groups[1])))
+            return LexicalFingerprint((name, groups[0]), (None, None, int(groups[1]), int(groups[2])))
+        return None
+    return None
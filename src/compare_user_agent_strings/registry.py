@@ -0,0 +1,204 @@
+"""
+Interns fingerprints as small integer ids, so that a process can keep the
+baseline fingerprint of millions of live sessions in memory proportional to
+the number of *distinct* user-agent strings rather than to the number of
+sessions.
+
+Exposes publicly:
+    FingerprintRegistry(*, max_fingerprints = 1_000_000)
+    RegistryFull
+
+Each distinct user-agent string interned gets the next id (0, 1, 2, ...).
+The registry keeps, per id, only:
+    * the user-agent string (needed for the equality test of every check);
+    * the code of its identity, (device_brand, device_family, device_model,
+      os_family, user_agent_family), in an array of unsigned ints indexing a
+      table of the distinct identity tuples; and
+    * the code of its versions, (os_major, os_minor, user_agent_major,
+      user_agent_minor), in a second array indexing a table of the distinct
+      version tuples.
+A session then stores just its baseline id, e.g., in an `array("I")` or a
+field of the session record. Checks read the two tables and apply the same
+decision kernel as `fingerprint_is_compatible()`, so that a check of a known
+string neither parses nor allocates a fingerprint.
+
+Ids are meaningful only within the registry (and process) that issued them.
+Only baselines are interned: `is_compatible()` decides a current string that
+the registry does not hold without interning it, parsing only that string
+(the baseline side is read from the tables). Entries are never removed,
+so `intern()` raises RegistryFull once max_fingerprints strings have been
+interned; the caller can then fall back to storing the serialized
+fingerprint (see `ClientFingerprint.to_bytes()`).
+"""
+
+import threading
+from array import array
+from collections import namedtuple
+
+from . ua_fingerprint import analyze_parsed_fingerprints, fingerprint_is_compatible, get_client_fingerprint
+
+# What the decision kernel reads from a fingerprint
+_IdentityAndVersions = namedtuple("_IdentityAndVersions", ("identity", "versions"))
+
+# What `fingerprint_is_compatible()` reads from a baseline fingerprint
+_BaselineFingerprint = namedtuple("_BaselineFingerprint", ("string", "identity", "versions"))
+
+
+class RegistryFull(RuntimeError):
+    """
+    Raised when a new user-agent string would be interned in a registry that
+    already holds max_fingerprints of them.
+    """
+
+
+class FingerprintRegistry():
+    """
+    Maps each distinct user-agent string to a small integer id, backed by
+    array tables of identity and version codes (see the module docstring).
+    Thread-safe.
+    """
+
+    def __init__(self, *, max_fingerprints = 1_000_000):
+        if max_fingerprints < 1:
+            raise ValueError(f"max_fingerprints must be >= 1, not {max_fingerprints!r}")
+
+        self.max_fingerprints = max_fingerprints
+        self._lock = threading.Lock()
+        self._id_by_string = {}
+        self._strings = []
+        # Codes indexed by id
+        self._identity_codes = array("I")
+        self._version_codes = array("I")
+        # The distinct identity and version tuples, indexed by code, and the reverse maps
+        self._identities = []
+        self._versions = []
+        self._identity_code_by_identity = {}
+        self._version_code_by_versions = {}
+
+    def __len__(self):
+        return len(self._strings)
+
+    def __contains__(self, ua_string):
+        return ua_string in self._id_by_string
+
+    def intern(self, ua_string):
+        """
+        Returns the id of ua_string, first interning it (which parses it
+        unless its fingerprint is cached) if it is new.
+
+        Raises RegistryFull if it is new and the registry is full.
+        """
+
+        fingerprint_id = self._id_by_string.get(ua_string)
+        if fingerprint_id is not None:
+            return fingerprint_id
+
+        fingerprint = get_client_fingerprint(ua_string)
+
+        with self._lock:
+            fingerprint_id = self._id_by_string.get(ua_string)
+            if fingerprint_id is not None:
+                return fingerprint_id
+            if len(self._strings) >= self.max_fingerprints:
+                raise RegistryFull(f"the registry already holds {len(self._strings)} fingerprints")
+
+            identity_code = self._identity_code_by_identity.get(fingerprint.identity)
+            if identity_code is None:
+                identity_code = self._identity_code_by_identity[fingerprint.identity] = len(self._identities)
+                self._identities.append(fingerprint.identity)
+            version_code = self._version_code_by_versions.get(fingerprint.versions)
+            if version_code is None:
+                version_code = self._version_code_by_versions[fingerprint.versions] = len(self._versions)
+                self._versions.append(fingerprint.versions)
+
+            self._identity_codes.append(identity_code)
+            self._version_codes.append(version_code)
+            fingerprint_id = len(self._strings)
+            self._strings.append(fingerprint.string)
+            # Published last, so that a reader that finds the id also finds its table entries.
+            self._id_by_string[fingerprint.string] = fingerprint_id
+            return fingerprint_id
+
+    def id_of(self, ua_string):
+        """
+        Returns the id of ua_string, or None if it has not been interned.
+        """
+
+        return self._id_by_string.get(ua_string)
+
+    def string(self, fingerprint_id):
+        return self._strings[fingerprint_id]
+
+    def identity(self, fingerprint_id):
+        return self._identities[self._identity_codes[fingerprint_id]]
+
+    def versions(self, fingerprint_id):
+        return self._versions[self._version_codes[fingerprint_id]]
+
+    def fingerprint(self, fingerprint_id):
+        """
+        Returns the full ClientFingerprint of an id (from the fingerprint
+        cache, or by parsing its string again).
+        """
+
+        return get_client_fingerprint(self._strings[fingerprint_id])
+
+    def ids_are_compatible(self, baseline_id, current_id, *, strict = False):
+        """
+        Same decision as `user_agent_strings_are_compatible()` for the strings
+        of two ids.
+        """
+
+        if baseline_id == current_id:
+            return True
+        # Distinct ids have distinct strings.
+        if strict:
+            return False
+
+        identity_codes = self._identity_codes
+        if identity_codes[baseline_id] != identity_codes[current_id]:
+            # Only an upgrade leads to the identity comparison, which then fails: incompatible either way.
+            return False
+
+        identity = self._identities[identity_codes[baseline_id]]
+        return analyze_parsed_fingerprints(
+                   _IdentityAndVersions(identity, self._versions[self._version_codes[baseline_id]]),
+                   _IdentityAndVersions(identity, self._versions[self._version_codes[current_id]]))
+
+    def is_compatible(self, baseline_id, current_ua_string, *, strict = False):
+        """
+        Same decision as `fingerprint_is_compatible()` for the baseline id and
+        the current user-agent string. The current string is never interned:
+        if the registry does not hold it, it is decided from its fingerprint
+        (from the fingerprint cache, or parsed), so that checks of novel
+        strings (e.g., from bots) neither fill the registry nor fail once it
+        is full. The baseline is never parsed again: its side of the decision
+        is read from the tables. Intern a string only when it becomes a
+        baseline.
+        """
+
+        if self._strings[baseline_id] == current_ua_string:
+            return True
+        if strict:
+            return False
+
+        current_id = self._id_by_string.get(current_ua_string)
+        if current_id is None:
+            baseline_fingerprint = _BaselineFingerprint(self._strings[baseline_id], self.identity(baseline_id),
+                                                        self.versions(baseline_id))
+            return fingerprint_is_compatible(baseline_fingerprint, current_ua_string)
+        return self.ids_are_compatible(baseline_id, current_id)
+
+    def info(self):
+        """
+        Returns a dict of the numbers of interned fingerprints and of distinct
+        identity and version tuples, and the bytes taken by the code arrays.
+        """
+
+        return {"fingerprints": len(self._strings),
+                "max_fingerprints": self.max_fingerprints,
+                "distinct_identities": len(self._identities),
+                "distinct_versions": len(self._versions),
+                "code_array_bytes": (self._identity_codes.itemsize * len(self._identity_codes)
+                                     + self._version_codes.itemsize * len(self._version_codes)),
+               }
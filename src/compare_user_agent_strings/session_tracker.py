@@ -0,0 +1,210 @@
+"""
+Tracks the user-agent history of live sessions, advancing each session's
+accepted baseline whenever an upgrade is approved.
+
+Exposes publicly:
+    SessionTracker(*, history_length = 8, registry = None)
+
+The comparison functions are stateless: every request of a session is
+compared with the user-agent string the session started with. After a
+legitimate upgrade (e.g., Firefox 105.1 to 106.0), every later request of the
+session therefore differs from that stale baseline and takes the full
+non-strict decision path again. A SessionTracker instead keeps, per session,
+the short history of the user-agent strings it has accepted, the last of
+which is the baseline. `observe()` then:
+    * starts the history of a session it has not seen (BASELINE_RECORDED);
+    * accepts a request whose user-agent string is identical to the baseline
+      with one string comparison (IDENTICAL);
+    * with strict=False, accepts an upgrade of the baseline (COMPATIBLE) and
+      appends it to the history, so that it becomes the baseline and the
+      following requests of the session are IDENTICAL again; and
+    * otherwise answers INCOMPATIBLE, leaving the history unchanged (revoking
+      the session, with `end_session()`, is up to the caller).
+The verdicts are those of middleware.py. A history holds at most
+history_length strings; the oldest is dropped first.
+
+Advancing the baseline makes the check stricter, not looser: once a session
+has been seen with Firefox 106.0, a later request from Firefox 105.1 is a
+downgrade and is refused, although it would match the login-time baseline.
+
+The accepted strings are interned in a FingerprintRegistry (see
+registry.py), so that a history costs a few bytes per entry and no decision
+on known strings parses; a rejected string is never interned. If that
+registry is full, an upgrade to a new string is still accepted, but the
+baseline does not advance. A new session then cannot be started:
+`start_session()` and `observe()` raise RegistryFull.
+
+`snapshot()` returns the histories of all the sessions as user-agent strings,
+in a JSON-serializable dict if the session ids are strings, and `restore()`
+loads such a snapshot in bulk, e.g., into a new process after a restart.
+"""
+
+import threading
+from array import array
+
+from . middleware import BASELINE_RECORDED, COMPATIBLE, IDENTICAL, INCOMPATIBLE
+from . registry import FingerprintRegistry, RegistryFull
+
+_SNAPSHOT_FORMAT = 1
+
+_VERDICTS = (BASELINE_RECORDED, IDENTICAL, COMPATIBLE, INCOMPATIBLE)
+
+
+class SessionTracker():
+    """
+    Keeps the bounded history of accepted user-agent strings of each session
+    (see the module docstring). Thread-safe.
+    """
+
+    def __init__(self, *, history_length = 8, registry = None):
+        if history_length < 1:
+            raise ValueError(f"history_length must be >= 1, not {history_length!r}")
+
+        self.history_length = history_length
+        self.registry = FingerprintRegistry() if registry is None else registry
+        self._lock = threading.Lock()
+        # The registry ids of each session's accepted strings, oldest first; the last is the baseline.
+        self._history_ids = {}
+        self.verdict_counts = dict.fromkeys(_VERDICTS, 0)
+        self.advanced_baselines = 0
+
+    def __len__(self):
+        return len(self._history_ids)
+
+    def __contains__(self, session_id):
+        return session_id in self._history_ids
+
+    def start_session(self, session_id, ua_string):
+        """
+        Makes ua_string the baseline of session_id (e.g., at login),
+        discarding any earlier history.
+        """
+
+        history_ids = array("I", (self.registry.intern(ua_string),))
+        with self._lock:
+            self._history_ids[session_id] = history_ids
+
+    def end_session(self, session_id):
+        """
+        Forgets session_id (e.g., at logout or on revocation).
+        """
+
+        with self._lock:
+            self._history_ids.pop(session_id, None)
+
+    def baseline(self, session_id):
+        """
+        Returns the baseline user-agent string of session_id, or None for an
+        unknown session.
+        """
+
+        history_ids = self._history_ids.get(session_id)
+        return None if history_ids is None else self.registry.string(history_ids[-1])
+
+    def history(self, session_id):
+        """
+        Returns the tuple of the accepted user-agent strings of session_id,
+        oldest first (so that the last is the baseline); empty for an unknown
+        session.
+        """
+
+        history_ids = self._history_ids.get(session_id)
+        if history_ids is None:
+            return ()
+        string = self.registry.string
+        return tuple(string(fingerprint_id) for fingerprint_id in history_ids)
+
+    def observe(self, session_id, ua_string, *, strict = False):
+        """
+        Returns the verdict for a request of session_id with ua_string, and
+        advances the session's baseline if it is an approved upgrade.
+        """
+
+        history_ids = self._history_ids.get(session_id)
+        if history_ids is None:
+            self.start_session(session_id, ua_string)
+            verdict = BASELINE_RECORDED
+        else:
+            verdict = self._observe_known_session(history_ids, ua_string, strict)
+        self.verdict_counts[verdict] += 1
+        return verdict
+
+    def _observe_known_session(self, history_ids, ua_string, strict):
+        registry = self.registry
+        baseline_id = history_ids[-1]
+        if registry.string(baseline_id) == ua_string:
+            return IDENTICAL
+        if strict:
+            return INCOMPATIBLE
+
+        # Decided before interning, so that rejected strings never enter the registry
+        if not registry.is_compatible(baseline_id, ua_string):
+            return INCOMPATIBLE
+        try:
+            current_id = registry.intern(ua_string)
+        except RegistryFull:
+            return COMPATIBLE
+
+        with self._lock:
+            # Unless a concurrent request of the session has already moved the baseline
+            if history_ids[-1] == baseline_id:
+                history_ids.append(current_id)
+                if len(history_ids) > self.history_length:
+                    del history_ids[0]
+                self.advanced_baselines += 1
+        return COMPATIBLE
+
+    def snapshot(self):
+        """
+        Returns {"format": ..., "history_length": ..., "sessions":
+        {session_id: [ua_string, ...], ...}}, with each session's history
+        oldest first.
+        """
+
+        with self._lock:
+            history_ids_by_session = [(session_id, history_ids.tolist())
+                                      for (session_id, history_ids) in self._history_ids.items()]
+
+        string = self.registry.string
+        return {"format": _SNAPSHOT_FORMAT,
+                "history_length": self.history_length,
+                "sessions": {session_id: [string(fingerprint_id) for fingerprint_id in history_ids]
+                             for (session_id, history_ids) in history_ids_by_session},
+               }
+
+    def restore(self, snapshot):
+        """
+        Loads the histories of a snapshot (see `snapshot()`), replacing those
+        of the same sessions and keeping the others. A history longer than
+        history_length keeps its newest strings.
+
+        Raises ValueError for a snapshot of an unknown format, and
+        RegistryFull if its strings do not all fit in the registry.
+        """
+
+        if snapshot.get("format") != _SNAPSHOT_FORMAT:
+            raise ValueError(f"unknown session snapshot format: {snapshot.get('format')!r}")
+
+        intern = self.registry.intern
+        history_ids_by_session = {}
+        for (session_id, ua_strings) in snapshot["sessions"].items():
+            if not ua_strings:
+                raise ValueError(f"session {session_id!r} has an empty history")
+            history_ids_by_session[session_id] = array("I", [intern(ua_string)
+                                                              for ua_string in ua_strings[-self.history_length:]])
+
+        with self._lock:
+            self._history_ids.update(history_ids_by_session)
+
+    def info(self):
+        """
+        Returns a dict of the number of tracked sessions, the count of each
+        verdict, the number of baselines advanced, and the registry's
+        statistics.
+        """
+
+        return {"sessions": len(self._history_ids),
+                "verdicts": dict(self.verdict_counts),
+                "advanced_baselines": self.advanced_baselines,
+                "registry": self.registry.info(),
+               }
@@ -0,0 +1,34 @@
+"""
+Opens the line-oriented text inputs of the command-line tools (access logs for
+log_replay.py, samples of user-agent strings for precompute.py) as streams.
+
+Exposes publicly:
+    open_text(path)
+    READ_BUFFER_SIZE
+
+Inputs are read through a large read buffer, so that the tools can stream
+files of any size one line at a time; gzip-compressed files and standard
+input are supported.
+"""
+
+import gzip
+import io
+import sys
+
+READ_BUFFER_SIZE = 1 << 20
+
+
+def open_text(path):
+    """
+    Opens path ("-" for standard input; gzip-compressed if it ends in .gz) as a
+    buffered UTF-8 text stream. Undecodable bytes are replaced rather than
+    aborting the read.
+    """
+
+    if path == "-":
+        return io.TextIOWrapper(io.BufferedReader(sys.stdin.buffer, READ_BUFFER_SIZE),
+                                encoding="utf-8", errors="replace", newline="")
+    if path.lower().endswith(".gz"):
+        return io.TextIOWrapper(io.BufferedReader(gzip.open(path, "rb"), READ_BUFFER_SIZE),
+                                encoding="utf-8", errors="replace", newline="")
+    return open(path, "r", encoding="utf-8", errors="replace", newline="", buffering=READ_BUFFER_SIZE)
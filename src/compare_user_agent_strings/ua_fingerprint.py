@@ -2,11 +2,29 @@
 Compares two successive user-agent string to determine whether the second is
 plausibly consistent with the second.
 
-Exposes three functions publicly:
+Exposes the following functions publicly:
     print_parsed_user_agent_string(ua_string)
     user_agent_strings_are_compatible_strictly(ua_string_1, ua_string_2)
     user_agent_strings_are_compatible(ua_string_1, ua_string_2, *,
                                       strict = False)
+    fingerprint_is_compatible(baseline_fingerprint, current, *,
+                              strict = False)
+    get_client_fingerprint(ua_string)
+    is_fingerprint_cached(ua_string)
+    configure_fingerprint_cache(maxsize, *, policy = "lru")
+    fingerprint_cache_info()
+    fingerprint_source_info()
+    clear_fingerprint_cache()
+    configure_persistent_fingerprint_cache(path, **options)
+    persistent_fingerprint_cache_info()
+    warm_up(ua_strings = ())
+    configure_lexical_prefilter(enabled)
+    configure_pair_decision_cache(maxsize, *, policy = "lru")
+    pair_decision_cache_info()
+    explain_compatibility(ua_string_1, ua_string_2, *, strict = False)
+    explain_fingerprint_compatibility(baseline_fingerprint, current, *,
+                                      strict = False)
+and the classes ClientFingerprint, ComparisonResult, and Reason,
 where:
     ua_string, ua_string_1, ua_string_2 are user-agent strings such as:
         'Mozilla/4.0 (compatible; MSIE 6.0; Windows NT 5.1; SV1)'
@@ -67,53 +85,669 @@ causing the cookie to be deleted.
 a downgrade, the standard of compatibility is the strict one: exact string 
 equality. I.e., comparing components of parsed strings only has effect when it
 turns out that the browser and/or OS was upgraded and neither downgraded.)
+
+Parsing a user-agent string with ua-parser is by far the most expensive step,
+so parsed fingerprints are kept in a process-wide, size-bounded, thread-safe
+cache keyed by the raw user-agent string (see `get_client_fingerprint()`).
+The cache's capacity and eviction policy can be changed with
+`configure_fingerprint_cache()`; its hit/miss/eviction counters are reported
+by `fingerprint_cache_info()`; and it is emptied by `clear_fingerprint_cache()`.
+Optionally, `configure_persistent_fingerprint_cache(path)` backs the
+in-memory cache with an SQLite file shared by all processes and surviving
+restarts (see persistent_cache.py), and fingerprints precomputed for the most
+common user-agent strings can be loaded at start-up (see precompute.py);
+`fingerprint_source_info()` reports how many lookups each source served.
+
+Non-strict decisions on pairs of differing strings are memoized in a second
+size-bounded cache, keyed by the pair of strings, so that a pair shared by many
+sessions (e.g., everyone moving from one browser version to the next in the
+same week) is analyzed once; see `configure_pair_decision_cache()` and
+`pair_decision_cache_info()`.
+
+Before parsing a string that is not cached, a non-strict comparison tries a
+lexical prefilter (see prefilter.py), which decides most comparisons between
+common desktop browser strings exactly as parsing would, but about a thousand
+times faster; `configure_lexical_prefilter(False)` turns it off.
+
+Importing this module does not import ua_parser, whose import compiles the
+whole regex table; that happens on the first parse, or earlier, at a moment of
+your choosing (e.g., before forking worker processes), by calling `warm_up()`.
+Strings are parsed by ua_parser's legacy `user_agent_parser.Parse()` unless
+another engine has been selected with `configure_parser_backend()` (see
+backends.py).
+
+`fingerprint_is_compatible()` makes the same decision as
+`user_agent_strings_are_compatible()` but accepts an already-built
+ClientFingerprint for the first (and optionally the second) user-agent string,
+e.g., one restored with `ClientFingerprint.from_bytes()` from the session
+record, so that the login-time string need never be reparsed.
+
+`explain_compatibility()` and `explain_fingerprint_compatibility()` make the
+same decisions as those two functions, in the same single pass, but return a
+ComparisonResult, which also carries a Reason (e.g., Reason.DOWNGRADE), the
+attribute that decided the comparison, and the compared version tuples.
 """
 
-import pprint
+import sys
+from enum import Enum
+from time import perf_counter
+
+from . bounded_cache import BoundedCache
 
 # pip install ua-parser
-# The following import caused a problem after I added relative import statements into __init__.py.
-# Moving the import into the constructor for ClientFingerprint for some reason fixed the problem.
-#
-# File "/Volumes/Avocado/Users/ada/Documents/GitHub_repos/compare-user-agent-strings-python/src/compare_user_agent_strings/__init__.py", line 7, in <module>
-#   from ua_parser import user_agent_parser
-#   ModuleNotFoundError: No module named 'ua_parser'
-# vvvvvvvvvvvvvvv
-# from ua_parser import user_agent_parser
+# ua_parser is imported lazily, by _load_ua_parser(), rather than at the top of this module: importing it compiles
+# its whole regex table (about 0.3 s), which `import compare_user_agent_strings` should not pay. (Importing it here
+# also once failed with "ModuleNotFoundError: No module named 'ua_parser'" when run through __init__.py.)
+# Call warm_up() to pay that cost at a moment of your choosing.
+_user_agent_parser = None
+
+# The function that parses a user-agent string into a dict of the form returned by user_agent_parser.Parse(), if
+# another backend than ua_parser's legacy Parse() has been configured (see backends.py); None for the default.
+_parser_backend = None
+
+
+def _load_ua_parser():
+    """
+    Imports ua_parser on first use; returns its user_agent_parser module.
+    """
+
+    global _user_agent_parser
+
+    if _user_agent_parser is None:
+        from ua_parser import user_agent_parser
+        _user_agent_parser = user_agent_parser
+    return _user_agent_parser
+
+
+# Version components (major, minor, ...) are stored as int whenever int() accepts them, which is exactly the
+# conversion the comparison applies, and otherwise as the original value (a non-numeric string such as "XP", or None).
+def _int_if_possible(version_component):
+    try:
+        return int(version_component)
+    except (ValueError, TypeError):
+        return version_component
+
+
+def _str_if_int(version_component):
+    if version_component.__class__ is int:
+        return str(version_component)
+    return version_component
+
+
+# Family/brand/model strings repeat across a great many fingerprints; interning makes them all share one object.
+def _intern_if_string(value):
+    if value.__class__ is str:
+        return sys.intern(value)
+    return value
+
+
+# Tags of the compact binary serialization of a field (see ClientFingerprint.to_bytes())
+_TAG_NONE = 0
+_TAG_NONNEGATIVE_INT = 1
+_TAG_NEGATIVE_INT = 2
+_TAG_STRING = 3
+
+SERIALIZATION_FORMAT_VERSION = 1
+
+
+def _append_varint(buffer, number):
+    """
+    Appends a nonnegative int to buffer as an unsigned LEB128 varint.
+    """
+
+    while number > 0x7F:
+        buffer.append((number & 0x7F) | 0x80)
+        number >>= 7
+    buffer.append(number)
+
+
+def _read_varint(data, position):
+    """
+    Reads an unsigned LEB128 varint from data at position.
+
+    Returns a tuple (number, position_after_the_varint).
+    """
+
+    number = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        number |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return (number, position)
+        shift += 7
+
+
+# The attributes compared by the non-strict analysis, in the order of ClientFingerprint.identity and
+# ClientFingerprint.versions, respectively.
+attributes_that_must_be_equal = ("device_brand",
+                                 "device_family",
+                                 "device_model",
+                                 "os_family",
+                                 "user_agent_family",
+                                )
+version_attributes_compared = ("os_major",
+                               "os_minor",
+                               "user_agent_major",
+                               "user_agent_minor",
+                              )
+
+# All attributes of a fingerprint, in the (stable) order of its binary serialization
+_SERIALIZED_ATTRIBUTES = ("string",
+                          "device_brand",
+                          "device_family",
+                          "device_model",
+                          "os_family",
+                          "os_major",
+                          "os_minor",
+                          "os_patch",
+                          "os_patch_minor",
+                          "user_agent_family",
+                          "user_agent_major",
+                          "user_agent_minor",
+                          "user_agent_patch",
+                         )
+
+# Distinct identity and version tuples are far fewer than distinct user-agent strings, so fingerprints share
+# canonical tuple objects. (This also lets the comparison short-circuit on identity.) The table is bounded so that
+# a flood of unusual user-agent strings cannot grow it without limit; beyond the bound, tuples are simply not shared.
+_SHARED_TUPLES_LIMIT = 65536
+_shared_tuples = {}
+
+
+def _shared_tuple(values):
+    shared = _shared_tuples.get(values)
+    if shared is not None:
+        return shared
+    if len(_shared_tuples) < _SHARED_TUPLES_LIMIT:
+        _shared_tuples[values] = values
+    return values
 
 
 class ClientFingerprint():
     """
     Object records parameters to fingerprint a web client from the user-agent
     string it sent to the server.
+
+    The object is compact: its attributes live in __slots__ (no per-instance
+    __dict__), its family/brand/model strings are interned, and its version
+    components are stored already converted to int when they are numeric
+    (otherwise as the original string, or None). The nested dicts produced by
+    ua-parser are not kept; the `device`, `os`, and `user_agent` properties
+    rebuild them on demand.
+
+    The attributes used by the non-strict comparison are held in two shared
+    tuples:
+        identity    (device_brand, device_family, device_model, os_family,
+                     user_agent_family)
+        versions    (os_major, os_minor, user_agent_major, user_agent_minor)
+    and are also readable individually (e.g., `fingerprint.os_major`).
+
+    A fingerprint can be serialized with `to_bytes()` and restored, without
+    any parsing, with `ClientFingerprint.from_bytes()`; e.g., to store the
+    baseline fingerprint in a session record at login.
     """
 
+    __slots__ = ("string",
+                 "identity",
+                 "versions",
+                 "os_patch",
+                 "os_patch_minor",
+                 "user_agent_patch",
+                )
+
     def __init__(self, uastring):
 
-        # DEBUG (because of an importing problem)
-        from ua_parser import user_agent_parser
+        if _parser_backend is None:
+            parsed_string = (_user_agent_parser or _load_ua_parser()).Parse(uastring)
+        else:
+            parsed_string = _parser_backend(uastring)
+
+        self._set_from_parsed(parsed_string)
+
+    @classmethod
+    def from_parsed(cls, parsed_string):
+        """
+        Builds a fingerprint from a dict of the form returned by
+        `ua_parser.user_agent_parser.Parse()`, without parsing anything.
+        """
+
+        fingerprint = cls.__new__(cls)
+        fingerprint._set_from_parsed(parsed_string)
+        return fingerprint
+
+    def _set_from_parsed(self, parsed_string):
+
+        device = parsed_string["device"]
+        os = parsed_string["os"]
+        user_agent = parsed_string["user_agent"]
+
+        self._set_fields(parsed_string["string"],
+                         device["brand"],
+                         device["family"],
+                         device["model"],
+                         os["family"],
+                         _int_if_possible(os["major"]),
+                         _int_if_possible(os["minor"]),
+                         _int_if_possible(os["patch"]),
+                         _int_if_possible(os["patch_minor"]),
+                         user_agent["family"],
+                         _int_if_possible(user_agent["major"]),
+                         _int_if_possible(user_agent["minor"]),
+                         _int_if_possible(user_agent["patch"]),
+                        )
+
+    def _set_fields(self, string,
+                          device_brand, device_family, device_model,
+                          os_family, os_major, os_minor, os_patch, os_patch_minor,
+                          user_agent_family, user_agent_major, user_agent_minor, user_agent_patch):
+        # Arguments are in _SERIALIZED_ATTRIBUTES order; version components must already be normalized.
+
+        self.string = string
+        self.identity = _shared_tuple((_intern_if_string(device_brand),
+                                       _intern_if_string(device_family),
+                                       _intern_if_string(device_model),
+                                       _intern_if_string(os_family),
+                                       _intern_if_string(user_agent_family),
+                                      ))
+        self.versions = _shared_tuple((os_major, os_minor, user_agent_major, user_agent_minor))
+        self.os_patch = os_patch
+        self.os_patch_minor = os_patch_minor
+        self.user_agent_patch = user_agent_patch
+
+    # Individual identity and version attributes
+
+    device_brand = property(lambda self: self.identity[0])
+    device_family = property(lambda self: self.identity[1])
+    device_model = property(lambda self: self.identity[2])
+    os_family = property(lambda self: self.identity[3])
+    user_agent_family = property(lambda self: self.identity[4])
+
+    os_major = property(lambda self: self.versions[0])
+    os_minor = property(lambda self: self.versions[1])
+    user_agent_major = property(lambda self: self.versions[2])
+    user_agent_minor = property(lambda self: self.versions[3])
+
+    # The nested dicts of ua-parser's output, rebuilt on demand (numeric version components are rendered as strings)
+
+    @property
+    def device(self):
+        return {"brand": self.device_brand, "family": self.device_family, "model": self.device_model}
+
+    @property
+    def os(self):
+        return {"family": self.os_family,
+                "major": _str_if_int(self.os_major),
+                "minor": _str_if_int(self.os_minor),
+                "patch": _str_if_int(self.os_patch),
+                "patch_minor": _str_if_int(self.os_patch_minor),
+               }
+
+    @property
+    def user_agent(self):
+        return {"family": self.user_agent_family,
+                "major": _str_if_int(self.user_agent_major),
+                "minor": _str_if_int(self.user_agent_minor),
+                "patch": _str_if_int(self.user_agent_patch),
+               }
+
+    def as_dict(self):
+        """
+        Returns the fingerprint in the dict form of `ua_parser.user_agent_parser.Parse()`.
+        """
+
+        return {"device": self.device, "os": self.os, "string": self.string, "user_agent": self.user_agent}
+
+    def _fields(self):
+        return (self.string, self.identity, self.versions, self.os_patch, self.os_patch_minor, self.user_agent_patch)
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    def __hash__(self):
+        return hash(self._fields())
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}.from_parsed({self.as_dict()!r})"
+
+    def to_bytes(self):
+        """
+        Serializes the fingerprint into a compact, stable binary form:
+            one byte        SERIALIZATION_FORMAT_VERSION
+            for each attribute in _SERIALIZED_ATTRIBUTES order:
+                one byte    tag: None, nonnegative int, negative int, or string
+                varint      |int|, or the length of the UTF-8 encoded string
+                bytes       the UTF-8 encoded string (strings only)
+        """
+
+        buffer = bytearray((SERIALIZATION_FORMAT_VERSION,))
+        for attribute in _SERIALIZED_ATTRIBUTES:
+            value = getattr(self, attribute)
+            if value is None:
+                buffer.append(_TAG_NONE)
+            elif value.__class__ is int:
+                if value >= 0:
+                    buffer.append(_TAG_NONNEGATIVE_INT)
+                    _append_varint(buffer, value)
+                else:
+                    buffer.append(_TAG_NEGATIVE_INT)
+                    _append_varint(buffer, -value)
+            else:
+                encoded = value.encode("utf-8", "surrogatepass")
+                buffer.append(_TAG_STRING)
+                _append_varint(buffer, len(encoded))
+                buffer += encoded
+        return bytes(buffer)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Restores a fingerprint serialized by `to_bytes()`, without parsing the
+        user-agent string.
+
+        Raises ValueError if data is not a serialized fingerprint of the
+        current format version.
+        """
+
+        if (not data) or (data[0] != SERIALIZATION_FORMAT_VERSION):
+            raise ValueError("not a serialized ClientFingerprint of format version "
+                             f"{SERIALIZATION_FORMAT_VERSION}")
+
+        values = []
+        position = 1
+        try:
+            for _ in _SERIALIZED_ATTRIBUTES:
+                tag = data[position]
+                position += 1
+                if tag == _TAG_NONE:
+                    value = None
+                elif tag == _TAG_STRING:
+                    (length, position) = _read_varint(data, position)
+                    end = position + length
+                    if end > len(data):
+                        raise IndexError(end)
+                    value = bytes(data[position:end]).decode("utf-8", "surrogatepass")
+                    position = end
+                elif tag == _TAG_NONNEGATIVE_INT:
+                    (value, position) = _read_varint(data, position)
+                elif tag == _TAG_NEGATIVE_INT:
+                    (value, position) = _read_varint(data, position)
+                    value = -value
+                else:
+                    raise ValueError(f"unknown field tag {tag} in serialized ClientFingerprint")
+                values.append(value)
+        except IndexError:
+            raise ValueError("truncated serialized ClientFingerprint") from None
+
+        if position != len(data):
+            raise ValueError("trailing bytes after serialized ClientFingerprint")
+
+        fingerprint = cls.__new__(cls)
+        fingerprint._set_fields(*values)
+        return fingerprint
+
+    def __reduce__(self):
+        # Pickles (e.g., for multiprocessing) via the compact serialization.
+        return (self.__class__.from_bytes, (self.to_bytes(),))
+
+
+# Process-wide cache of ClientFingerprint objects, keyed by the raw user-agent string.
+# A few thousand distinct strings typically account for nearly all traffic.
+DEFAULT_FINGERPRINT_CACHE_SIZE = 4096
+_fingerprint_cache = BoundedCache(DEFAULT_FINGERPRINT_CACHE_SIZE)
+
+# Fingerprints loaded from a precomputed artifact (see precompute.py); never evicted
+_precomputed_fingerprints = {}
+
+# Optional on-disk store consulted on a miss of the in-memory cache (see persistent_cache.py), and the keyword
+# options it was configured with (with which configure_parser_backend() reopens it)
+_persistent_store = None
+_persistent_store_options = {}
+
+# Process-wide memo of non-strict decisions on pairs of differing user-agent strings, keyed by (ua_string_1,
+# ua_string_2), holding the decision (True or False) of the decision kernel, `analyze_parsed_fingerprints()`, or
+# of the lexical prefilter (see configure_pair_decision_cache()). Strict decisions are
+# string comparisons and need no memo. Many sessions share the same pair, e.g., during the week in which most users
+# of one browser move from one version to the next.
+DEFAULT_PAIR_DECISION_CACHE_SIZE = 16384
+_pair_decision_cache = BoundedCache(DEFAULT_PAIR_DECISION_CACHE_SIZE)
+_pair_decisions_enabled = True
+
+# Where the fingerprints that missed the in-memory cache came from (see fingerprint_source_info())
+_source_counts = {"precomputed": 0, "persistent": 0, "parsed": 0, "lexical": 0}
+
+
+def _load_or_parse_fingerprint(ua_string):
+    fingerprint = _precomputed_fingerprints.get(ua_string)
+    if fingerprint is not None:
+        _source_counts["precomputed"] += 1
+        return fingerprint
+
+    store = _persistent_store
+    if store is not None:
+        fingerprint = store.get(ua_string)
+        if fingerprint is not None:
+            _source_counts["persistent"] += 1
+            return fingerprint
+
+    if _metrics is None:
+        fingerprint = ClientFingerprint(ua_string)
+    else:
+        start = perf_counter()
+        fingerprint = ClientFingerprint(ua_string)
+        _metrics.record_parse(perf_counter() - start)
+    _source_counts["parsed"] += 1
+    if store is not None:
+        store.put(fingerprint)
+    return fingerprint
+
+
+def get_client_fingerprint(ua_string):
+    """
+    Returns the ClientFingerprint for the supplied user-agent string, parsing
+    the string only if it is not in the process-wide fingerprint cache, among
+    the precomputed fingerprints, or (if one is configured) in the persistent
+    fingerprint store.
+
+    The returned object is shared with other callers and must not be mutated.
+    """
+
+    return _fingerprint_cache.get_or_create(ua_string, _load_or_parse_fingerprint)
+
 
-        parsed_string = user_agent_parser.Parse(uastring)
+def is_fingerprint_cached(ua_string):
+    """
+    Returns True if the fingerprint of ua_string is in the fingerprint cache
+    or among the precomputed fingerprints, i.e., can be had without parsing.
+    (Does not count as a hit or a miss.)
+    """
 
-        self.string = parsed_string["string"]
+    return (ua_string in _fingerprint_cache) or (ua_string in _precomputed_fingerprints)
 
-        self.device = parsed_string["device"]
-        self.device_brand = self.device["brand"]
-        self.device_family = self.device["family"]
-        self.device_model = self.device["model"]
 
-        self.os = parsed_string["os"]
-        self.os_family = self.os["family"]
-        self.os_major = self.os["major"]
-        self.os_minor = self.os["minor"]
-        self.os_patch = self.os["patch"]
-        self.os_patch_minor = self.os["patch_minor"]
+def configure_fingerprint_cache(maxsize, *, policy = "lru"):
+    """
+    Sets the capacity (maximum number of distinct user-agent strings) and the
+    eviction policy ("lru" or "fifo") of the process-wide fingerprint cache.
+
+    maxsize=None makes the cache unbounded; maxsize=0 disables caching.
+    Changing the policy discards the cached fingerprints; changing only the
+    capacity keeps as many of the most recent ones as fit.
+    """
 
-        self.user_agent = parsed_string["user_agent"]
-        self.user_agent_family = self.user_agent["family"]
-        self.user_agent_major = self.user_agent["major"]
-        self.user_agent_minor = self.user_agent["minor"]
-        self.user_agent_patch = self.user_agent["patch"]
+    global _fingerprint_cache
+
+    if policy != _fingerprint_cache.policy:
+        _fingerprint_cache = BoundedCache(maxsize, policy=policy)
+    else:
+        _fingerprint_cache.resize(maxsize)
+
+
+def configure_pair_decision_cache(maxsize, *, policy = "lru"):
+    """
+    Sets the capacity (maximum number of distinct pairs of user-agent strings)
+    and the eviction policy ("lru" or "fifo") of the process-wide memo of
+    non-strict pair decisions, in the same way as
+    `configure_fingerprint_cache()` does for the fingerprint cache.
+
+    maxsize=None makes the memo unbounded; maxsize=0 turns it off.
+    """
+
+    global _pair_decision_cache, _pair_decisions_enabled
+
+    if policy != _pair_decision_cache.policy:
+        _pair_decision_cache = BoundedCache(maxsize, policy=policy)
+    else:
+        _pair_decision_cache.resize(maxsize)
+    _pair_decisions_enabled = maxsize != 0
+
+
+def pair_decision_cache_info():
+    """
+    Returns CacheInfo(hits, misses, evictions, maxsize, currsize) for the
+    process-wide memo of non-strict pair decisions.
+    """
+
+    return _pair_decision_cache.cache_info()
+
+
+def configure_persistent_fingerprint_cache(path, **options):
+    """
+    Makes every miss of the in-memory fingerprint cache consult the SQLite
+    file at path (created if necessary) before parsing, and store each newly
+    parsed fingerprint there, so that parsed fingerprints survive restarts and
+    are shared by all processes configured with the same path.
+
+    Entries are keyed by `persistent_cache.parser_signature()` (the installed
+    parser and its regex set, the parser backend, and this package), so
+    entries stored under another signature are ignored rather than read;
+    nothing is deleted when the file is opened, and `delete_other_signatures()`
+    on the store prunes them explicitly. path=None turns the persistent store
+    off. Keyword options are passed to
+    `persistent_cache.PersistentFingerprintStore`.
+    """
+
+    global _persistent_store, _persistent_store_options
+
+    previous_store = _persistent_store
+    if path is None:
+        _persistent_store = None
+    else:
+        from . persistent_cache import PersistentFingerprintStore
+        _persistent_store = PersistentFingerprintStore(path, **options)
+    _persistent_store_options = options
+
+    if previous_store is not None:
+        previous_store.close()
+
+
+def persistent_fingerprint_cache_info():
+    """
+    Returns a dict of the path, parser signature, and hit/miss/write/error
+    counters of the persistent fingerprint store, or None if none is
+    configured.
+    """
+
+    store = _persistent_store
+    return None if store is None else store.info()
+
+
+def fingerprint_cache_info():
+    """
+    Returns CacheInfo(hits, misses, evictions, maxsize, currsize) for the
+    process-wide fingerprint cache.
+    """
+
+    return _fingerprint_cache.cache_info()
+
+
+def fingerprint_source_info():
+    """
+    Returns a dict that accounts for every lookup of the fingerprint cache
+    since it was last cleared:
+        lookups             the number of fingerprints requested
+        memory_hits         served from the in-memory cache
+        precomputed_hits    served from the precomputed fingerprints
+        persistent_hits     served from the persistent fingerprint store
+        parsed              served by parsing the user-agent string
+        served_without_parsing
+                            the fraction of lookups that did not parse (None
+                            if there were no lookups)
+        precomputed_fingerprints
+                            the number of precomputed fingerprints loaded
+        lexical_decisions   the number of comparisons decided by the lexical
+                            prefilter, without looking up fingerprints (see
+                            `configure_lexical_prefilter()`)
+    """
+
+    cache_info = _fingerprint_cache.cache_info()
+    lookups = cache_info.hits + cache_info.misses
+    parsed = _source_counts["parsed"]
+    return {"lookups": lookups,
+            "memory_hits": cache_info.hits,
+            "precomputed_hits": _source_counts["precomputed"],
+            "persistent_hits": _source_counts["persistent"],
+            "parsed": parsed,
+            "served_without_parsing": ((lookups - parsed) / lookups) if lookups else None,
+            "precomputed_fingerprints": len(_precomputed_fingerprints),
+            "lexical_decisions": _source_counts["lexical"],
+           }
+
+
+def clear_fingerprint_cache():
+    """
+    Empties the process-wide fingerprint cache and resets its counters,
+    including those of `fingerprint_source_info()`, and empties the memo of
+    pair decisions (see `configure_pair_decision_cache()`). Precomputed
+    fingerprints are kept.
+    """
+
+    _fingerprint_cache.cache_clear()
+    _pair_decision_cache.cache_clear()
+    for source in _source_counts:
+        _source_counts[source] = 0
+
+
+# Parsed by warm_up() so that the parser's first-use work is done for the desktop and mobile families alike
+_WARM_UP_USER_AGENT_STRINGS = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.0) Gecko/20100101 Firefox/104.0",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/105.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) "
+    "Version/16.0 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (Linux; Android 12; Pixel 6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/105.0.0.0 "
+    "Mobile Safari/537.36",
+    )
+
+
+def warm_up(ua_strings = ()):
+    """
+    Imports ua_parser (compiling its regex table) and parses a few
+    representative user-agent strings, so that no later request pays that
+    cost; then puts the fingerprints of ua_strings, if any, into the
+    fingerprint cache.
+
+    Call it in a pre-fork hook (e.g., gunicorn's `on_starting`, or at module
+    level with `--preload`) so that the compiled regexes and cached
+    fingerprints are shared copy-on-write by all forked workers. (Calling
+    `gc.freeze()` afterwards keeps the garbage collector from touching, and
+    so un-sharing, those pages.)
+
+    Returns the number of seconds taken.
+    """
+
+    import time
+
+    start = time.perf_counter()
+    parse = _parser_backend or _load_ua_parser().Parse
+    for ua_string in _WARM_UP_USER_AGENT_STRINGS:
+        parse(ua_string)
+    _load_lexical_classifier()
+    for ua_string in ua_strings:
+        get_client_fingerprint(ua_string)
+    return time.perf_counter() - start
 
 
 def print_parsed_user_agent_string(ua_string):
@@ -121,8 +755,10 @@ def print_parsed_user_agent_string(ua_string):
     Pretty prints a fully parsed version of supplied user-agent string.
     """
 
+    import pprint
+
     pp = pprint.PrettyPrinter(indent=4)
-    parsed_string = ClientFingerprint(ua_string)
+    parsed_string = ClientFingerprint(ua_string).as_dict()
     pp.pprint(parsed_string)
 
 
@@ -137,6 +773,466 @@ def user_agent_strings_are_compatible_strictly(ua_string_1, ua_string_2):
     return is_compatible
 
 
+def analyze_parsed_fingerprints(fingerprint_1, fingerprint_2):
+    """
+    If called, we know that (a) strict==False and (b) the two user-agent
+    strings from which the fingerprints were parsed are not exactly equal.
+    Compares the pair of fingerprints to determine whether the difference can
+    be attributed to an upgrade.
+
+    The version components are compared in the order os_major, os_minor,
+    user_agent_major, user_agent_minor. For each component:
+        both numeric        a downgrade => incompatible; an upgrade => the
+                            difference may be an upgrade (see below)
+        neither numeric     unequal => incompatible
+        exactly one numeric => incompatible
+    An upgrade of a *major* component ends the version comparison (the
+    components after it are not examined); an upgrade of a *minor* component
+    does not. If no component was upgraded, the pair is incompatible.
+    Otherwise the pair is compatible iff the identity attributes (see
+    `attributes_that_must_be_equal`) are all equal.
+
+    Returns is_compatible as either True or False
+    """
+
+    versions_1 = fingerprint_1.versions
+    versions_2 = fingerprint_2.versions
+
+    # Identical version tuples contain no upgrade.
+    if versions_1 is versions_2:
+        return False
+
+    (os_major_1, os_minor_1, user_agent_major_1, user_agent_minor_1) = versions_1
+    (os_major_2, os_minor_2, user_agent_major_2, user_agent_minor_2) = versions_2
+
+    # We test the version numbers. Only if at least one version attribute is an upgrade might we go on to test the
+    # non-version attributes. (Numeric components are ints; anything else is a non-numeric value.)
+    further_analysis_is_justified = False
+
+    if os_major_1.__class__ is int:
+        if (os_major_2.__class__ is not int) or (os_major_2 < os_major_1):
+            return False
+        is_major_upgrade = os_major_2 > os_major_1
+    elif (os_major_2.__class__ is int) or (os_major_1 != os_major_2):
+        return False
+    else:
+        is_major_upgrade = False
+
+    if not is_major_upgrade:
+        if os_minor_1.__class__ is int:
+            if (os_minor_2.__class__ is not int) or (os_minor_2 < os_minor_1):
+                return False
+            further_analysis_is_justified = os_minor_2 > os_minor_1
+        elif (os_minor_2.__class__ is int) or (os_minor_1 != os_minor_2):
+            return False
+
+        if user_agent_major_1.__class__ is int:
+            if (user_agent_major_2.__class__ is not int) or (user_agent_major_2 < user_agent_major_1):
+                return False
+            is_major_upgrade = user_agent_major_2 > user_agent_major_1
+        elif (user_agent_major_2.__class__ is int) or (user_agent_major_1 != user_agent_major_2):
+            return False
+
+        if not is_major_upgrade:
+            if user_agent_minor_1.__class__ is int:
+                if (user_agent_minor_2.__class__ is not int) or (user_agent_minor_2 < user_agent_minor_1):
+                    return False
+                if user_agent_minor_2 > user_agent_minor_1:
+                    further_analysis_is_justified = True
+            elif (user_agent_minor_2.__class__ is int) or (user_agent_minor_1 != user_agent_minor_2):
+                return False
+
+            if not further_analysis_is_justified:
+                return False
+
+    # If here, (a) at least one version attribute is an upgrade and (b) neither version attribute is a downgrade.
+    # Thus we check the non-version attributes for equality across the pair of user-agent strings.
+    identity_1 = fingerprint_1.identity
+    identity_2 = fingerprint_2.identity
+    return (identity_1 is identity_2) or (identity_1 == identity_2)
+
+
+class Reason(str, Enum):
+    """
+    Why a comparison came out as it did (see `explain_compatibility()`). Each
+    member is also equal to its value, e.g., Reason.UPGRADE == "upgrade".
+
+        IDENTICAL               the strings are equal (compatible)
+        STRICT_MISMATCH         strict mode, and the strings differ
+        UPGRADE                 an upgrade, with no downgrade, and equal
+                                identity attributes (compatible)
+        DOWNGRADE               a numeric version component decreased
+        NON_NUMERIC_MISMATCH    a version component is non-numeric (e.g.,
+                                "XP") in either string, and they differ
+        NO_UPGRADE              the compared versions are equal, although the
+                                strings differ
+        IDENTITY_MISMATCH       an identity attribute (device, OS family,
+                                browser family) differs
+    """
+
+    IDENTICAL = "identical"
+    STRICT_MISMATCH = "strict_mismatch"
+    UPGRADE = "upgrade"
+    DOWNGRADE = "downgrade"
+    NON_NUMERIC_MISMATCH = "non_numeric_mismatch"
+    NO_UPGRADE = "no_upgrade"
+    IDENTITY_MISMATCH = "identity_mismatch"
+
+
+_REASON_IDENTICAL = Reason.IDENTICAL
+_REASON_STRICT_MISMATCH = Reason.STRICT_MISMATCH
+_REASON_UPGRADE = Reason.UPGRADE
+_REASON_DOWNGRADE = Reason.DOWNGRADE
+_REASON_NON_NUMERIC_MISMATCH = Reason.NON_NUMERIC_MISMATCH
+_REASON_NO_UPGRADE = Reason.NO_UPGRADE
+_REASON_IDENTITY_MISMATCH = Reason.IDENTITY_MISMATCH
+
+# How a comparison was decided (its path): by string equality, by strict mode, by the lexical prefilter, from
+# fingerprints that were all cached or that needed at least one parse, or from the memo of pair decisions
+_PATH_IDENTICAL = "identical"
+_PATH_STRICT = "strict"
+_PATH_LEXICAL = "lexical"
+_PATH_CACHED = "cached"
+_PATH_PARSED = "parsed"
+_PATH_MEMOIZED = "memoized"
+
+# A metrics.Metrics while metrics are enabled (see metrics.py); the hot paths test only `_metrics is not None`.
+_metrics = None
+
+
+def _analyze_with_reason(fingerprint_1, fingerprint_2):
+    """
+    Makes the same decision as `analyze_parsed_fingerprints()`, component by
+    component rather than unrolled, and also says why. Only metrics and
+    explanations use it; every other decision (and every decision in the
+    memo of pair decisions) is the kernel's. The differential harness (see
+    differential.py) checks both against the original implementation.
+
+    Returns (is_compatible, reason, attribute), where attribute names the
+    version attribute that was downgraded, mismatched, or (if compatible)
+    first upgraded, or the first identity attribute that differs.
+    """
+
+    versions_1 = fingerprint_1.versions
+    versions_2 = fingerprint_2.versions
+    upgraded_attribute = None
+
+    for (index, attribute) in enumerate(version_attributes_compared):
+        value_1 = versions_1[index]
+        value_2 = versions_2[index]
+        if value_1.__class__ is int:
+            if value_2.__class__ is not int:
+                return (False, _REASON_NON_NUMERIC_MISMATCH, attribute)
+            if value_2 < value_1:
+                return (False, _REASON_DOWNGRADE, attribute)
+            if value_2 > value_1:
+                if upgraded_attribute is None:
+                    upgraded_attribute = attribute
+                # An upgrade of a major component (os_major, user_agent_major) ends the version comparison.
+                if index % 2 == 0:
+                    break
+        elif (value_2.__class__ is int) or (value_1 != value_2):
+            return (False, _REASON_NON_NUMERIC_MISMATCH, attribute)
+
+    if upgraded_attribute is None:
+        return (False, _REASON_NO_UPGRADE, None)
+
+    for (attribute, value_1, value_2) in zip(attributes_that_must_be_equal, fingerprint_1.identity,
+                                             fingerprint_2.identity):
+        if value_1 != value_2:
+            return (False, _REASON_IDENTITY_MISMATCH, attribute)
+    return (True, _REASON_UPGRADE, upgraded_attribute)
+
+
+def _decide_with_reason(ua_string_1, ua_string_2, strict, fingerprint_1 = None, fingerprint_2 = None, *,
+                        parse = True):
+    """
+    Makes the same decision, by the same route (string equality, strict mode,
+    lexical prefilter, cached or parsed fingerprints), as
+    `user_agent_strings_are_compatible()` or, given fingerprints,
+    `fingerprint_is_compatible()`, and also says why.
+
+    Returns (is_compatible, path, reason, attribute, versions_1, versions_2),
+    where versions_1 and versions_2 are the compared version tuples (None
+    if no versions were compared). For a pair that the lexical prefilter
+    rejects because the strings belong to different templates, the reason is
+    the identity mismatch, although parsing might have found a version
+    mismatch first. With parse=False, returns None instead of parsing a
+    string (so that the async API can parse it off the event loop).
+    """
+
+    if ua_string_1 == ua_string_2:
+        return (True, _PATH_IDENTICAL, _REASON_IDENTICAL, None, None, None)
+    if strict:
+        return (False, _PATH_STRICT, _REASON_STRICT_MISMATCH, "string", None, None)
+
+    is_parse_needed = not (((fingerprint_1 is not None) or is_fingerprint_cached(ua_string_1))
+                           and ((fingerprint_2 is not None) or is_fingerprint_cached(ua_string_2)))
+
+    if is_parse_needed and _lexical_prefilter_enabled:
+        classify = _classify_user_agent_string or _load_lexical_classifier()
+        lexical_fingerprint_1 = classify(ua_string_1)
+        lexical_fingerprint_2 = None if lexical_fingerprint_1 is None else classify(ua_string_2)
+        if lexical_fingerprint_2 is not None:
+            (template_1, template_2) = (lexical_fingerprint_1.identity[0], lexical_fingerprint_2.identity[0])
+            versions = (lexical_fingerprint_1.versions, lexical_fingerprint_2.versions)
+            if lexical_fingerprint_1.identity == lexical_fingerprint_2.identity:
+                _source_counts["lexical"] += 1
+                (is_compatible, reason, attribute) = _analyze_with_reason(lexical_fingerprint_1,
+                                                                          lexical_fingerprint_2)
+                return (is_compatible, _PATH_LEXICAL, reason, attribute, *versions)
+            if template_1 != template_2:
+                from . prefilter import PARSED_IDENTITIES
+                _source_counts["lexical"] += 1
+                for (attribute, value_1, value_2) in zip(attributes_that_must_be_equal, PARSED_IDENTITIES[template_1],
+                                                         PARSED_IDENTITIES[template_2]):
+                    if value_1 != value_2:
+                        return (False, _PATH_LEXICAL, _REASON_IDENTITY_MISMATCH, attribute, *versions)
+
+    if is_parse_needed and not parse:
+        return None
+    if fingerprint_1 is None:
+        fingerprint_1 = get_client_fingerprint(ua_string_1)
+    if fingerprint_2 is None:
+        fingerprint_2 = get_client_fingerprint(ua_string_2)
+    (is_compatible, reason, attribute) = _analyze_with_reason(fingerprint_1, fingerprint_2)
+    return (is_compatible, _PATH_PARSED if is_parse_needed else _PATH_CACHED, reason, attribute,
+            fingerprint_1.versions, fingerprint_2.versions)
+
+
+def _memoized_reason_label(is_compatible):
+    """
+    Returns the reason under which metrics count a decision taken from the
+    memo of pair decisions, which holds only the decision: "upgrade" (the
+    only reason for compatibility) or, for a rejection, "memoized", so that a
+    memo hit never repeats the analysis (or a parse) just to count it.
+    """
+
+    return _REASON_UPGRADE.value if is_compatible else _PATH_MEMOIZED
+
+
+def _compare_instrumented(ua_string_1, ua_string_2, strict, fingerprint_1 = None, fingerprint_2 = None):
+    metrics = _metrics
+    start = perf_counter()
+    if strict or (ua_string_1 == ua_string_2) or not _pair_decisions_enabled:
+        (is_compatible, path, reason, _, _, _) = _decide_with_reason(ua_string_1, ua_string_2, strict,
+                                                                     fingerprint_1, fingerprint_2)
+        reason_label = reason.value
+    else:
+        key = (ua_string_1, ua_string_2)
+        is_compatible = _pair_decision_cache.get(key)
+        if is_compatible is None:
+            (is_compatible, path, reason, _, _, _) = _decide_with_reason(ua_string_1, ua_string_2, strict,
+                                                                         fingerprint_1, fingerprint_2)
+            _pair_decision_cache.put(key, is_compatible)
+            reason_label = reason.value
+        else:
+            (path, reason_label) = (_PATH_MEMOIZED, _memoized_reason_label(is_compatible))
+    if metrics is not None:
+        metrics.record_comparison(path, reason_label, perf_counter() - start)
+    return is_compatible
+
+
+class ComparisonResult():
+    """
+    The outcome of one comparison, with the reason for it (see
+    `explain_compatibility()`). Its truth value is is_compatible.
+
+        is_compatible   True or False, as `user_agent_strings_are_compatible()`
+                        returns
+        reason          a Reason
+        attribute       the attribute that decided the comparison: the version
+                        attribute (e.g., "os_major") that was downgraded or
+                        mismatched or, if compatible, first upgraded; the first
+                        identity attribute (e.g., "user_agent_family") that
+                        differs; "string" for a strict mismatch; otherwise None
+        versions_1      the compared (os_major, os_minor, user_agent_major,
+        versions_2      user_agent_minor) of each string, or None if no
+                        versions were compared. (When decided by the lexical
+                        prefilter, OS versions that cannot be read off the
+                        string are None.)
+        path            how the pair was decided: "identical", "strict",
+                        "lexical", "cached", or "parsed"
+    """
+
+    __slots__ = ("is_compatible", "reason", "attribute", "versions_1", "versions_2", "path")
+
+    def __init__(self, is_compatible, path, reason, attribute, versions_1, versions_2):
+        self.is_compatible = is_compatible
+        self.path = path
+        self.reason = reason
+        self.attribute = attribute
+        self.versions_1 = versions_1
+        self.versions_2 = versions_2
+
+    def __bool__(self):
+        return self.is_compatible
+
+    def __eq__(self, other):
+        if other.__class__ is not ComparisonResult:
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return (f"ComparisonResult(is_compatible={self.is_compatible!r}, reason={self.reason.value!r}, "
+                f"attribute={self.attribute!r}, versions_1={self.versions_1!r}, versions_2={self.versions_2!r}, "
+                f"path={self.path!r})")
+
+
+def _explain(ua_string_1, ua_string_2, strict, fingerprint_1 = None, fingerprint_2 = None):
+    metrics = _metrics
+    if metrics is None:
+        return ComparisonResult(*_decide_with_reason(ua_string_1, ua_string_2, strict, fingerprint_1, fingerprint_2))
+
+    start = perf_counter()
+    result = ComparisonResult(*_decide_with_reason(ua_string_1, ua_string_2, strict, fingerprint_1, fingerprint_2))
+    metrics.record_comparison(result.path, result.reason.value, perf_counter() - start)
+    return result
+
+
+def explain_compatibility(ua_string_1, ua_string_2, *, strict = False):
+    """
+    Makes the decision of `user_agent_strings_are_compatible()`, by the same
+    route and at the same cost (in particular, parsing no more strings), and
+    returns it as a ComparisonResult that also says why, e.g., to log the
+    reason a session was revoked:
+
+        result = explain_compatibility(baseline_ua_string, ua_string)
+        if not result:
+            log(result.reason.value, result.attribute,
+                result.versions_1, result.versions_2)
+    """
+
+    return _explain(ua_string_1, ua_string_2, strict)
+
+
+def explain_fingerprint_compatibility(baseline_fingerprint, current, *, strict = False):
+    """
+    Makes the decision of `fingerprint_is_compatible()`, by the same route and
+    at the same cost, and returns it as a ComparisonResult (see
+    `explain_compatibility()`).
+    """
+
+    if current.__class__ is str:
+        return _explain(baseline_fingerprint.string, current, strict, baseline_fingerprint)
+    return _explain(baseline_fingerprint.string, current.string, strict, baseline_fingerprint, current)
+
+
+# Whether comparisons that would otherwise parse are first tried on the lexical prefilter (see prefilter.py)
+_lexical_prefilter_enabled = True
+_classify_user_agent_string = None
+
+
+def _load_lexical_classifier():
+    """
+    Imports prefilter.py on first use; returns its classify_user_agent_string().
+    """
+
+    global _classify_user_agent_string
+
+    if _classify_user_agent_string is None:
+        from . prefilter import classify_user_agent_string
+        _classify_user_agent_string = classify_user_agent_string
+    return _classify_user_agent_string
+
+
+def _decide_lexically(lexical_fingerprint_1, lexical_fingerprint_2):
+    """
+    Returns the decision of `analyze_parsed_fingerprints()` for two strings
+    with the supplied LexicalFingerprints (see prefilter.py), or None if the
+    lexical fingerprints do not determine it.
+    """
+
+    identity_1 = lexical_fingerprint_1.identity
+    identity_2 = lexical_fingerprint_2.identity
+    if identity_1 == identity_2:
+        # Same parsed identity, and parsed versions that compare as the lexical ones do.
+        is_compatible = analyze_parsed_fingerprints(lexical_fingerprint_1, lexical_fingerprint_2)
+    elif identity_1[0] != identity_2[0]:
+        # Different templates imply a different os_family or user_agent_family.
+        is_compatible = False
+    else:
+        # Same Windows template, different NT tokens: the parsed OS versions are not known.
+        return None
+
+    _source_counts["lexical"] += 1
+    return is_compatible
+
+
+def _lexical_decision(ua_string_1, ua_string_2):
+    classify = _classify_user_agent_string or _load_lexical_classifier()
+    lexical_fingerprint_1 = classify(ua_string_1)
+    if lexical_fingerprint_1 is None:
+        return None
+    lexical_fingerprint_2 = classify(ua_string_2)
+    if lexical_fingerprint_2 is None:
+        return None
+    return _decide_lexically(lexical_fingerprint_1, lexical_fingerprint_2)
+
+
+def configure_lexical_prefilter(enabled):
+    """
+    Turns the lexical prefilter on (the default) or off.
+
+    When on, a non-strict comparison that would have to parse a user-agent
+    string (because it is not in the fingerprint cache) is first tried on the
+    lexical prefilter, which recognizes the common desktop Firefox, Chrome,
+    and Safari strings and decides most comparisons between them (strings of
+    different browsers or operating systems; strings of one browser on macOS
+    or Linux that differ only in version numbers) without parsing. The
+    decisions are exactly those that parsing would give; see prefilter.py.
+    """
+
+    global _lexical_prefilter_enabled
+
+    _lexical_prefilter_enabled = bool(enabled)
+
+
+def analyze_parsed_user_agent_strings(ua_string_1, ua_string_2):
+    """
+    If called, we know that (a) strict==False and (b) the two strings are
+    not exactly equal. Parses the pair of user-agent strings to determine
+    whether the difference can be attributed to an upgrade.
+
+    Returns is_compatible as either True or False
+    """
+
+    # Pairs seen before are answered from the memo of pair decisions.
+    if _pair_decisions_enabled:
+        key = (ua_string_1, ua_string_2)
+        is_compatible = _pair_decision_cache.get(key)
+        if is_compatible is None:
+            is_compatible = _pair_decision_cache.put(key, _analyze_differing_strings(ua_string_1, ua_string_2))
+        return is_compatible
+
+    return _analyze_differing_strings(ua_string_1, ua_string_2)
+
+
+def _analyze_differing_strings(ua_string_1, ua_string_2):
+    """
+    The decision of `analyze_parsed_user_agent_strings()`, without the memo of
+    pair decisions.
+    """
+
+    # A string not in the cache would have to be parsed; first see whether the lexical prefilter can decide the pair.
+    if _lexical_prefilter_enabled and not (((ua_string_1 in _fingerprint_cache)
+                                            or (ua_string_1 in _precomputed_fingerprints))
+                                           and ((ua_string_2 in _fingerprint_cache)
+                                                or (ua_string_2 in _precomputed_fingerprints))):
+        is_compatible = _lexical_decision(ua_string_1, ua_string_2)
+        if is_compatible is not None:
+            return is_compatible
+
+    # Parses each user-agent string into an object whose attributes are the relevant components to test.
+    # Strings seen before are served from the fingerprint cache without reparsing.
+    fingerprint_1 = get_client_fingerprint(ua_string_1)
+    fingerprint_2 = get_client_fingerprint(ua_string_2)
+
+    return analyze_parsed_fingerprints(fingerprint_1, fingerprint_2)
+
+
 def user_agent_strings_are_compatible(ua_string_1, ua_string_2, *, strict = False):
     """
     Compares two user-agent strings to determine whether the second one is
@@ -164,166 +1260,105 @@ def user_agent_strings_are_compatible(ua_string_1, ua_string_2, *, strict = Fals
     those attributes should be immutable during any session, even an extended
     one. (E.g., "Apple", "Mac", "Mac OS X", "Chrome").
 
-    Returns a tuple (is_compatible, discrepancy_message), where is_compatible =
+    Returns is_compatible, either
         True    There is no conflict between the two user-agent strings
         False   There is a conflict between the two user-agent string.
                 The session ID should be revoked because the session cookie
                 may have been stolen by a different machine.
+    To learn why, call `explain_compatibility()` instead, which returns the
+    same decision together with its reason.
     """
 
+    if _metrics is not None:
+        return _compare_instrumented(ua_string_1, ua_string_2, strict)
 
-    default_attribute_value = "not available"
-    attributes_that_must_be_equal = ["device_brand",
-                                     "device_family",
-                                     "device_model",
-                                     "os_family",
-                                     "user_agent_family"
-                                    ]
-
-
-    def numeric_version_number_if_possible(fingerprint, attribute):
-        """
-        If possible, converts supplied version number string (e.g., major or 
-        minor) to an integer.
-
-        Returns a tuple (is_numeric, returned_value), where
-            is_numeric      is True if the string could be converted to int;
-                            otherwise False
-            returned_value  is the int form of the string if possible or, if
-                            not, the original string.
-        """
-
-        version_number_string = getattr(fingerprint, attribute, default_attribute_value)
-
-        try:
-            numeric_version_number = int(version_number_string)
-        except (ValueError, TypeError):
-            returned_value = version_number_string
-            is_numeric = False
-        else:
-            returned_value = numeric_version_number
-            is_numeric = True
-
-        return (is_numeric, returned_value)
-
-
-    def analyze_parsed_user_agent_strings(ua_string_1, ua_string_2):
-        """
-        If called, we know that (a) strict==False and (b) the two strings are
-        not exactly equal. Parses the pair of user-agent strings to determine
-        whether the difference can be attributed to an upgrade.
-
-        Returns is_compatible as either True or False
-        """
-
-
-        # Parses each user-agent string into an object whose attributes are the relevant components to test
-        fingerprint_1 = ClientFingerprint(ua_string_1)
-        fingerprint_2 = ClientFingerprint(ua_string_2)
-
-        # We test the version numbers. Only if at least one version attribute is an upgrade might we go on to test the
-        # non-version attributes
-        further_analysis_is_justified = False
-
-        def attribute_is_upgrade_or_compatible(attribute):
-            """
-            Tests a particular version attribute of the current pair of fingerprints to return:
-                is_upgrade: True iff that attribute is numerically upgraded from the first to second fingerprint.
-                is_compatible: True iff no red flags occurred w.r.t. attribute, such as a numerical downgrade or
-                               this attribute was nonnumeric and nonequal.
-            """
-            is_upgrade = False
-
-            (attribute_1_is_numeric, attribute_1_value) = numeric_version_number_if_possible(fingerprint_1, attribute)
-            (attribute_2_is_numeric, attribute_2_value) = numeric_version_number_if_possible(fingerprint_2, attribute)
-
-            if (attribute_1_is_numeric and attribute_2_is_numeric):
-                if (attribute_2_value > attribute_1_value):
-                    is_upgrade = True
-                    is_compatible = True
-                elif (attribute_2_value == attribute_1_value):
-                    is_compatible = True
-                else:
-                    # Is a downgrade
-                    is_compatible = False
-            elif ((not attribute_1_is_numeric) and (not attribute_2_is_numeric)):
-                # The attribute of each string is not numeric. Check for equality.
-                is_compatible = (attribute_1_value == attribute_2_value)
-            else:
-                # One is numeric, but the other is not => FAIL
-                is_compatible = False
-            
-            return (is_upgrade, is_compatible)
-        
-
-        def is_compatible_after_comparing_attributes_that_must_be_equal():
-            """
-            Inner function utility.
-
-            Compares all the attributes that must be equal if the user-agent
-            strings are compatible.
-            """
-
+    is_compatible_strictly = user_agent_strings_are_compatible_strictly(ua_string_1, ua_string_2)
 
-            is_compatible = True
-            for attribute in attributes_that_must_be_equal:
-                value_1 = getattr(fingerprint_1, attribute, default_attribute_value)
-                value_2 = getattr(fingerprint_2, attribute, default_attribute_value)
+    # If strict, is_compatible_strictly is the only relevant criterion.
+    # Even if not strict, if is_compatible_strictly is True, then the weaker not-strict criterion is also satisfied.
+    if strict or is_compatible_strictly:
+        is_compatible = is_compatible_strictly
+        return is_compatible
 
-                if value_1 != value_2:
-                    is_compatible = False
-                    break
+    # If here, (a) strict==False and (b) the two UA strings are not exactly equal. This would be an immediate FAIL unless
+    # the difference can be attributed to either the browser and/or OS being upgraded. To determine this we must parse
+    # the strings to determine whether the version numbers imply an update in the OS and/or browser. If so, test
+    # the non-version parsed fields for equality across the two user-agent strings.
 
-            return is_compatible
+    is_compatible = analyze_parsed_user_agent_strings(ua_string_1, ua_string_2)
 
-        # Beginning of actual comparison computation
-        for (major, minor) in [("os_major", "os_minor"), ("user_agent_major", "user_agent_minor")]:
-            (is_upgrade, is_compatible) = attribute_is_upgrade_or_compatible(major)
+    return is_compatible
 
-            if not is_compatible:
-                return is_compatible
 
-            if is_upgrade:
-                further_analysis_is_justified = True
-                break
-            
-            # Major is not incompatible but not an upgrade. Check minor.
-            (is_upgrade, is_compatible) = attribute_is_upgrade_or_compatible(minor)
+def fingerprint_is_compatible(baseline_fingerprint, current, *, strict = False):
+    """
+    Same decision as `user_agent_strings_are_compatible()`, for a baseline that
+    has already been parsed.
+
+        baseline_fingerprint    the ClientFingerprint of the user-agent string
+                                presented when the user first authenticated
+        current                 the user-agent string of the current request,
+                                or its ClientFingerprint
+
+    The current user-agent string is parsed only if (a) strict==False, (b) it
+    differs from the baseline string, (c) the pair is not in the memo of pair
+    decisions, (d) it is not already in the fingerprint cache, and (e) the
+    lexical prefilter cannot decide the pair (see
+    `configure_lexical_prefilter()`). Hence a check does at most one parse,
+    and none at all for a string seen before.
+
+    The memo of pair decisions is keyed by the two strings, so a supplied
+    fingerprint is taken to be the fingerprint of its string under the
+    current parser, as are those returned by `get_client_fingerprint()` and
+    those that `ClientFingerprint.from_bytes()` restores from bytes serialized
+    under the same parser and backend.
+
+    Returns is_compatible as either True or False.
+    """
 
-            if not is_compatible:
-                return is_compatible
+    if current.__class__ is str:
+        current_string = current
+        current_fingerprint = None
+    else:
+        current_string = current.string
+        current_fingerprint = current
 
-            if is_upgrade:
-                further_analysis_is_justified = True
-                
-        if not further_analysis_is_justified:
-            is_compatible = False
-            return is_compatible
+    if _metrics is not None:
+        return _compare_instrumented(baseline_fingerprint.string, current_string, strict, baseline_fingerprint,
+                                     current_fingerprint)
 
-      
-        # If here, (a) at least one version attribute is an upgrade and (b) neither version attribute is a downgrade.
-        # Thus we check the non-version attributes for equality across the pair of user-agent strings.
+    is_compatible_strictly = user_agent_strings_are_compatible_strictly(baseline_fingerprint.string, current_string)
 
-        is_compatible = is_compatible_after_comparing_attributes_that_must_be_equal()
+    if strict or is_compatible_strictly:
+        is_compatible = is_compatible_strictly
+        return is_compatible
 
+    if _pair_decisions_enabled:
+        key = (baseline_fingerprint.string, current_string)
+        is_compatible = _pair_decision_cache.get(key)
+        if is_compatible is None:
+            is_compatible = _pair_decision_cache.put(key, _analyze_differing_fingerprints(baseline_fingerprint,
+                                                                                         current_string,
+                                                                                         current_fingerprint))
         return is_compatible
 
-        # End of inner functions
-    # Beginning of actual comparison computation
+    return _analyze_differing_fingerprints(baseline_fingerprint, current_string, current_fingerprint)
 
-    is_compatible_strictly = user_agent_strings_are_compatible_strictly(ua_string_1, ua_string_2)
 
-    # If strict, is_compatible_strictly is the only relevant criterion.
-    # Even if not strict, if is_compatible_strictly is True, then the weaker not-strict criterion is also satisfied.
-    if strict or is_compatible_strictly:
-        is_compatible = is_compatible_strictly
-        return is_compatible
+def _analyze_differing_fingerprints(baseline_fingerprint, current_string, current_fingerprint):
+    """
+    The non-strict decision of `fingerprint_is_compatible()` on differing
+    strings, without the memo of pair decisions; current_fingerprint may be
+    None.
+    """
 
-    # If here, (a) strict==False and (b) the two UA strings are not exactly equal. This would be an immediate FAIL unless
-    # the difference can be attributed to either the browser and/or OS being upgraded. To determine this we must parse
-    # the strings to determine whether the version numbers imply an update in the OS and/or browser. If so, test
-    # the non-version parsed fields for equality across the two user-agent strings.
+    if current_fingerprint is None:
+        if _lexical_prefilter_enabled and not is_fingerprint_cached(current_string):
+            is_compatible = _lexical_decision(baseline_fingerprint.string, current_string)
+            if is_compatible is not None:
+                return is_compatible
+        current_fingerprint = get_client_fingerprint(current_string)
 
-    is_compatible = analyze_parsed_user_agent_strings(ua_string_1, ua_string_2)
+    is_compatible = analyze_parsed_fingerprints(baseline_fingerprint, current_fingerprint)
 
     return is_compatible
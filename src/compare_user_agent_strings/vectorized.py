@@ -0,0 +1,251 @@
+"""
+Compares whole columns of (baseline, current) user-agent strings with NumPy
+array operations, e.g., for session tables held in pandas, NumPy, or Arrow.
+
+Exposes publicly:
+    compare_columns(baselines, currents, *, strict = False, workers = None,
+                    chunksize = 256)
+    compare_codes(baseline_codes, current_codes, categories, *,
+                  strict = False, workers = None, chunksize = 256)
+
+Requires NumPy (pip install compare-user-agent-strings[numpy]).
+
+The decision for every pair is exactly the one that
+`user_agent_strings_are_compatible(baseline, current, strict=strict)` would
+return. The strings are factorized into integer codes, so that the work done
+per distinct string (getting its fingerprint) is separated from the work done
+per pair (array operations on codes):
+    1.  Each column is mapped onto codes into one shared list of distinct
+        strings (categories). Pairs with equal codes have equal strings. With
+        strict=True, that is the whole answer.
+    2.  For each distinct string that occurs in an unequal pair, the
+        fingerprint is taken from the fingerprint cache (or the precomputed
+        fingerprints) if there, otherwise from the lexical prefilter (for the
+        macOS and Linux templates, whose lexical versions and identity are
+        exactly the parsed ones; see prefilter.py), and otherwise parsed, in
+        this process or, with workers=N, in N worker processes (as in
+        `compare_many()`).
+    3.  Each version component is rank-encoded: numeric components become
+        their rank among the numeric values of that component (so that order
+        is preserved whatever their size), and non-numeric ones (e.g., "XP",
+        None) a code of their own, with a flag recording which kind each is;
+        each identity (see `attributes_that_must_be_equal`) becomes a code.
+    4.  For the unequal pairs, with A, B, C, D standing for os_major,
+        os_minor, user_agent_major, user_agent_minor, okX meaning "X is not a
+        downgrade or mismatch" and upX "X is a numeric upgrade", the decision
+        of `analyze_parsed_fingerprints()` is evaluated as
+            same_identity & okA & (upA | (okB & okC & (upC | (okD & (upB | upD)))))
+        on whole arrays.
+
+If the columns are already categorical (e.g., a pandas Categorical, whose
+`.codes` and `.categories` are exactly what is needed), `compare_codes()`
+skips step 1.
+"""
+
+import numpy as np
+
+from . import ua_fingerprint
+from . ua_fingerprint import (
+                              get_client_fingerprint,
+                              is_fingerprint_cached,
+                             )
+
+
+def _as_list(column):
+    """
+    Returns the values of a list, tuple, NumPy array, pandas Series, or Arrow
+    array as a list of Python objects.
+    """
+
+    if column.__class__ is list:
+        return column
+    return np.asarray(column, dtype=object).ravel().tolist()
+
+
+def _factorize(values, index):
+    """
+    Returns the int64 array of the codes of values in index (a dict from value
+    to code), adding unseen values to index.
+    """
+
+    setdefault = index.setdefault
+    return np.fromiter([setdefault(value, len(index)) for value in values], dtype=np.int64, count=len(values))
+
+
+def _lexical_identity_and_versions(ua_string):
+    """
+    Returns (identity, versions) of ua_string as parsing would give them, if
+    the lexical prefilter knows them for certain, and otherwise None.
+    """
+
+    lexical_fingerprint = (ua_fingerprint._classify_user_agent_string
+                           or ua_fingerprint._load_lexical_classifier())(ua_string)
+    # Only for the Windows templates (which have an NT token) are the parsed OS versions unknown.
+    if (lexical_fingerprint is None) or (lexical_fingerprint.identity[1] is not None):
+        return None
+
+    from . prefilter import PARSED_IDENTITIES
+    return (PARSED_IDENTITIES[lexical_fingerprint.identity[0]], lexical_fingerprint.versions)
+
+
+def _identities_and_versions(ua_strings, workers, chunksize):
+    """
+    Returns the list of (identity, versions) of ua_strings, each obtained
+    without parsing where possible (see step 2 in the module docstring).
+    """
+
+    identities_and_versions = [None] * len(ua_strings)
+    to_parse = []
+    for (position, ua_string) in enumerate(ua_strings):
+        if is_fingerprint_cached(ua_string):
+            fingerprint = get_client_fingerprint(ua_string)
+            identities_and_versions[position] = (fingerprint.identity, fingerprint.versions)
+            continue
+        if ua_fingerprint._lexical_prefilter_enabled:
+            identities_and_versions[position] = _lexical_identity_and_versions(ua_string)
+        if identities_and_versions[position] is None:
+            to_parse.append(position)
+
+    if (workers is not None) and (workers > 1) and to_parse:
+        from . batch import _parse_in_worker_processes
+        fingerprints = _parse_in_worker_processes([ua_strings[position] for position in to_parse], workers,
+                                                  chunksize)
+    else:
+        fingerprints = {ua_strings[position]: get_client_fingerprint(ua_strings[position]) for position in to_parse}
+
+    for position in to_parse:
+        fingerprint = fingerprints[ua_strings[position]]
+        identities_and_versions[position] = (fingerprint.identity, fingerprint.versions)
+    return identities_and_versions
+
+
+def _encoded_tables(categories, needed_codes, workers, chunksize):
+    """
+    Returns (version_values, version_is_numeric, identity_codes), indexed by
+    category code: two arrays of shape (4, len(categories)) with the
+    rank-encoded version components and whether each is numeric, and an array
+    of identity codes. Only the entries of needed_codes are filled in.
+    """
+
+    number_of_categories = len(categories)
+    version_values = np.zeros((4, number_of_categories), dtype=np.int64)
+    version_is_numeric = np.zeros((4, number_of_categories), dtype=bool)
+    identity_codes = np.zeros(number_of_categories, dtype=np.int64)
+
+    needed_codes = needed_codes.tolist()
+    identities_and_versions = _identities_and_versions([categories[code] for code in needed_codes], workers,
+                                                       chunksize)
+
+    identity_index = {}
+    identity_codes[needed_codes] = [identity_index.setdefault(identity, len(identity_index))
+                                    for (identity, _) in identities_and_versions]
+
+    for component in range(4):
+        values = [versions[component] for (_, versions) in identities_and_versions]
+        ranks = {value: rank for (rank, value) in enumerate(sorted({value for value in values
+                                                                     if value.__class__ is int}))}
+        non_numeric_codes = {}
+        encoded = []
+        is_numeric = []
+        for value in values:
+            if value.__class__ is int:
+                encoded.append(ranks[value])
+                is_numeric.append(True)
+            else:
+                encoded.append(non_numeric_codes.setdefault(value, len(non_numeric_codes)))
+                is_numeric.append(False)
+        version_values[component, needed_codes] = encoded
+        version_is_numeric[component, needed_codes] = is_numeric
+
+    return (version_values, version_is_numeric, identity_codes)
+
+
+def compare_codes(baseline_codes, current_codes, categories, *, strict = False, workers = None, chunksize = 256):
+    """
+    Compares each pair (categories[baseline_codes[i]],
+    categories[current_codes[i]]) of user-agent strings for compatibility,
+    exactly as `user_agent_strings_are_compatible()` would.
+
+        baseline_codes,     equally long integer arrays (or sequences) of codes
+        current_codes       into categories
+        categories          the sequence of *distinct* user-agent strings
+                            that the codes refer to
+        workers, chunksize  as for `compare_many()`
+
+    Returns a NumPy array of bool, True where the pair is compatible.
+
+    Raises ValueError if the code arrays differ in length or contain a
+    negative code (e.g., a pandas missing value).
+    """
+
+    if (workers is not None) and (workers < 1):
+        raise ValueError(f"workers must be None or >= 1, not {workers!r}")
+    if chunksize < 1:
+        raise ValueError(f"chunksize must be >= 1, not {chunksize!r}")
+
+    baseline_codes = np.asarray(baseline_codes, dtype=np.int64).ravel()
+    current_codes = np.asarray(current_codes, dtype=np.int64).ravel()
+    if len(baseline_codes) != len(current_codes):
+        raise ValueError(f"baselines and currents differ in length: {len(baseline_codes)} != {len(current_codes)}")
+
+    is_equal = baseline_codes == current_codes
+    if strict:
+        return is_equal
+
+    unequal = np.flatnonzero(~is_equal)
+    if len(unequal) == 0:
+        return is_equal
+
+    baseline_codes = baseline_codes[unequal]
+    current_codes = current_codes[unequal]
+    if (baseline_codes.min() < 0) or (current_codes.min() < 0):
+        raise ValueError("codes must be non-negative (missing user-agent strings cannot be compared)")
+
+    categories = _as_list(categories)
+    needed_codes = np.unique(np.concatenate((baseline_codes, current_codes)))
+    (version_values, version_is_numeric, identity_codes) = _encoded_tables(categories, needed_codes, workers,
+                                                                           chunksize)
+
+    is_compatible = identity_codes[baseline_codes] == identity_codes[current_codes]
+    is_ok = []
+    is_upgrade = []
+    for component in range(4):
+        values_1 = version_values[component][baseline_codes]
+        values_2 = version_values[component][current_codes]
+        is_numeric_1 = version_is_numeric[component][baseline_codes]
+        is_numeric_2 = version_is_numeric[component][current_codes]
+        upgrade = is_numeric_1 & is_numeric_2 & (values_2 > values_1)
+        is_ok.append((is_numeric_1 == is_numeric_2) & (upgrade | (values_2 == values_1)))
+        is_upgrade.append(upgrade)
+
+    (ok_a, ok_b, ok_c, ok_d) = is_ok
+    (up_a, up_b, up_c, up_d) = is_upgrade
+    is_compatible &= ok_a & (up_a | (ok_b & ok_c & (up_c | (ok_d & (up_b | up_d)))))
+
+    is_equal[unequal] = is_compatible
+    return is_equal
+
+
+def compare_columns(baselines, currents, *, strict = False, workers = None, chunksize = 256):
+    """
+    Compares each pair (baselines[i], currents[i]) of user-agent strings for
+    compatibility, exactly as `user_agent_strings_are_compatible()` would.
+
+        baselines, currents     equally long columns of user-agent strings:
+                                lists, NumPy arrays, pandas Series, or Arrow
+                                arrays
+        workers, chunksize      as for `compare_many()`
+
+    Returns a NumPy array of bool, True where the pair is compatible.
+    """
+
+    baselines = _as_list(baselines)
+    currents = _as_list(currents)
+    if len(baselines) != len(currents):
+        raise ValueError(f"baselines and currents differ in length: {len(baselines)} != {len(currents)}")
+
+    index = {}
+    baseline_codes = _factorize(baselines, index)
+    current_codes = _factorize(currents, index)
+    return compare_codes(baseline_codes, current_codes, list(index), strict=strict, workers=workers,
+                         chunksize=chunksize)
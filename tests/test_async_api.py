@@ -0,0 +1,166 @@
+"""
+Tests the asyncio comparison API with pytest.
+"""
+
+
+import asyncio
+import itertools
+import time
+
+import pytest
+
+import compare_user_agent_strings.ua_fingerprint as ua_fingerprint
+from compare_user_agent_strings import (
+                                        ClientFingerprint,
+                                        ParseBacklogFull,
+                                        clear_fingerprint_cache,
+                                        configure_lexical_prefilter,
+                                        configure_pair_decision_cache,
+                                        fingerprint_is_compatible_async,
+                                        pair_decision_cache_info,
+                                        user_agent_strings_are_compatible,
+                                        user_agent_strings_are_compatible_async,
+                                       )
+from compare_user_agent_strings.async_api import AsyncFingerprintResolver
+
+USER_AGENT_STRINGS = [
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/105.1',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.14; rv:104.1) Gecko/20100101 Firefox/105.1',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/106.0',
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/105.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 15_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.6 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.0 Mobile/15E148 Safari/604.1",
+    "Mozilla/4.0 (compatible; MSIE 6.0; Windows NT 5.1; SV1; .NET CLR 1.1.4322)",
+    ]
+
+
+@pytest.fixture
+def slow_counting_parser(monkeypatch):
+    """
+    Makes every parse take 50 ms and records the strings parsed.
+    """
+
+    parsed = []
+    real_client_fingerprint = ClientFingerprint
+
+    def slow_client_fingerprint(ua_string):
+        parsed.append(ua_string)
+        time.sleep(0.05)
+        return real_client_fingerprint(ua_string)
+
+    monkeypatch.setattr(ua_fingerprint, "ClientFingerprint", slow_client_fingerprint)
+    clear_fingerprint_cache()
+    yield parsed
+    clear_fingerprint_cache()
+
+
+@pytest.mark.parametrize("lexical_prefilter", [True, False])
+def test_async_decisions_match_synchronous(lexical_prefilter):
+    pairs = list(itertools.product(USER_AGENT_STRINGS, repeat=2))
+    expected = [(user_agent_strings_are_compatible(ua_1, ua_2), user_agent_strings_are_compatible(ua_1, ua_2,
+                                                                                                    strict=True))
+                for (ua_1, ua_2) in pairs]
+    baselines = {ua_string: ClientFingerprint(ua_string) for ua_string in USER_AGENT_STRINGS}
+
+    async def decide_all():
+        decisions = []
+        for (ua_1, ua_2) in pairs:
+            decisions.append((await user_agent_strings_are_compatible_async(ua_1, ua_2),
+                              await user_agent_strings_are_compatible_async(ua_1, ua_2, strict=True)))
+            assert await fingerprint_is_compatible_async(baselines[ua_1], ua_2) == decisions[-1][0]
+        return decisions
+
+    configure_lexical_prefilter(lexical_prefilter)
+    clear_fingerprint_cache()
+    try:
+        assert asyncio.run(decide_all()) == expected
+    finally:
+        configure_lexical_prefilter(True)
+
+
+def test_concurrent_requests_share_one_parse(slow_counting_parser):
+    resolver = AsyncFingerprintResolver(max_workers=2)
+    (ua_1, ua_2) = (USER_AGENT_STRINGS[4], USER_AGENT_STRINGS[5])
+
+    async def burst():
+        return await asyncio.gather(*(resolver.user_agent_strings_are_compatible(ua_1, ua_2) for _ in range(50)))
+
+    assert asyncio.run(burst()) == [True] * 50
+    assert sorted(slow_counting_parser) == sorted([ua_1, ua_2])
+    assert resolver.info()["offloaded"] == 2
+    assert resolver.info()["coalesced"] == 98
+
+    # Now cached: answered inline, without the executor.
+    asyncio.run(burst())
+    assert resolver.info()["offloaded"] == 2
+    resolver.shutdown()
+
+
+def test_async_decisions_share_the_memo_of_pair_decisions(slow_counting_parser):
+    (ua_1, ua_2) = (USER_AGENT_STRINGS[4], USER_AGENT_STRINGS[5])
+    assert asyncio.run(user_agent_strings_are_compatible_async(ua_1, ua_2))
+    assert pair_decision_cache_info()[:2] == (0, 1)
+
+    # Answered from the memo, by the synchronous function and the coroutines, with no further parse.
+    ua_fingerprint._fingerprint_cache.cache_clear()
+    assert user_agent_strings_are_compatible(ua_1, ua_2)
+    assert asyncio.run(user_agent_strings_are_compatible_async(ua_1, ua_2))
+    assert asyncio.run(fingerprint_is_compatible_async(ClientFingerprint(ua_1), ua_2))
+    assert sorted(slow_counting_parser) == sorted([ua_1, ua_2])
+    assert pair_decision_cache_info()[:2] == (3, 1)
+
+
+def test_memo_turned_on_during_a_parse(slow_counting_parser):
+    (ua_1, ua_2) = (USER_AGENT_STRINGS[4], USER_AGENT_STRINGS[5])
+
+    async def decide_while_turning_the_memo_on():
+        decision = asyncio.ensure_future(user_agent_strings_are_compatible_async(ua_1, ua_2))
+        await asyncio.sleep(0.01)
+        configure_pair_decision_cache(16)
+        return await decision
+
+    configure_pair_decision_cache(0)
+    try:
+        assert asyncio.run(decide_while_turning_the_memo_on())
+        assert pair_decision_cache_info().currsize == 1
+    finally:
+        configure_pair_decision_cache(ua_fingerprint.DEFAULT_PAIR_DECISION_CACHE_SIZE)
+
+
+def test_event_loop_keeps_running_during_cold_parses(slow_counting_parser):
+    resolver = AsyncFingerprintResolver(max_workers=1)
+
+    async def heartbeat():
+        for _ in range(5):
+            await asyncio.sleep(0.01)
+        return time.perf_counter()
+
+    async def main():
+        started = time.perf_counter()
+        parse = asyncio.ensure_future(resolver.get_client_fingerprint(USER_AGENT_STRINGS[6]))
+        heartbeat_finished = await heartbeat()
+        await parse
+        return heartbeat_finished - started
+
+    # The heartbeat (about 50 ms) finishes while the 50 ms parse runs, not after it.
+    assert asyncio.run(main()) < 0.1
+    resolver.shutdown()
+
+
+def test_backlog_limit_rejects_new_parses(slow_counting_parser):
+    resolver = AsyncFingerprintResolver(max_workers=1, max_pending=2)
+
+    async def burst():
+        requests = (resolver.get_client_fingerprint(ua_string) for ua_string in USER_AGENT_STRINGS[4:7])
+        return await asyncio.gather(*requests, return_exceptions=True)
+
+    results = asyncio.run(burst())
+    assert [result.__class__ for result in results] == [ClientFingerprint, ClientFingerprint, ParseBacklogFull]
+    assert resolver.info()["rejected"] == 1
+    assert resolver.info()["pending"] == 0
+    resolver.shutdown()
+
+
+def test_invalid_limits():
+    with pytest.raises(ValueError):
+        AsyncFingerprintResolver(max_pending=0)
@@ -0,0 +1,153 @@
+"""
+Tests with pytest that every installed parser backend yields the same
+fingerprints as ua-parser's legacy Parse(), and that backends can be switched.
+"""
+
+
+import itertools
+
+import pytest
+
+import compare_user_agent_strings.backends as backends
+import compare_user_agent_strings.ua_fingerprint as ua_fingerprint
+from compare_user_agent_strings import (
+                                        available_parser_backends,
+                                        clear_fingerprint_cache,
+                                        configure_parser_backend,
+                                        fingerprint_cache_info,
+                                        get_client_fingerprint,
+                                        parser_backend_info,
+                                        user_agent_strings_are_compatible,
+                                       )
+from compare_user_agent_strings.backends import PARSER_BACKENDS, backend_conformance_mismatches, resolver_backend
+from compare_user_agent_strings.corpus import generate_user_agent_strings
+
+# Strings outside the synthetic corpus: bots, mobile devices, legacy and malformed strings
+UNUSUAL_USER_AGENT_STRINGS = [
+    "Mozilla/4.0 (compatible; MSIE 6.0; Windows NT 5.1; SV1; .NET CLR 1.1.4322)",
+    "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) "
+    "Version/16.0 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (Linux; Android 12; SM-G991B) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/105.0.0.0 "
+    "Mobile Safari/537.36",
+    "curl/7.85.0",
+    "",
+    "Opera/9.80 (Windows NT 6.1; U; en) Presto/2.10.289 Version/12.02",
+    ]
+
+CONFORMANCE_CORPUS = generate_user_agent_strings(1000, seed=19) + UNUSUAL_USER_AGENT_STRINGS
+
+
+@pytest.fixture(scope="module")
+def legacy_parse_results():
+    # Parsed once for all the backends compared with it
+    parse = ua_fingerprint._load_ua_parser().Parse
+    return {ua_string: parse(ua_string) for ua_string in CONFORMANCE_CORPUS}
+
+
+@pytest.fixture
+def restore_parser_backend():
+    yield
+    configure_parser_backend(None)
+
+
+@pytest.mark.parametrize("backend", [name for name in PARSER_BACKENDS if name != "legacy"])
+def test_backend_conforms_to_legacy_parse(backend, legacy_parse_results):
+    if backend not in available_parser_backends():
+        pytest.skip(f"the {backend!r} parser backend is not installed")
+    assert backend_conformance_mismatches(backend, CONFORMANCE_CORPUS,
+                                          reference=legacy_parse_results.__getitem__) == []
+
+
+def test_switching_backends_keeps_decisions_and_clears_caches(restore_parser_backend):
+    ua_strings = generate_user_agent_strings(30, seed=2) + UNUSUAL_USER_AGENT_STRINGS[:4]
+    pairs = list(itertools.product(ua_strings, repeat=2))
+    expected = [user_agent_strings_are_compatible(ua_1, ua_2) for (ua_1, ua_2) in pairs]
+
+    configure_parser_backend("basic")
+    assert fingerprint_cache_info().currsize == 0
+    assert parser_backend_info()["backend"] == "basic"
+    assert ua_fingerprint._parser_backend is not None
+    assert [user_agent_strings_are_compatible(ua_1, ua_2) for (ua_1, ua_2) in pairs] == expected
+
+    configure_parser_backend(None)
+    assert parser_backend_info() == {"backend": "legacy", "available": available_parser_backends()}
+    assert ua_fingerprint._parser_backend is None
+
+
+def test_custom_backend_function(restore_parser_backend):
+    parsed = []
+
+    def recording_parse(ua_string):
+        parsed.append(ua_string)
+        return ua_fingerprint._load_ua_parser().Parse(ua_string)
+
+    # A closure has no unique module-level name, so it must be given one.
+    with pytest.raises(ValueError):
+        configure_parser_backend(recording_parse)
+    configure_parser_backend(recording_parse, name="recording")
+    get_client_fingerprint(UNUSUAL_USER_AGENT_STRINGS[0])
+    get_client_fingerprint(UNUSUAL_USER_AGENT_STRINGS[0])
+
+    assert parsed == [UNUSUAL_USER_AGENT_STRINGS[0]]
+    assert parser_backend_info()["backend"] == "custom:recording"
+    clear_fingerprint_cache()
+
+    # A module-level function is named after its module and qualified name.
+    configure_parser_backend(backends._legacy_parse)
+    assert parser_backend_info()["backend"] == "custom:compare_user_agent_strings.backends._legacy_parse"
+
+
+def test_resolver_backends_get_distinct_signatures(restore_parser_backend):
+    from compare_user_agent_strings.persistent_cache import parser_signature
+
+    if "basic" not in available_parser_backends():
+        pytest.skip("ua-parser's resolver API is not installed")
+    from ua_parser import BasicResolver, load_builtins
+
+    resolver = BasicResolver(load_builtins())
+    signatures = set()
+    for name in ("first", "second"):
+        configure_parser_backend(resolver_backend(resolver, name=name))
+        signatures.add(parser_signature())
+    assert len(signatures) == 2
+    with pytest.raises(ValueError):
+        configure_parser_backend(resolver_backend(resolver))
+
+
+def test_persistent_store_follows_the_backend(restore_parser_backend, tmp_path):
+    from compare_user_agent_strings import configure_persistent_fingerprint_cache, persistent_fingerprint_cache_info
+
+    configure_persistent_fingerprint_cache(tmp_path / "fingerprints.sqlite3", timeout=0.5)
+    try:
+        get_client_fingerprint(UNUSUAL_USER_AGENT_STRINGS[0])
+        legacy_signature = persistent_fingerprint_cache_info()["signature"]
+        configure_parser_backend(lambda ua_string: ua_fingerprint._load_ua_parser().Parse(ua_string), name="legacy-lambda")
+
+        assert persistent_fingerprint_cache_info()["signature"] != legacy_signature
+        assert "backend=custom:legacy-lambda" in persistent_fingerprint_cache_info()["signature"]
+        assert ua_fingerprint._persistent_store.get(UNUSUAL_USER_AGENT_STRINGS[0]) is None
+        assert ua_fingerprint._persistent_store.timeout == 0.5
+
+        # A signature pinned by the caller is kept when the store is reopened.
+        configure_persistent_fingerprint_cache(tmp_path / "fingerprints.sqlite3", signature="pinned")
+        configure_parser_backend(None)
+        assert persistent_fingerprint_cache_info()["signature"] == "pinned"
+    finally:
+        configure_persistent_fingerprint_cache(None)
+        clear_fingerprint_cache()
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        configure_parser_backend("hyperscan")
+    assert parser_backend_info()["backend"] == "legacy"
+
+
+def test_nonconforming_backend_is_reported():
+    def wrong_parse(ua_string):
+        parsed_string = ua_fingerprint._load_ua_parser().Parse(ua_string)
+        return dict(parsed_string, os=dict(parsed_string["os"], major="99"))
+
+    mismatches = backend_conformance_mismatches(wrong_parse, UNUSUAL_USER_AGENT_STRINGS[:2])
+    assert [ua_string for (ua_string, _, _) in mismatches] == UNUSUAL_USER_AGENT_STRINGS[:2]
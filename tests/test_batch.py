@@ -0,0 +1,74 @@
+"""
+Tests batch comparison with pytest.
+"""
+
+
+import itertools
+
+import pytest
+
+import compare_user_agent_strings.ua_fingerprint as ua_fingerprint
+from compare_user_agent_strings import (
+                                        clear_fingerprint_cache,
+                                        compare_many,
+                                        fingerprint_cache_info,
+                                        user_agent_strings_are_compatible,
+                                       )
+
+USER_AGENT_STRINGS = [
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/105.1',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.14; rv:104.1) Gecko/20100101 Firefox/105.1',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.16; rv:104.1) Gecko/20100101 Firefox/105.1',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 11.14; rv:104.1) Gecko/20100101 Firefox/105.1',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/106.0',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/104.2',
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/105.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 5.1; rv:7.0.1) Gecko/20100101 Firefox/7.0.1",
+    "Mozilla/4.0 (compatible; MSIE 6.0; Windows NT 5.1; SV1; .NET CLR 1.1.4322)",
+    ]
+
+
+@pytest.mark.parametrize("strict", [False, True])
+def test_compare_many_matches_single_pair_path(strict):
+    pairs = list(itertools.product(USER_AGENT_STRINGS, repeat=2))
+
+    expected = [user_agent_strings_are_compatible(ua_1, ua_2, strict=strict) for (ua_1, ua_2) in pairs]
+    from_pairs = compare_many(pairs, strict=strict)
+    from_columns = compare_many([ua_1 for (ua_1, _) in pairs], [ua_2 for (_, ua_2) in pairs], strict=strict)
+
+    assert isinstance(from_pairs, bytearray)
+    assert list(map(bool, from_pairs)) == expected
+    assert from_columns == from_pairs
+
+
+def test_compare_many_parses_each_distinct_string_once(monkeypatch):
+    monkeypatch.setattr(ua_fingerprint, "_lexical_prefilter_enabled", False)
+    clear_fingerprint_cache()
+    baseline = USER_AGENT_STRINGS[0]
+    pairs = [(baseline, USER_AGENT_STRINGS[4])] * 1000 + [(baseline, USER_AGENT_STRINGS[1])] * 1000
+
+    results = compare_many(iter(pairs))
+
+    assert results == bytearray([1]) * 1000 + bytearray([0]) * 1000
+    assert fingerprint_cache_info().misses == 3
+
+
+def test_compare_many_rejects_columns_of_different_lengths():
+    with pytest.raises(ValueError):
+        compare_many(USER_AGENT_STRINGS, USER_AGENT_STRINGS[1:])
+
+
+def test_parallel_compare_many_matches_serial():
+    pairs = list(itertools.product(USER_AGENT_STRINGS, repeat=2))
+    clear_fingerprint_cache()
+
+    parallel = compare_many(pairs, workers=2, chunksize=2)
+
+    assert parallel == compare_many(pairs)
+    assert compare_many(pairs, strict=True, workers=2) == compare_many(pairs, strict=True)
+
+
+@pytest.mark.parametrize("keyword_arguments", [{"workers": 0}, {"chunksize": 0}])
+def test_compare_many_rejects_invalid_parallel_options(keyword_arguments):
+    with pytest.raises(ValueError):
+        compare_many([], **keyword_arguments)
@@ -0,0 +1,65 @@
+"""
+Tests the synthetic corpus and the benchmark suite with pytest.
+"""
+
+
+import importlib.util
+import json
+
+from compare_user_agent_strings.__main__ import main
+from compare_user_agent_strings.corpus import generate_session_pairs, generate_user_agent_strings
+from compare_user_agent_strings.ua_fingerprint import get_client_fingerprint
+
+
+def test_corpus_has_exact_cardinality_and_is_reproducible():
+    ua_strings = generate_user_agent_strings(250, seed=7)
+
+    assert len(ua_strings) == len(set(ua_strings)) == 250
+    assert ua_strings == generate_user_agent_strings(250, seed=7)
+    assert ua_strings != generate_user_agent_strings(250, seed=8)
+
+
+def test_corpus_strings_parse_to_known_families():
+    for ua_string in generate_user_agent_strings(100, seed=3):
+        fingerprint = get_client_fingerprint(ua_string)
+        assert fingerprint.user_agent_family != "Other"
+        assert fingerprint.os_family != "Other"
+
+
+def test_session_pairs_mix_equal_and_differing_pairs():
+    pairs = generate_session_pairs(5000, distinct=200, seed=1)
+    distinct_strings = {ua_string for pair in pairs for ua_string in pair}
+    number_equal = sum(1 for (baseline, current) in pairs if baseline == current)
+
+    assert len(pairs) == 5000
+    assert len(distinct_strings) <= 200
+    assert 0.85 * 5000 < number_equal < 0.95 * 5000
+
+
+def test_bench_command_writes_json(tmp_path):
+    output_path = tmp_path / "bench.json"
+
+    assert main(["bench", "--distinct", "20", "--pairs", "500", "--no-reference", "--output", str(output_path)]) == 0
+
+    report = json.loads(output_path.read_text(encoding="utf-8"))
+    assert report["parameters"]["pairs"] == 500
+    expected_sections = {"single_pair_us", "parsing_us", "parser_backends", "batch", "memory",
+                         "session_memory", "session_tracking"}
+    if importlib.util.find_spec("numpy") is not None:
+        expected_sections.add("vectorized")
+    assert set(report["results"]) == expected_sections
+    assert report["results"]["memory"]["bytes_per_fingerprint"] > 0
+    assert report["results"]["parser_backends"]["legacy"]["cold_parse_us"] > 0
+    assert report["results"]["session_memory"]["sessions"] == 500
+    assert report["environment"]["package_version"]
+
+
+def test_session_tracking_counts_full_path_requests():
+    from compare_user_agent_strings.benchmarks import measure_session_tracking
+
+    upgrade = ("Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/105.1",
+               "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/106.0")
+    results = measure_session_tracking([upgrade], requests_per_session=4)
+
+    assert results["stateless"]["full_path_fraction"] == 1.0
+    assert results["session_tracker"]["full_path_fraction"] == 0.25
@@ -0,0 +1,107 @@
+"""
+Tests the compact ClientFingerprint and its serialization with pytest.
+"""
+
+
+import pickle
+
+import pytest
+from ua_parser import user_agent_parser
+
+import compare_user_agent_strings.ua_fingerprint as ua_fingerprint
+from compare_user_agent_strings.ua_fingerprint import (
+                                                        ClientFingerprint,
+                                                        clear_fingerprint_cache,
+                                                        fingerprint_cache_info,
+                                                        fingerprint_is_compatible,
+                                                        user_agent_strings_are_compatible,
+                                                      )
+
+USER_AGENT_STRINGS = [
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/105.1',
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/105.0.0.0 Safari/537.36",
+    "Mozilla/4.0 (compatible; MSIE 6.0; Windows NT 5.1; SV1; .NET CLR 1.1.4322)",
+    'Mozilla/5.0 (Linux; Android 7.1.1; Moto G (5S) Build/NPPS26.102-49-11) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/68.0.3440.91 Mobile Safari/537.36',
+    'Roku/DVP-9.10 (519.10E04111A)',
+    'Outlook-iOS/709.2226530.prod.iphone (3.24.1)',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/64.0.3282.140 Safari/537.36 Edge/17.17134',
+    'Ünïcödé/1.0 \udcff',
+    '',
+    ]
+
+
+def test_fingerprint_is_slotted_with_numeric_versions_preconverted():
+    fingerprint = ClientFingerprint(USER_AGENT_STRINGS[0])
+
+    assert not hasattr(fingerprint, "__dict__")
+    assert (fingerprint.os_major, fingerprint.os_minor) == (10, 15)
+    assert (fingerprint.user_agent_major, fingerprint.user_agent_minor) == (105, 1)
+    assert fingerprint.os_family is ClientFingerprint(USER_AGENT_STRINGS[1]).os_family
+
+    windows_xp = ClientFingerprint(USER_AGENT_STRINGS[2])
+    assert windows_xp.os_major == "XP"
+    assert windows_xp.os_minor is None
+
+
+@pytest.mark.parametrize("ua_string", USER_AGENT_STRINGS)
+def test_dict_form_matches_ua_parser(ua_string):
+    assert ClientFingerprint(ua_string).as_dict() == user_agent_parser.Parse(ua_string)
+
+
+@pytest.mark.parametrize("ua_string", USER_AGENT_STRINGS)
+def test_bytes_and_pickle_round_trip(ua_string):
+    fingerprint = ClientFingerprint(ua_string)
+    data = fingerprint.to_bytes()
+
+    restored = ClientFingerprint.from_bytes(data)
+    assert restored == fingerprint
+    assert restored.to_bytes() == data
+    assert ClientFingerprint.from_bytes(bytearray(data)) == fingerprint
+    assert pickle.loads(pickle.dumps(fingerprint)) == fingerprint
+
+
+def test_negative_and_large_versions_round_trip():
+    fingerprint = ClientFingerprint(USER_AGENT_STRINGS[0])
+    fingerprint.os_patch = -3
+    fingerprint.user_agent_patch = 2 ** 80
+
+    assert ClientFingerprint.from_bytes(fingerprint.to_bytes()) == fingerprint
+
+
+def test_from_bytes_rejects_malformed_data():
+    data = ClientFingerprint(USER_AGENT_STRINGS[0]).to_bytes()
+
+    for malformed in (b"", b"\x00" + data[1:], data[:-1], data + b"\x00", data[:1] + b"\x09" + data[2:]):
+        with pytest.raises(ValueError):
+            ClientFingerprint.from_bytes(malformed)
+
+
+def test_fingerprint_is_compatible_matches_string_comparison():
+    user_agent_strings = [
+        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/105.1',
+        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.14; rv:104.1) Gecko/20100101 Firefox/105.1',
+        'Mozilla/5.0 (Macintosh; Intel Mac OS X 11.14; rv:104.1) Gecko/20100101 Firefox/105.1',
+        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/105.2',
+        "Mozilla/5.0 (Windows NT 5.1; rv:7.0.1) Gecko/20100101 Firefox/7.0.1",
+        ] + USER_AGENT_STRINGS
+
+    for ua_string_1 in user_agent_strings:
+        baseline = ClientFingerprint.from_bytes(ClientFingerprint(ua_string_1).to_bytes())
+        for ua_string_2 in user_agent_strings:
+            for strict in (False, True):
+                expected = user_agent_strings_are_compatible(ua_string_1, ua_string_2, strict=strict)
+                assert fingerprint_is_compatible(baseline, ua_string_2, strict=strict) == expected
+                assert fingerprint_is_compatible(baseline, ClientFingerprint(ua_string_2), strict=strict) == expected
+
+
+def test_fingerprint_is_compatible_parses_at_most_the_current_string(monkeypatch):
+    monkeypatch.setattr(ua_fingerprint, "_lexical_prefilter_enabled", False)
+    monkeypatch.setattr(ua_fingerprint, "_pair_decisions_enabled", False)
+    baseline = ClientFingerprint(USER_AGENT_STRINGS[0])
+    upgraded = USER_AGENT_STRINGS[0].replace("Firefox/105.1", "Firefox/106.0")
+    clear_fingerprint_cache()
+
+    assert fingerprint_is_compatible(baseline, upgraded)
+    assert fingerprint_is_compatible(baseline, upgraded)
+    assert fingerprint_is_compatible(baseline, USER_AGENT_STRINGS[0])
+    assert fingerprint_cache_info()[:2] == (1, 1)
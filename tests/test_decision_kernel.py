@@ -0,0 +1,113 @@
+"""
+Tests with pytest that the module-level decision kernel decides exactly as the
+frozen original implementation does, including for non-numeric and missing
+version components, and that the micro-benchmark runs.
+"""
+
+
+import itertools
+import random
+
+import pytest
+from ua_parser import user_agent_parser
+
+from compare_user_agent_strings import benchmarks
+from compare_user_agent_strings._reference import reference_user_agent_strings_are_compatible
+from compare_user_agent_strings.metrics import disable_metrics, enable_metrics
+from compare_user_agent_strings.ua_fingerprint import (
+                                                        _analyze_with_reason,
+                                                        analyze_parsed_fingerprints,
+                                                        clear_fingerprint_cache,
+                                                        get_client_fingerprint,
+                                                        user_agent_strings_are_compatible,
+                                                      )
+
+VERSION_COMPONENT_VALUES = [None, "XP", "Vista", "1", "2", "01", "10"]
+IDENTITIES = [
+    (("Apple", "Mac", "Mac"), "Mac OS X", "Firefox"),
+    (("Apple", "Mac", "Mac"), "Mac OS X", "Chrome"),
+    ((None, "Other", None), "Windows", "Firefox"),
+    ]
+
+
+@pytest.fixture
+def synthetic_parser(monkeypatch):
+    """
+    Replaces ua-parser with a table of synthetic parse results, keyed by fake
+    user-agent strings, so that every combination of version components can be
+    exercised.
+    """
+
+    table = {}
+    for (index, (identity, versions)) in enumerate(itertools.product(IDENTITIES,
+                                                                     itertools.product(VERSION_COMPONENT_VALUES,
+                                                                                       repeat=4))):
+        ((brand, device_family, model), os_family, user_agent_family) = identity
+        ua_string = f"synthetic/{index}"
+        table[ua_string] = {
+            "string": ua_string,
+            "device": {"brand": brand, "family": device_family, "model": model},
+            "os": {"family": os_family, "major": versions[0], "minor": versions[1], "patch": None,
+                   "patch_minor": None},
+            "user_agent": {"family": user_agent_family, "major": versions[2], "minor": versions[3], "patch": None},
+        }
+
+    monkeypatch.setattr(user_agent_parser, "Parse", table.__getitem__)
+    clear_fingerprint_cache()
+    yield sorted(table)
+    clear_fingerprint_cache()
+
+
+def test_kernel_matches_reference_on_synthetic_versions(synthetic_parser):
+    ua_strings = synthetic_parser
+    random_generator = random.Random(20221012)
+
+    pairs = [(random_generator.choice(ua_strings), random_generator.choice(ua_strings)) for _ in range(20000)]
+    # Pairs that differ in exactly one version component are the interesting ones; make sure there are plenty.
+    pairs += [(ua_strings[index], ua_strings[index + step])
+              for index in range(0, len(ua_strings) - 400, 7)
+              for step in (1, 7, 49, 343)]
+
+    for (ua_string_1, ua_string_2) in pairs:
+        assert (user_agent_strings_are_compatible(ua_string_1, ua_string_2)
+                == reference_user_agent_strings_are_compatible(ua_string_1, ua_string_2))
+
+
+def test_reason_kernel_matches_kernel_on_synthetic_versions(synthetic_parser):
+    ua_strings = synthetic_parser
+    random_generator = random.Random(20221016)
+    pairs = [(random_generator.choice(ua_strings), random_generator.choice(ua_strings)) for _ in range(20000)]
+
+    for (ua_string_1, ua_string_2) in pairs:
+        (fingerprint_1, fingerprint_2) = (get_client_fingerprint(ua_string_1), get_client_fingerprint(ua_string_2))
+        (is_compatible, reason, _) = _analyze_with_reason(fingerprint_1, fingerprint_2)
+        assert is_compatible == analyze_parsed_fingerprints(fingerprint_1, fingerprint_2)
+        assert is_compatible == (reason == "upgrade")
+
+    enable_metrics()
+    try:
+        for (ua_string_1, ua_string_2) in pairs[:2000]:
+            assert (user_agent_strings_are_compatible(ua_string_1, ua_string_2)
+                    == reference_user_agent_strings_are_compatible(ua_string_1, ua_string_2))
+    finally:
+        disable_metrics()
+
+
+def test_vectorized_kernel_matches_kernel_on_synthetic_versions(synthetic_parser):
+    np = pytest.importorskip("numpy")
+    from compare_user_agent_strings.vectorized import compare_columns
+
+    ua_strings = synthetic_parser
+    random_generator = random.Random(20221017)
+    pairs = [(random_generator.choice(ua_strings), random_generator.choice(ua_strings)) for _ in range(20000)]
+    pairs += [(ua_strings[index], ua_strings[index + step])
+              for index in range(0, len(ua_strings) - 400, 7)
+              for step in (1, 7, 49, 343)]
+
+    results = compare_columns(np.array([ua_1 for (ua_1, _) in pairs], dtype=object), [ua_2 for (_, ua_2) in pairs])
+    assert results.tolist() == [user_agent_strings_are_compatible(ua_1, ua_2) for (ua_1, ua_2) in pairs]
+
+
+def test_microbenchmark_runs():
+    timings = benchmarks.time_decision_paths(user_agent_strings_are_compatible, loops=1, cold_loops=1)
+    assert set(timings) == {"equal_strings", "parse_warm", "parse_cold"}
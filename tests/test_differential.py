@@ -0,0 +1,74 @@
+"""
+Tests with pytest that every accelerated decision path agrees with the frozen
+original implementation over generated edge-case pairs.
+
+The number of pairs defaults to a few thousand, to keep the suite fast; set
+the environment variable COMPARE_UA_DIFFERENTIAL_PAIRS to check more (e.g.,
+200000), or run `python -m compare_user_agent_strings differential`.
+"""
+
+
+import json
+import os
+
+import pytest
+
+import compare_user_agent_strings.ua_fingerprint as ua_fingerprint
+from compare_user_agent_strings import fingerprint_cache_info, get_client_fingerprint
+from compare_user_agent_strings.__main__ import main
+from compare_user_agent_strings.corpus import DIFFERENTIAL_PAIR_KINDS, generate_differential_pairs
+from compare_user_agent_strings.differential import available_differential_modes, run_differential_check
+
+NUMBER_OF_PAIRS = int(os.environ.get("COMPARE_UA_DIFFERENTIAL_PAIRS", "3000"))
+
+
+@pytest.fixture(scope="module")
+def differential_pairs():
+    return generate_differential_pairs(NUMBER_OF_PAIRS, distinct=400, seed=20221018)
+
+
+def test_pairs_cover_the_edge_cases(differential_pairs):
+    kinds = {kind for (_, _, kind) in differential_pairs}
+    fingerprints = [get_client_fingerprint(ua_string)
+                    for (baseline, current, _) in differential_pairs for ua_string in (baseline, current)]
+
+    assert kinds == set(DIFFERENTIAL_PAIR_KINDS)
+    assert differential_pairs == generate_differential_pairs(NUMBER_OF_PAIRS, distinct=400, seed=20221018)
+    assert len({ua_string for (baseline, current, _) in differential_pairs for ua_string in (baseline, current)}) <= 400
+    assert any(fingerprint.os_major == "XP" for fingerprint in fingerprints)
+    assert any(fingerprint.os_major == "Vista" for fingerprint in fingerprints)
+    assert any((fingerprint.os_family == "Mac OS X") and (fingerprint.os_major is None) for fingerprint in fingerprints)
+    assert any((fingerprint.user_agent_major is not None) and (fingerprint.user_agent_minor is None)
+               for fingerprint in fingerprints)
+
+
+def test_every_mode_agrees_with_the_reference(differential_pairs):
+    saved_cache_maxsize = fingerprint_cache_info().maxsize
+
+    report = run_differential_check(differential_pairs)
+
+    assert set(report["modes"]) == set(available_differential_modes())
+    assert {mode: mode_report["examples"] for (mode, mode_report) in report["modes"].items()
+            if mode_report["mismatches"]} == {}
+    assert report["mismatches"] == 0
+    assert all(mode_report["cold_us_per_pair"] > 0 for mode_report in report["modes"].values())
+    # The configuration of the process is restored.
+    assert fingerprint_cache_info().maxsize == saved_cache_maxsize
+    assert ua_fingerprint._lexical_prefilter_enabled and ua_fingerprint._pair_decisions_enabled
+    assert (ua_fingerprint._metrics is None) and (ua_fingerprint._parser_backend is None)
+
+
+def test_unknown_mode_is_rejected(differential_pairs):
+    with pytest.raises(ValueError):
+        run_differential_check(differential_pairs[:10], modes=["turbo"])
+
+
+def test_differential_command_writes_json(tmp_path):
+    output_path = tmp_path / "differential.json"
+
+    assert main(["differential", "--pairs", "200", "--distinct", "80", "--mode", "default", "--mode", "batch",
+                 "--output", str(output_path)]) == 0
+
+    report = json.loads(output_path.read_text(encoding="utf-8"))
+    assert set(report["modes"]) == {"default", "batch"}
+    assert report["pairs"] == 200
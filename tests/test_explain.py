@@ -0,0 +1,95 @@
+"""
+Tests with pytest that the explained comparisons make the same decisions, in
+the same single pass, as the plain ones.
+"""
+
+
+import itertools
+
+import pytest
+
+from compare_user_agent_strings import (
+                                        ClientFingerprint,
+                                        ComparisonResult,
+                                        Reason,
+                                        clear_fingerprint_cache,
+                                        configure_lexical_prefilter,
+                                        explain_compatibility,
+                                        explain_fingerprint_compatibility,
+                                        fingerprint_is_compatible,
+                                        fingerprint_source_info,
+                                        user_agent_strings_are_compatible,
+                                       )
+from compare_user_agent_strings.corpus import generate_user_agent_strings
+
+UA_FIREFOX = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/105.1'
+UA_FIREFOX_UPGRADE = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/106.0'
+UA_FIREFOX_NEWER_OS = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 11.0; rv:104.1) Gecko/20100101 Firefox/105.1'
+UA_CHROME = ("Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) "
+             "Chrome/106.0.0.0 Safari/537.36")
+UA_WINDOWS_XP = "Mozilla/5.0 (Windows NT 5.1; rv:7.0.1) Gecko/20100101 Firefox/7.0.1"
+UA_WINDOWS_7 = "Mozilla/5.0 (Windows NT 6.1; rv:7.0.1) Gecko/20100101 Firefox/7.0.1"
+
+
+@pytest.fixture(params=[True, False], ids=["prefilter", "no_prefilter"])
+def lexical_prefilter(request):
+    clear_fingerprint_cache()
+    configure_lexical_prefilter(request.param)
+    yield request.param
+    configure_lexical_prefilter(True)
+    clear_fingerprint_cache()
+
+
+def test_explanations_agree_with_decisions(lexical_prefilter):
+    ua_strings = generate_user_agent_strings(40, seed=5) + [UA_FIREFOX, UA_FIREFOX_UPGRADE, UA_CHROME, UA_WINDOWS_XP]
+    for ((ua_string_1, ua_string_2), strict) in itertools.product(itertools.product(ua_strings, repeat=2),
+                                                                  (False, True)):
+        result = explain_compatibility(ua_string_1, ua_string_2, strict=strict)
+        assert result.is_compatible is user_agent_strings_are_compatible(ua_string_1, ua_string_2, strict=strict)
+        assert bool(result) is result.is_compatible
+        assert result.is_compatible == (result.reason in (Reason.IDENTICAL, Reason.UPGRADE))
+
+        baseline = ClientFingerprint(ua_string_1)
+        assert explain_fingerprint_compatibility(baseline, ua_string_2, strict=strict).is_compatible \
+               is fingerprint_is_compatible(baseline, ua_string_2, strict=strict)
+
+
+@pytest.mark.parametrize("ua_string_1, ua_string_2, strict, expected", [
+    (UA_FIREFOX, UA_FIREFOX, False, (True, Reason.IDENTICAL, None)),
+    (UA_FIREFOX, UA_FIREFOX_UPGRADE, True, (False, Reason.STRICT_MISMATCH, "string")),
+    (UA_FIREFOX, UA_FIREFOX_UPGRADE, False, (True, Reason.UPGRADE, "user_agent_major")),
+    (UA_FIREFOX, UA_FIREFOX_NEWER_OS, False, (True, Reason.UPGRADE, "os_major")),
+    (UA_FIREFOX_UPGRADE, UA_FIREFOX, False, (False, Reason.DOWNGRADE, "user_agent_major")),
+    (UA_WINDOWS_XP, UA_WINDOWS_7, False, (False, Reason.NON_NUMERIC_MISMATCH, "os_major")),
+    (UA_FIREFOX, UA_CHROME, False, (False, Reason.IDENTITY_MISMATCH, "user_agent_family")),
+    ])
+def test_reasons(lexical_prefilter, ua_string_1, ua_string_2, strict, expected):
+    result = explain_compatibility(ua_string_1, ua_string_2, strict=strict)
+    assert (result.is_compatible, result.reason, result.attribute) == expected
+    assert result.reason == expected[1].value
+
+
+def test_versions_and_path():
+    clear_fingerprint_cache()
+    configure_lexical_prefilter(False)
+    try:
+        result = explain_compatibility(UA_FIREFOX_UPGRADE, UA_FIREFOX)
+        assert (result.path, result.versions_1, result.versions_2) == ("parsed", (10, 15, 106, 0), (10, 15, 105, 1))
+        assert explain_compatibility(UA_FIREFOX_UPGRADE, UA_FIREFOX) == ComparisonResult(
+                   False, "cached", Reason.DOWNGRADE, "user_agent_major", (10, 15, 106, 0), (10, 15, 105, 1))
+        assert "reason='downgrade'" in repr(result)
+    finally:
+        configure_lexical_prefilter(True)
+        clear_fingerprint_cache()
+
+
+def test_explaining_costs_no_extra_parse():
+    pairs = [(UA_WINDOWS_XP, UA_WINDOWS_7), (UA_FIREFOX, UA_CHROME), (UA_FIREFOX, UA_FIREFOX_UPGRADE)]
+    parses = []
+    for explain in (False, True):
+        clear_fingerprint_cache()
+        for (ua_string_1, ua_string_2) in pairs:
+            (explain_compatibility if explain else user_agent_strings_are_compatible)(ua_string_1, ua_string_2)
+        parses.append(fingerprint_source_info()["parsed"])
+    clear_fingerprint_cache()
+    assert parses == [2, 2]
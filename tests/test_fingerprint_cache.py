@@ -0,0 +1,134 @@
+"""
+Tests the bounded cache and the process-wide fingerprint cache with pytest.
+"""
+
+
+import pytest
+
+from compare_user_agent_strings.bounded_cache import BoundedCache
+from compare_user_agent_strings.ua_fingerprint import (
+                                                        DEFAULT_FINGERPRINT_CACHE_SIZE,
+                                                        DEFAULT_PAIR_DECISION_CACHE_SIZE,
+                                                        clear_fingerprint_cache,
+                                                        configure_fingerprint_cache,
+                                                        configure_lexical_prefilter,
+                                                        configure_pair_decision_cache,
+                                                        fingerprint_cache_info,
+                                                        fingerprint_is_compatible,
+                                                        get_client_fingerprint,
+                                                        pair_decision_cache_info,
+                                                        user_agent_strings_are_compatible,
+                                                      )
+
+UA_BASE = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/105.1'
+UA_UPGRADE = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/106.0'
+UA_DOWNGRADE = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.14; rv:104.1) Gecko/20100101 Firefox/105.1'
+
+
+@pytest.fixture
+def fresh_fingerprint_cache():
+    # These strings are all decided by the lexical prefilter, which must be off for them to reach the cache.
+    # Nor may repeated pairs be answered by the memo of pair decisions.
+    configure_lexical_prefilter(False)
+    configure_pair_decision_cache(0)
+    configure_fingerprint_cache(DEFAULT_FINGERPRINT_CACHE_SIZE)
+    clear_fingerprint_cache()
+    yield
+    configure_fingerprint_cache(DEFAULT_FINGERPRINT_CACHE_SIZE)
+    clear_fingerprint_cache()
+    configure_pair_decision_cache(DEFAULT_PAIR_DECISION_CACHE_SIZE)
+    configure_lexical_prefilter(True)
+
+
+@pytest.fixture
+def fresh_pair_decision_cache(fresh_fingerprint_cache):
+    configure_pair_decision_cache(DEFAULT_PAIR_DECISION_CACHE_SIZE)
+    yield
+    configure_pair_decision_cache(DEFAULT_PAIR_DECISION_CACHE_SIZE)
+
+
+def test_bounded_cache_lru_eviction():
+    cache = BoundedCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1          # "a" is now the most recently used
+    cache.put("c", 3)                   # evicts "b"
+
+    assert "b" not in cache
+    assert cache.get("b") is None
+    assert cache.cache_info() == (1, 1, 1, 2, 2)
+
+
+def test_bounded_cache_fifo_eviction_and_resize():
+    cache = BoundedCache(2, policy="fifo")
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1          # does not reorder under FIFO
+    cache.put("c", 3)                   # evicts "a"
+    assert "a" not in cache
+
+    cache.resize(1)
+    assert len(cache) == 1
+    assert "c" in cache
+    assert cache.cache_info().evictions == 2
+
+    cache.resize(0)
+    assert cache.get_or_create("d", str.upper) == "D"
+    assert len(cache) == 0
+
+
+def test_bounded_cache_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        BoundedCache(2, policy="random")
+
+
+def test_fingerprint_is_parsed_once_per_distinct_string(fresh_fingerprint_cache):
+    for _ in range(3):
+        assert user_agent_strings_are_compatible(UA_BASE, UA_UPGRADE)
+        assert not user_agent_strings_are_compatible(UA_BASE, UA_DOWNGRADE)
+
+    info = fingerprint_cache_info()
+    assert info.misses == 3
+    assert info.hits == 9
+    assert info.currsize == 3
+    assert get_client_fingerprint(UA_BASE) is get_client_fingerprint(UA_BASE)
+
+    clear_fingerprint_cache()
+    assert fingerprint_cache_info() == (0, 0, 0, DEFAULT_FINGERPRINT_CACHE_SIZE, 0)
+
+
+def test_results_unchanged_when_cache_is_tiny(fresh_fingerprint_cache):
+    configure_fingerprint_cache(1, policy="fifo")
+    assert user_agent_strings_are_compatible(UA_BASE, UA_UPGRADE)
+    assert not user_agent_strings_are_compatible(UA_BASE, UA_DOWNGRADE)
+    assert fingerprint_cache_info().evictions >= 2
+
+
+def test_repeated_pairs_are_analyzed_once(fresh_pair_decision_cache):
+    for _ in range(3):
+        assert user_agent_strings_are_compatible(UA_BASE, UA_UPGRADE)
+        assert not user_agent_strings_are_compatible(UA_BASE, UA_DOWNGRADE)
+        assert fingerprint_is_compatible(get_client_fingerprint(UA_BASE), UA_UPGRADE)
+        # Strict decisions are string comparisons, which never reach the memo.
+        assert not user_agent_strings_are_compatible(UA_BASE, UA_UPGRADE, strict=True)
+
+    assert pair_decision_cache_info()[:2] == (7, 2)
+    assert fingerprint_cache_info().misses == 3
+
+    clear_fingerprint_cache()
+    assert pair_decision_cache_info() == (0, 0, 0, DEFAULT_PAIR_DECISION_CACHE_SIZE, 0)
+
+
+def test_results_unchanged_when_pair_decision_cache_is_tiny(fresh_pair_decision_cache):
+    ua_strings = [UA_BASE, UA_UPGRADE, UA_DOWNGRADE]
+    pairs = [(ua_1, ua_2) for ua_1 in ua_strings for ua_2 in ua_strings]
+    expected = [user_agent_strings_are_compatible(ua_1, ua_2) for (ua_1, ua_2) in pairs]
+
+    configure_pair_decision_cache(1, policy="fifo")
+    for _ in range(2):
+        assert [user_agent_strings_are_compatible(ua_1, ua_2) for (ua_1, ua_2) in pairs] == expected
+    assert pair_decision_cache_info().evictions >= 5
+
+    configure_pair_decision_cache(0)
+    assert [user_agent_strings_are_compatible(ua_1, ua_2) for (ua_1, ua_2) in pairs] == expected
+    assert pair_decision_cache_info().currsize == 0
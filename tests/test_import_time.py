@@ -0,0 +1,91 @@
+"""
+Tests with pytest, in fresh interpreters, that importing the package is cheap
+and that ua_parser is loaded only on first use or by warm_up().
+"""
+
+
+import subprocess
+import sys
+
+import pytest
+
+# Modules that `import compare_user_agent_strings` must not import
+DEFERRED_MODULES = ("ua_parser", "pprint", "concurrent.futures", "sqlite3", "importlib.metadata",
+                    "numpy", "compare_user_agent_strings.ua_fingerprint", "compare_user_agent_strings.batch",
+                    "compare_user_agent_strings.vectorized", "compare_user_agent_strings.backends")
+
+UA_1 = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/105.1'
+UA_2 = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/106.0'
+
+
+def _run_python(*arguments):
+    completed = subprocess.run([sys.executable, *arguments], capture_output=True, text=True, check=True)
+    return completed
+
+
+def _imported_modules(importtime_output):
+    """
+    Returns the names of the modules listed by `python -X importtime`, mapped
+    to their cumulative import times in microseconds.
+    """
+
+    modules = {}
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        (_, cumulative, name) = line.split("|")
+        if cumulative.strip().isdigit():
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def test_package_import_defers_heavy_modules():
+    modules = _imported_modules(_run_python("-X", "importtime", "-c", "import compare_user_agent_strings").stderr)
+
+    assert "compare_user_agent_strings" in modules
+    assert [name for name in modules if name.startswith(DEFERRED_MODULES)] == []
+
+
+def test_core_import_does_not_load_ua_parser():
+    modules = _imported_modules(_run_python("-X", "importtime", "-c",
+                                            "from compare_user_agent_strings import "
+                                            "user_agent_strings_are_compatible").stderr)
+
+    assert "compare_user_agent_strings.ua_fingerprint" in modules
+    assert not any(name.startswith(("ua_parser", "pprint")) for name in modules)
+
+
+@pytest.mark.parametrize("warm", [False, True])
+def test_warm_up_moves_parser_loading_out_of_first_call(warm):
+    script = f"""
+import sys, time
+import compare_user_agent_strings as package
+warm_up_seconds = package.warm_up() if {warm} else None
+loaded_before_first_call = "ua_parser" in sys.modules
+start = time.perf_counter()
+package.user_agent_strings_are_compatible({UA_1!r}, {UA_2!r})
+print(loaded_before_first_call, warm_up_seconds, time.perf_counter() - start)
+"""
+    (loaded_before_first_call, warm_up_seconds, first_call_seconds) = _run_python("-c", script).stdout.split()
+
+    assert loaded_before_first_call == str(warm)
+    if warm:
+        # The first call only parses two strings; loading ua_parser compiles its whole regex table.
+        assert float(first_call_seconds) < float(warm_up_seconds)
+
+
+def test_command_line_imports_only_the_subcommand_run():
+    script = """
+import sys
+from compare_user_agent_strings.__main__ import main
+try:
+    main(["replay", "--help"])
+except SystemExit:
+    pass
+print(sorted(name for name in sys.modules if name.startswith("compare_user_agent_strings.")))
+"""
+    imported = _run_python("-c", script).stdout.splitlines()[-1]
+
+    assert "compare_user_agent_strings.log_replay" in imported
+    for name in ("benchmarks", "precompute", "differential"):
+        assert f"compare_user_agent_strings.{name}'" not in imported
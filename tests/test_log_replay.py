@@ -0,0 +1,105 @@
+"""
+Tests the access-log replay with pytest.
+"""
+
+
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+from compare_user_agent_strings.__main__ import main as package_main
+from compare_user_agent_strings.log_replay import SessionAuditor, iter_records, main
+
+UA_BASE = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/105.1'
+UA_UPGRADE = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/106.0'
+UA_DOWNGRADE = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.14; rv:104.1) Gecko/20100101 Firefox/105.1'
+UA_OTHER = "Mozilla/4.0 (compatible; MSIE 6.0; Windows NT 5.1; SV1; .NET CLR 1.1.4322)"
+
+RECORDS = [
+    ("a", "2022-10-01T00:00:00", UA_BASE),
+    ("b", "2022-10-01T00:00:01", UA_BASE),
+    ("a", "2022-10-01T00:00:02", UA_BASE),
+    ("a", "2022-10-01T00:00:03", UA_UPGRADE),       # strict flag only
+    ("b", "2022-10-01T00:00:04", UA_DOWNGRADE),     # strict and non-strict flag
+    ("b", "2022-10-01T00:00:05", UA_OTHER),         # after flag
+    ("c", "2022-10-01T00:00:06", UA_OTHER),
+    ]
+
+
+def _write_csv(path, records, *, opener = open):
+    with opener(path, "wt", encoding="utf-8", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(("timestamp", "session_id", "user_agent"))
+        for (session_id, timestamp, user_agent) in records:
+            writer.writerow((timestamp, session_id, user_agent))
+
+
+def _read_output(flagged_path, summary_path):
+    with open(flagged_path, encoding="utf-8", newline="") as flagged_file:
+        flagged_rows = list(csv.reader(flagged_file))
+    with open(summary_path, encoding="utf-8") as summary_file:
+        summary = json.load(summary_file)
+    return (flagged_rows, summary)
+
+
+@pytest.mark.parametrize("file_name", ["log.csv", "log.csv.gz", "log.jsonl"])
+def test_replay_flags_sessions_and_counts_both_policies(tmp_path, file_name):
+    input_path = tmp_path / file_name
+    if file_name.endswith(".jsonl"):
+        input_path.write_text("".join(json.dumps({"session_id": session_id, "timestamp": timestamp,
+                                                  "user_agent": user_agent}) + "\n"
+                                      for (session_id, timestamp, user_agent) in RECORDS)
+                              + "not json\n", encoding="utf-8")
+    elif file_name.endswith(".gz"):
+        _write_csv(input_path, RECORDS, opener=gzip.open)
+    else:
+        _write_csv(input_path, RECORDS)
+
+    flagged_path = tmp_path / "flagged.csv"
+    summary_path = tmp_path / "summary.json"
+    assert main([str(input_path), "--flagged", str(flagged_path), "--summary", str(summary_path)]) == 0
+
+    (flagged_rows, summary) = _read_output(flagged_path, summary_path)
+    assert flagged_rows == [["session_id", "timestamp", "baseline_user_agent", "user_agent"],
+                            ["b", "2022-10-01T00:00:04", UA_BASE, UA_DOWNGRADE]]
+    assert summary["sessions"] == 3
+    assert summary["comparisons"] == 4
+    assert summary["identical_user_agent"] == 1
+    assert summary["strict"] == {"incompatible_requests": 3, "flagged_sessions": 2}
+    assert summary["non_strict"] == {"incompatible_requests": 2, "flagged_sessions": 1}
+    assert summary["requests_after_flag"] == 1
+    assert summary["malformed_records"] == (1 if file_name.endswith(".jsonl") else 0)
+
+
+def test_strict_policy_flags_first_differing_request(tmp_path):
+    input_path = tmp_path / "log.tsv"
+    input_path.write_text("".join("\t".join(record) + "\n" for record in RECORDS), encoding="utf-8")
+    flagged_path = tmp_path / "flagged.csv"
+    summary_path = tmp_path / "summary.json"
+
+    assert package_main(["replay", str(input_path), "--no-header", "--strict",
+                         "--flagged", str(flagged_path), "--summary", str(summary_path)]) == 0
+
+    (flagged_rows, summary) = _read_output(flagged_path, summary_path)
+    assert [row[0] for row in flagged_rows[1:]] == ["a", "b"]
+    assert summary["policy"] == "strict"
+    assert summary["requests_after_flag"] == 1
+
+
+def test_records_are_streamed_lazily():
+    lines = ("session_id,user_agent\n" if index == 0 else f"s{index % 10},{UA_BASE}\n" for index in range(10 ** 9))
+    records = iter_records(lines, "csv")
+    auditor = SessionAuditor()
+    for (_, record) in zip(range(1000), records):
+        auditor.observe(*record)
+
+    assert auditor.records == 1000
+    assert auditor.summary()["sessions"] == 10
+
+
+def test_csv_header_must_name_required_columns():
+    with pytest.raises(ValueError):
+        list(iter_records(io.StringIO("sid,ua\n1,x\n"), "csv"))
@@ -0,0 +1,167 @@
+"""
+Tests the optional hot-path instrumentation with pytest.
+"""
+
+
+import asyncio
+import itertools
+
+import pytest
+
+import compare_user_agent_strings.ua_fingerprint as ua_fingerprint
+from compare_user_agent_strings import (
+                                        ClientFingerprint,
+                                        clear_fingerprint_cache,
+                                        compare_many,
+                                        configure_lexical_prefilter,
+                                        disable_metrics,
+                                        enable_metrics,
+                                        fingerprint_is_compatible,
+                                        format_prometheus,
+                                        metrics_snapshot,
+                                        user_agent_strings_are_compatible,
+                                        user_agent_strings_are_compatible_async,
+                                       )
+from compare_user_agent_strings.corpus import generate_user_agent_strings
+from compare_user_agent_strings.metrics import LatencyHistogram
+
+UA_FIREFOX = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/105.1'
+UA_FIREFOX_UPGRADE = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/106.0'
+UA_FIREFOX_OLDER_OS = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.14; rv:104.1) Gecko/20100101 Firefox/105.1'
+UA_CHROME_UPGRADE = ("Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) "
+                     "Chrome/106.0.0.0 Safari/537.36")
+UA_WINDOWS_XP = "Mozilla/5.0 (Windows NT 5.1; rv:7.0.1) Gecko/20100101 Firefox/7.0.1"
+UA_WINDOWS_7 = "Mozilla/5.0 (Windows NT 6.1; rv:7.0.1) Gecko/20100101 Firefox/7.0.1"
+
+
+@pytest.fixture
+def metrics():
+    clear_fingerprint_cache()
+    yield enable_metrics()
+    disable_metrics()
+    configure_lexical_prefilter(True)
+    clear_fingerprint_cache()
+
+
+def test_paths_and_reasons_are_counted(metrics):
+    configure_lexical_prefilter(False)
+    assert user_agent_strings_are_compatible(UA_FIREFOX, UA_FIREFOX)
+    assert not user_agent_strings_are_compatible(UA_FIREFOX, UA_FIREFOX_UPGRADE, strict=True)
+    assert user_agent_strings_are_compatible(UA_FIREFOX, UA_FIREFOX_UPGRADE)
+    assert not user_agent_strings_are_compatible(UA_FIREFOX_UPGRADE, UA_FIREFOX)
+    assert not user_agent_strings_are_compatible(UA_FIREFOX, UA_FIREFOX_OLDER_OS)
+    assert not user_agent_strings_are_compatible(UA_FIREFOX, UA_CHROME_UPGRADE)
+    assert not user_agent_strings_are_compatible(UA_WINDOWS_XP, UA_WINDOWS_7)
+    assert fingerprint_is_compatible(ClientFingerprint(UA_FIREFOX), UA_FIREFOX)
+
+    snapshot = metrics_snapshot()
+    assert snapshot["comparisons"] == {"identical": {"identical": 2},
+                                       "strict": {"strict_mismatch": 1},
+                                       "parsed": {"upgrade": 1, "downgrade": 1, "identity_mismatch": 1,
+                                                  "non_numeric_mismatch": 1},
+                                       "cached": {"downgrade": 1},
+                                      }
+    assert snapshot["parse_latency_seconds"]["count"] == 6
+    assert snapshot["comparison_latency_seconds"]["upgrade"]["buckets"][-1] == ["+Inf", 1]
+    assert snapshot["fingerprint_cache"]["misses"] == 6
+
+
+def test_memoized_path_is_counted(metrics):
+    for _ in range(3):
+        assert user_agent_strings_are_compatible(UA_FIREFOX, UA_FIREFOX_UPGRADE)
+        assert not user_agent_strings_are_compatible(UA_FIREFOX, UA_CHROME_UPGRADE)
+
+    snapshot = metrics_snapshot()
+    assert snapshot["comparisons"]["memoized"] == {"memoized": 2, "upgrade": 2}
+    assert snapshot["pair_decision_cache"]["hits"] == 4
+    assert "ua_compare_pair_decision_cache_hits_total 4\n" in format_prometheus(snapshot)
+
+
+def test_memo_hits_neither_analyze_nor_parse(metrics):
+    configure_lexical_prefilter(False)
+    assert not user_agent_strings_are_compatible(UA_WINDOWS_XP, UA_WINDOWS_7)
+    assert metrics_snapshot()["parse_latency_seconds"]["count"] == 2
+
+    # Evicted from the fingerprint cache, but still in the memo: counted without parsing again.
+    ua_fingerprint._fingerprint_cache.cache_clear()
+    for _ in range(3):
+        assert not user_agent_strings_are_compatible(UA_WINDOWS_XP, UA_WINDOWS_7)
+    snapshot = metrics_snapshot()
+    assert snapshot["comparisons"]["memoized"] == {"memoized": 3}
+    assert snapshot["parse_latency_seconds"]["count"] == 2
+    assert snapshot["fingerprint_cache"]["misses"] == 0
+
+
+def test_lexical_path_is_counted(metrics):
+    assert not user_agent_strings_are_compatible(UA_FIREFOX, UA_CHROME_UPGRADE)
+    assert user_agent_strings_are_compatible(UA_FIREFOX, UA_FIREFOX_UPGRADE)
+    assert metrics_snapshot()["comparisons"] == {"lexical": {"identity_mismatch": 1, "upgrade": 1}}
+    assert metrics_snapshot()["parse_latency_seconds"]["count"] == 0
+
+
+@pytest.mark.parametrize("lexical_prefilter", [True, False])
+def test_instrumented_decisions_match(metrics, lexical_prefilter):
+    ua_strings = generate_user_agent_strings(40, seed=3) + [UA_FIREFOX, UA_FIREFOX_UPGRADE, UA_WINDOWS_XP]
+    pairs = list(itertools.product(ua_strings, repeat=2))
+    configure_lexical_prefilter(lexical_prefilter)
+
+    instrumented = [user_agent_strings_are_compatible(ua_1, ua_2) for (ua_1, ua_2) in pairs]
+    disable_metrics()
+    clear_fingerprint_cache()
+    assert [user_agent_strings_are_compatible(ua_1, ua_2) for (ua_1, ua_2) in pairs] == instrumented
+
+
+def test_batch_and_async_comparisons_are_counted(metrics):
+    configure_lexical_prefilter(False)
+    pairs = [(UA_FIREFOX, UA_FIREFOX), (UA_FIREFOX, UA_FIREFOX_UPGRADE), (UA_FIREFOX_UPGRADE, UA_FIREFOX)]
+    assert list(compare_many(pairs)) == [1, 1, 0]
+    assert metrics_snapshot()["comparisons"] == {"identical": {"identical": 1},
+                                                 "parsed": {"upgrade": 1},
+                                                 "cached": {"downgrade": 1},
+                                                }
+
+    metrics.reset()
+    clear_fingerprint_cache()
+
+    async def decide_all():
+        return [await user_agent_strings_are_compatible_async(UA_WINDOWS_XP, UA_WINDOWS_7),
+                await user_agent_strings_are_compatible_async(UA_WINDOWS_7, UA_WINDOWS_XP),
+                await user_agent_strings_are_compatible_async(UA_WINDOWS_XP, UA_WINDOWS_7, strict=True)]
+
+    assert asyncio.run(decide_all()) == [False, False, False]
+    assert metrics_snapshot()["comparisons"] == {"parsed": {"non_numeric_mismatch": 1},
+                                                 "cached": {"non_numeric_mismatch": 1},
+                                                 "strict": {"strict_mismatch": 1},
+                                                }
+    assert metrics_snapshot()["parse_latency_seconds"]["count"] == 2
+
+
+def test_callback_and_disabling(metrics):
+    events = []
+    enable_metrics(callback=lambda event, labels, seconds: events.append((event, labels)))
+    user_agent_strings_are_compatible(UA_WINDOWS_XP, UA_WINDOWS_7)
+
+    assert events[-1] == ("comparison", {"path": "parsed", "reason": "non_numeric_mismatch"})
+    assert events.count(("parse", {})) == 2
+
+    disable_metrics()
+    user_agent_strings_are_compatible(UA_WINDOWS_7, UA_WINDOWS_XP)
+    assert len(events) == 3
+    assert metrics_snapshot() is None
+
+
+def test_prometheus_exposition(metrics):
+    user_agent_strings_are_compatible(UA_FIREFOX, UA_FIREFOX_UPGRADE)
+    text = format_prometheus(metrics_snapshot())
+
+    assert 'ua_compare_comparisons_total{path="lexical",reason="upgrade"} 1\n' in text
+    assert 'ua_compare_comparison_seconds_bucket{reason="upgrade",le="+Inf"} 1\n' in text
+    assert "ua_compare_parse_seconds_count 0\n" in text
+    assert "# TYPE ua_compare_fingerprint_cache_size gauge\n" in text
+
+
+def test_latency_histogram_buckets():
+    histogram = LatencyHistogram((1.0, 2.0))
+    for seconds in (0.5, 1.0, 1.5, 3.0):
+        histogram.observe(seconds)
+    assert histogram.as_dict() == {"buckets": [[1.0, 2], [2.0, 3], ["+Inf", 4]], "count": 4, "sum": 6.0}
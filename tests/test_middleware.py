@@ -0,0 +1,180 @@
+"""
+Tests the WSGI and ASGI session middleware with pytest, against an in-memory
+session store.
+"""
+
+
+import asyncio
+import threading
+from wsgiref.util import setup_testing_defaults
+
+from compare_user_agent_strings import (
+                                        SessionUserAgentChecker,
+                                        UserAgentASGIMiddleware,
+                                        UserAgentWSGIMiddleware,
+                                       )
+from compare_user_agent_strings.middleware import CHECK_KEY
+
+UA_BASE = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/105.1'
+UA_UPGRADE = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/106.0'
+UA_OTHER = "Mozilla/4.0 (compatible; MSIE 6.0; Windows NT 5.1; SV1; .NET CLR 1.1.4322)"
+
+
+class InMemorySessionStore():
+    """
+    Stands in for a server-side session store (e.g., Redis): copies sessions
+    in and out, as a remote store would.
+    """
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+        return None if session is None else dict(session)
+
+    def __setitem__(self, session_id, session):
+        with self._lock:
+            self._sessions[session_id] = dict(session)
+
+    def pop(self, session_id, default=None):
+        with self._lock:
+            return self._sessions.pop(session_id, default)
+
+    def __contains__(self, session_id):
+        return session_id in self._sessions
+
+
+def _store_with_sessions(*session_ids):
+    store = InMemorySessionStore()
+    for session_id in session_ids:
+        store[session_id] = {"user": session_id}
+    return store
+
+
+def _wsgi_request(middleware, cookie, user_agent):
+    environ = {}
+    setup_testing_defaults(environ)
+    if cookie is not None:
+        environ["HTTP_COOKIE"] = cookie
+    environ["HTTP_USER_AGENT"] = user_agent
+    statuses = []
+    body = b"".join(middleware(environ, lambda status, headers: statuses.append(status)))
+    return (statuses[0], body, environ[CHECK_KEY]["verdict"])
+
+
+def _hello_wsgi_app(environ, start_response):
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [b"hello"]
+
+
+def test_wsgi_strict_session_cookie():
+    store = _store_with_sessions("s1")
+    middleware = UserAgentWSGIMiddleware(_hello_wsgi_app, SessionUserAgentChecker(store,
+                                                                                  record_missing_baselines=True))
+
+    assert _wsgi_request(middleware, "session=s1", UA_BASE) == ("200 OK", b"hello", "baseline_recorded")
+    assert _wsgi_request(middleware, "theme=dark; session=s1", UA_BASE) == ("200 OK", b"hello", "identical")
+    (status, _, verdict) = _wsgi_request(middleware, "session=s1", UA_UPGRADE)
+    assert (status, verdict) == ("401 Unauthorized", "incompatible")
+    assert "s1" not in store
+
+    # The revoked session is unknown from now on; the application decides what to do with it.
+    assert _wsgi_request(middleware, "session=s1", UA_BASE)[2] == "no_session"
+    assert _wsgi_request(middleware, None, UA_BASE)[2] == "no_session"
+
+
+def test_wsgi_remember_me_cookie_allows_upgrades():
+    store = _store_with_sessions("r1")
+    checker = SessionUserAgentChecker(store)
+    middleware = UserAgentWSGIMiddleware(_hello_wsgi_app, checker)
+    checker.record_baseline("r1", UA_BASE)
+
+    assert _wsgi_request(middleware, "remember_me=r1", UA_UPGRADE)[2] == "compatible"
+    assert _wsgi_request(middleware, "remember_me=r1", UA_OTHER)[:2] == ("401 Unauthorized", b"Session revoked: "
+                                                                          b"the user agent does not match the one "
+                                                                          b"that started the session.\n")
+    assert "r1" not in store
+
+    info = checker.info()
+    assert info["verdicts"]["compatible"] == 1
+    assert info["verdicts"]["incompatible"] == 1
+    assert info["checked_requests"] == 2
+    assert 0 < info["mean_overhead_microseconds"] <= info["max_overhead_microseconds"]
+
+
+def test_session_without_baseline_fails_closed():
+    store = _store_with_sessions("s1", "r1")
+    checker = SessionUserAgentChecker(store)
+    middleware = UserAgentWSGIMiddleware(_hello_wsgi_app, checker)
+    checker.record_baseline("r1", UA_BASE)
+
+    # A stolen cookie of a session whose baseline was never recorded does not get to record one.
+    assert _wsgi_request(middleware, "session=s1", UA_OTHER) == ("401 Unauthorized",
+                                                                 b"Session revoked: no user agent was recorded "
+                                                                 b"when the session started.\n", "no_baseline")
+    assert "s1" not in store
+    assert _wsgi_request(middleware, "remember_me=r1", UA_BASE)[2] == "identical"
+    assert checker.info()["verdicts"]["no_baseline"] == 1
+
+
+def test_undecodable_baseline_fails_closed():
+    store = _store_with_sessions()
+    store["s1"] = {"ua_fingerprint": b"\xff"}
+    middleware = UserAgentWSGIMiddleware(_hello_wsgi_app, SessionUserAgentChecker(store))
+
+    assert _wsgi_request(middleware, "session=s1", UA_BASE)[0::2] == ("401 Unauthorized", "incompatible")
+    assert "s1" not in store
+
+
+def test_forged_session_cookie_does_not_shield_stolen_remember_me_cookie():
+    store = _store_with_sessions("s1", "r1")
+    checker = SessionUserAgentChecker(store)
+    middleware = UserAgentWSGIMiddleware(_hello_wsgi_app, checker)
+    checker.record_baseline("s1", UA_BASE)
+    checker.record_baseline("r1", UA_BASE)
+
+    # An unknown transient session id next to the stolen "remember me" cookie
+    (status, _, verdict) = _wsgi_request(middleware, "session=forged; remember_me=r1", UA_OTHER)
+    assert (status, verdict) == ("401 Unauthorized", "incompatible")
+    assert "r1" not in store
+
+    # Both sessions are checked, and the most severe verdict wins.
+    assert _wsgi_request(middleware, "session=s1; remember_me=forged", UA_BASE)[2] == "identical"
+    assert checker.sessions_for("remember_me=r2; session=s2") == [("s2", True), ("r2", False)]
+
+
+def test_asgi_middleware():
+    store = _store_with_sessions("s1", "r1")
+    checker = SessionUserAgentChecker(store)
+    checker.record_baseline("s1", UA_BASE)
+    checker.record_baseline("r1", UA_BASE)
+
+    async def hello_asgi_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"hello"})
+
+    middleware = UserAgentASGIMiddleware(hello_asgi_app, checker)
+
+    async def request(cookie, user_agent):
+        scope = {"type": "http", "headers": [(b"cookie", cookie.encode()), (b"user-agent", user_agent.encode())]}
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        await middleware(scope, None, send)
+        return (messages[0]["status"], scope[CHECK_KEY]["verdict"])
+
+    async def requests():
+        return [await request("session=s1", UA_BASE),
+                await request("remember_me=r1", UA_UPGRADE),
+                await request("session=s1", UA_UPGRADE),
+                await request("session=s1", UA_BASE)]
+
+    assert asyncio.run(requests()) == [(200, "identical"), (200, "compatible"), (401, "incompatible"),
+                                       (200, "no_session")]
+    assert "s1" not in store
+    assert "r1" in store
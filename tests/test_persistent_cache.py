@@ -0,0 +1,101 @@
+"""
+Tests the persistent fingerprint cache with pytest.
+"""
+
+
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import compare_user_agent_strings.ua_fingerprint as ua_fingerprint
+from compare_user_agent_strings import (
+                                        ClientFingerprint,
+                                        clear_fingerprint_cache,
+                                        configure_persistent_fingerprint_cache,
+                                        get_client_fingerprint,
+                                        persistent_fingerprint_cache_info,
+                                       )
+from compare_user_agent_strings.persistent_cache import PersistentFingerprintStore, parser_signature
+
+UA_1 = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/105.1'
+UA_2 = "Mozilla/4.0 (compatible; MSIE 6.0; Windows NT 5.1; SV1; .NET CLR 1.1.4322)"
+
+
+def _stored_fingerprint(path_and_ua_string):
+    (path, ua_string) = path_and_ua_string
+    store = PersistentFingerprintStore(path)
+    fingerprint = store.get(ua_string)
+    return None if fingerprint is None else fingerprint.to_bytes()
+
+
+@pytest.fixture
+def persistent_cache(tmp_path):
+    path = tmp_path / "fingerprints.sqlite3"
+    clear_fingerprint_cache()
+    configure_persistent_fingerprint_cache(path)
+    yield path
+    configure_persistent_fingerprint_cache(None)
+    clear_fingerprint_cache()
+
+
+def test_store_round_trips_and_survives_reopening(tmp_path):
+    path = tmp_path / "fingerprints.sqlite3"
+    store = PersistentFingerprintStore(path)
+    assert store.get(UA_1) is None
+
+    store.put_many([ClientFingerprint(UA_1), ClientFingerprint(UA_2)])
+    store.close()
+
+    reopened = PersistentFingerprintStore(path)
+    assert len(reopened) == 2
+    assert reopened.get(UA_1) == ClientFingerprint(UA_1)
+    assert reopened.info()["hits"] == 1
+    assert reopened.info()["misses"] == 0
+
+
+def test_signatures_share_a_store_without_seeing_or_deleting_each_other(tmp_path):
+    path = tmp_path / "fingerprints.sqlite3"
+    new_signature = parser_signature() + ";regexes=new"
+    old_store = PersistentFingerprintStore(path)
+    old_store.put(ClientFingerprint(UA_1))
+
+    # A process of the new signature opens the store, as in a rolling deploy, while the old one keeps writing.
+    new_store = PersistentFingerprintStore(path, signature=new_signature)
+    assert new_store.get(UA_1) is None
+    old_store.put(ClientFingerprint(UA_2))
+    new_store.put(ClientFingerprint(UA_2))
+
+    assert len(PersistentFingerprintStore(path)) == 2
+    assert PersistentFingerprintStore(path).get(UA_1) is not None
+    assert len(new_store) == 1
+    assert new_store.get(UA_1) is None
+
+    assert new_store.delete_other_signatures() == 2
+    assert len(PersistentFingerprintStore(path)) == 0
+    assert new_store.get(UA_2) is not None
+
+
+def test_cache_miss_is_served_from_store_without_parsing(persistent_cache, monkeypatch):
+    expected = get_client_fingerprint(UA_1)
+    assert persistent_fingerprint_cache_info()["writes"] == 1
+
+    # A fresh in-memory cache, as after a restart, with parsing made impossible.
+    clear_fingerprint_cache()
+    monkeypatch.setattr(ua_fingerprint, "ClientFingerprint", None)
+
+    assert get_client_fingerprint(UA_1) == expected
+    assert persistent_fingerprint_cache_info()["hits"] == 1
+
+
+def test_store_is_shared_with_other_processes(persistent_cache):
+    expected = get_client_fingerprint(UA_2)
+
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        results = list(executor.map(_stored_fingerprint, [(persistent_cache, UA_2), (persistent_cache, UA_1)]))
+
+    assert results == [expected.to_bytes(), None]
+
+
+def test_disabling_persistent_cache(persistent_cache):
+    configure_persistent_fingerprint_cache(None)
+    assert persistent_fingerprint_cache_info() is None
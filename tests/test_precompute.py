@@ -0,0 +1,128 @@
+"""
+Tests precomputed fingerprint artifacts with pytest.
+"""
+
+
+import gzip
+import json
+import marshal
+
+import pytest
+
+import compare_user_agent_strings.ua_fingerprint as ua_fingerprint
+from compare_user_agent_strings import (
+                                        ClientFingerprint,
+                                        build_fingerprint_artifact,
+                                        clear_fingerprint_cache,
+                                        clear_precomputed_fingerprints,
+                                        compare_many,
+                                        fingerprint_source_info,
+                                        get_client_fingerprint,
+                                        load_fingerprint_artifact,
+                                       )
+from compare_user_agent_strings.__main__ import main as package_main
+from compare_user_agent_strings.persistent_cache import parser_signature
+from compare_user_agent_strings.precompute import (
+                                                   ARTIFACT_FORMAT_VERSION,
+                                                   _ARTIFACT_MAGIC,
+                                                   _artifact_signature,
+                                                   most_common_user_agent_strings,
+                                                   read_fingerprint_artifact,
+                                                  )
+from compare_user_agent_strings.ua_fingerprint import _SERIALIZED_ATTRIBUTES
+
+UA_COMMON = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/105.1'
+UA_UPGRADE = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/106.0'
+UA_RARE = "Mozilla/4.0 (compatible; MSIE 6.0; Windows NT 5.1; SV1; .NET CLR 1.1.4322)"
+
+TRAFFIC = [UA_COMMON] * 5 + [UA_UPGRADE] * 3 + [UA_RARE]
+
+
+@pytest.fixture
+def precomputed(tmp_path):
+    path = tmp_path / "fingerprints.bin"
+    build_fingerprint_artifact(TRAFFIC, path, top=2)
+    clear_fingerprint_cache()
+    yield path
+    clear_precomputed_fingerprints()
+    clear_fingerprint_cache()
+
+
+def test_most_common_user_agent_strings():
+    assert most_common_user_agent_strings(TRAFFIC) == [UA_COMMON, UA_UPGRADE, UA_RARE]
+    assert most_common_user_agent_strings(iter(TRAFFIC), 1) == [UA_COMMON]
+
+
+def test_artifact_round_trips_top_fingerprints(precomputed):
+    assert read_fingerprint_artifact(precomputed) == [ClientFingerprint(UA_COMMON), ClientFingerprint(UA_UPGRADE)]
+
+
+def test_precomputed_fingerprints_are_served_without_parsing(precomputed, monkeypatch):
+    assert load_fingerprint_artifact(precomputed) == 2
+    monkeypatch.setattr(ua_fingerprint, "ClientFingerprint", None)
+
+    assert compare_many([(UA_COMMON, UA_UPGRADE), (UA_UPGRADE, UA_COMMON)]) == bytearray([1, 0])
+
+    info = fingerprint_source_info()
+    assert info["precomputed_hits"] == 2
+    assert info["parsed"] == 0
+    assert info["served_without_parsing"] == 1.0
+
+
+def test_fraction_served_without_parsing(precomputed):
+    load_fingerprint_artifact(precomputed)
+    for ua_string in TRAFFIC:
+        get_client_fingerprint(ua_string)
+
+    info = fingerprint_source_info()
+    assert (info["lookups"], info["memory_hits"], info["precomputed_hits"], info["parsed"]) == (9, 6, 2, 1)
+    assert info["served_without_parsing"] == pytest.approx(8 / 9)
+
+
+def test_stale_or_foreign_artifact_is_rejected(precomputed, tmp_path):
+    with pytest.raises(ValueError):
+        read_fingerprint_artifact(precomputed, signature="ua-parser=0.0")
+
+    not_an_artifact = tmp_path / "not_an_artifact.bin"
+    not_an_artifact.write_bytes(b"UAFP\x00\x01")
+    with pytest.raises(ValueError):
+        load_fingerprint_artifact(not_an_artifact)
+    assert fingerprint_source_info()["precomputed_fingerprints"] == 0
+
+
+def write_artifact(path, signature, fields):
+    path.write_bytes(_ARTIFACT_MAGIC + marshal.dumps((ARTIFACT_FORMAT_VERSION, signature, fields)))
+    return path
+
+
+def test_artifact_of_another_python_version_is_rejected(tmp_path):
+    fields = [tuple(getattr(ClientFingerprint(UA_COMMON), attribute) for attribute in _SERIALIZED_ATTRIBUTES)]
+    assert read_fingerprint_artifact(write_artifact(tmp_path / "current.bin", _artifact_signature(parser_signature()),
+                                                    fields)) == [ClientFingerprint(UA_COMMON)]
+
+    with pytest.raises(ValueError):
+        read_fingerprint_artifact(write_artifact(tmp_path / "python2.bin", f"{parser_signature()};python=2.7",
+                                                 fields))
+
+
+def test_records_of_the_wrong_shape_are_skipped(tmp_path):
+    good = tuple(getattr(ClientFingerprint(UA_COMMON), attribute) for attribute in _SERIALIZED_ATTRIBUTES)
+    fields = [good[:-1], list(good), (None, *good[1:]), (*good[:5], [105], *good[6:]), good]
+    path = write_artifact(tmp_path / "damaged.bin", _artifact_signature(parser_signature()), fields)
+    assert read_fingerprint_artifact(path) == [ClientFingerprint(UA_COMMON)]
+
+    with pytest.raises(ValueError):
+        read_fingerprint_artifact(write_artifact(tmp_path / "not_a_list.bin",
+                                                 _artifact_signature(parser_signature()), 42))
+
+
+def test_precompute_command(tmp_path, capsys):
+    input_path = tmp_path / "user_agents.txt.gz"
+    with gzip.open(input_path, "wt", encoding="utf-8") as input_file:
+        input_file.write("".join(ua_string + "\n" for ua_string in TRAFFIC) + "\n")
+    output_path = tmp_path / "fingerprints.bin"
+
+    assert package_main(["precompute", str(input_path), "--top", "2", "-o", str(output_path)]) == 0
+
+    assert json.loads(capsys.readouterr().out)["fingerprints"] == 2
+    assert [fingerprint.string for fingerprint in read_fingerprint_artifact(output_path)] == [UA_COMMON, UA_UPGRADE]
@@ -0,0 +1,124 @@
+"""
+Tests with pytest that the lexical prefilter never changes a decision.
+"""
+
+
+import itertools
+
+import pytest
+
+import compare_user_agent_strings.ua_fingerprint as ua_fingerprint
+from compare_user_agent_strings import (
+                                        ClientFingerprint,
+                                        clear_fingerprint_cache,
+                                        compare_many,
+                                        configure_lexical_prefilter,
+                                        fingerprint_is_compatible,
+                                        fingerprint_source_info,
+                                        user_agent_strings_are_compatible,
+                                       )
+from compare_user_agent_strings.corpus import generate_session_pairs, generate_user_agent_strings
+from compare_user_agent_strings.prefilter import PARSED_IDENTITIES, classify_user_agent_string
+from compare_user_agent_strings.ua_fingerprint import analyze_parsed_fingerprints
+
+# One format per template, with the OS versions (a, b) and browser versions (c, d) to vary.
+TEMPLATE_FORMATS = [
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X {a}.{b}; rv:{c}.0) Gecko/20100101 Firefox/{c}.{d}",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X {a}_{b}_7) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/{c}.{d}.5000.12 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X {a}_{b}) AppleWebKit/605.1.15 (KHTML, like Gecko) "
+    "Version/{c}.{d} Safari/605.1.15",
+    "Mozilla/5.0 (Windows NT {a}.{b}; Win64; x64; rv:{c}.0) Gecko/20100101 Firefox/{c}.{d}",
+    "Mozilla/5.0 (Windows NT {a}.{b}) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{c}.{d}.0.0 Safari/537.36",
+    "Mozilla/5.0 (X11; Linux x86_64; rv:{c}.0) Gecko/20100101 Firefox/{c}.{d}",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{c}.{d}.0.0 Safari/537.36",
+    ]
+
+TEMPLATE_STRINGS = sorted({template_format.format(a=a, b=b, c=c, d=d)
+                           for template_format in TEMPLATE_FORMATS
+                           for (a, b, c, d) in itertools.product([5, 6, 10, 11], [0, 1, 15], [9, 10, 105], [0, 1])})
+
+# Strings close to a template that ua-parser parses differently, so the prefilter must not classify them.
+NON_TEMPLATE_STRINGS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/105.0.0.0 "
+    "Safari/537.36 Edg/105.0.1343.42",
+    "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:105.0) Gecko/20100101 Firefox/105.0",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:106.0) Gecko/20100101 Firefox/106.0b3",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) "
+    "Version/16.0 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) HeadlessChrome/105.0.0.0 "
+    "Safari/537.36",
+    ]
+
+
+@pytest.fixture
+def restore_lexical_prefilter():
+    yield
+    configure_lexical_prefilter(True)
+
+
+def test_classification_agrees_with_parsing():
+    parsed_identities = {}
+    for ua_string in TEMPLATE_STRINGS:
+        lexical_fingerprint = classify_user_agent_string(ua_string)
+        fingerprint = ClientFingerprint(ua_string)
+
+        assert lexical_fingerprint is not None, ua_string
+        assert parsed_identities.setdefault(lexical_fingerprint.identity, fingerprint.identity) == fingerprint.identity
+        assert PARSED_IDENTITIES[lexical_fingerprint.identity[0]] == fingerprint.identity
+        (os_major, os_minor, user_agent_major, user_agent_minor) = lexical_fingerprint.versions
+        assert fingerprint.versions[2:] == (user_agent_major, user_agent_minor)
+        if os_major is not None:
+            assert fingerprint.versions[:2] == (os_major, os_minor)
+
+    # Different templates never share a parsed identity.
+    templates_of_identity = {}
+    for ((template_name, _), identity) in parsed_identities.items():
+        templates_of_identity.setdefault(identity, set()).add(template_name)
+    assert all(len(template_names) == 1 for template_names in templates_of_identity.values())
+
+    for ua_string in NON_TEMPLATE_STRINGS:
+        assert classify_user_agent_string(ua_string) is None, ua_string
+
+
+def test_prefilter_never_changes_a_decision():
+    ua_strings = TEMPLATE_STRINGS[::3] + NON_TEMPLATE_STRINGS + generate_user_agent_strings(150, seed=12)
+    fingerprints = {ua_string: ClientFingerprint(ua_string) for ua_string in ua_strings}
+
+    decided = 0
+    for (ua_string_1, ua_string_2) in itertools.permutations(ua_strings, 2):
+        is_compatible = ua_fingerprint._lexical_decision(ua_string_1, ua_string_2)
+        if is_compatible is not None:
+            decided += 1
+            assert is_compatible == analyze_parsed_fingerprints(fingerprints[ua_string_1],
+                                                                fingerprints[ua_string_2]), (ua_string_1, ua_string_2)
+
+    assert decided > len(ua_strings) ** 2 // 4
+
+
+def test_prefilter_decides_without_parsing(monkeypatch):
+    (ua_base, ua_upgrade) = ("Mozilla/5.0 (X11; Linux x86_64; rv:105.0) Gecko/20100101 Firefox/105.0",
+                             "Mozilla/5.0 (X11; Linux x86_64; rv:106.0) Gecko/20100101 Firefox/106.0")
+    baseline = ClientFingerprint(ua_base)
+    clear_fingerprint_cache()
+    monkeypatch.setattr(ua_fingerprint, "ClientFingerprint", None)
+    monkeypatch.setattr(ua_fingerprint, "_pair_decisions_enabled", False)
+
+    assert user_agent_strings_are_compatible(ua_base, ua_upgrade)
+    assert not user_agent_strings_are_compatible(ua_upgrade, ua_base)
+    assert fingerprint_is_compatible(baseline, ua_upgrade)
+    assert not user_agent_strings_are_compatible(ua_base, TEMPLATE_STRINGS[0])
+    assert fingerprint_source_info()["lexical_decisions"] == 4
+    assert fingerprint_source_info()["lookups"] == 0
+
+
+def test_compare_many_agrees_with_prefilter_off(restore_lexical_prefilter):
+    pairs = generate_session_pairs(3000, distinct=300, seed=5, equal_fraction=0.2)
+
+    clear_fingerprint_cache()
+    with_prefilter = compare_many(pairs)
+    assert fingerprint_source_info()["lexical_decisions"] > 0
+
+    configure_lexical_prefilter(False)
+    clear_fingerprint_cache()
+    assert compare_many(pairs) == with_prefilter
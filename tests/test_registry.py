@@ -0,0 +1,116 @@
+"""
+Tests the fingerprint registry with pytest.
+"""
+
+
+import itertools
+
+import pytest
+
+import compare_user_agent_strings.ua_fingerprint as ua_fingerprint
+from compare_user_agent_strings import (
+                                        FingerprintRegistry,
+                                        RegistryFull,
+                                        clear_fingerprint_cache,
+                                        configure_fingerprint_cache,
+                                        configure_lexical_prefilter,
+                                        fingerprint_source_info,
+                                        get_client_fingerprint,
+                                        user_agent_strings_are_compatible,
+                                       )
+from compare_user_agent_strings.corpus import generate_session_pairs, generate_user_agent_strings
+from compare_user_agent_strings.ua_fingerprint import DEFAULT_FINGERPRINT_CACHE_SIZE
+
+UA_FIREFOX = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/105.1'
+UA_FIREFOX_UPGRADE = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/106.0'
+UA_WINDOWS_XP = "Mozilla/5.0 (Windows NT 5.1; rv:7.0.1) Gecko/20100101 Firefox/7.0.1"
+UA_WINDOWS_7 = "Mozilla/5.0 (Windows NT 6.1; rv:7.0.1) Gecko/20100101 Firefox/7.0.1"
+
+
+def test_registry_decisions_match(monkeypatch):
+    ua_strings = generate_user_agent_strings(40, seed=6) + [UA_FIREFOX, UA_FIREFOX_UPGRADE, UA_WINDOWS_XP,
+                                                            UA_WINDOWS_7]
+    registry = FingerprintRegistry()
+    ids = [registry.intern(ua_string) for ua_string in ua_strings]
+
+    for ((ua_1, id_1), (ua_2, id_2)) in itertools.product(zip(ua_strings, ids), repeat=2):
+        for strict in (False, True):
+            expected = user_agent_strings_are_compatible(ua_1, ua_2, strict=strict)
+            assert registry.ids_are_compatible(id_1, id_2, strict=strict) == expected
+            assert registry.is_compatible(id_1, ua_2, strict=strict) == expected
+
+
+def test_ids_and_tables():
+    registry = FingerprintRegistry()
+    ua_strings = [UA_FIREFOX, UA_FIREFOX_UPGRADE, UA_FIREFOX, UA_WINDOWS_XP]
+
+    assert [registry.intern(ua_string) for ua_string in ua_strings] == [0, 1, 0, 2]
+    assert len(registry) == 3
+    assert (UA_WINDOWS_XP in registry) and (UA_WINDOWS_7 not in registry)
+    assert registry.id_of(UA_WINDOWS_7) is None
+    assert registry.string(1) == UA_FIREFOX_UPGRADE
+    assert registry.identity(1) is registry.identity(0)
+    assert registry.versions(1) == (10, 15, 106, 0)
+    assert registry.fingerprint(2) == get_client_fingerprint(UA_WINDOWS_XP)
+    assert registry.info() == {"fingerprints": 3, "max_fingerprints": 1_000_000, "distinct_identities": 2,
+                               "distinct_versions": 3, "code_array_bytes": 24}
+
+
+def test_known_strings_are_checked_without_parsing(monkeypatch):
+    registry = FingerprintRegistry()
+    (baseline_id, _) = (registry.intern(UA_FIREFOX), registry.intern(UA_FIREFOX_UPGRADE))
+    clear_fingerprint_cache()
+    monkeypatch.setattr(ua_fingerprint, "ClientFingerprint", None)
+
+    assert registry.is_compatible(baseline_id, UA_FIREFOX_UPGRADE)
+    assert not registry.is_compatible(baseline_id, UA_FIREFOX_UPGRADE, strict=True)
+    assert fingerprint_source_info()["lookups"] == 0
+
+
+def test_unseen_strings_parse_only_themselves():
+    registry = FingerprintRegistry()
+    baseline_id = registry.intern(UA_WINDOWS_XP)
+    currents = [f"Mozilla/5.0 (Windows NT 6.{minor}; rv:7.0.1) Gecko/20100101 Firefox/7.0.1" for minor in range(5)]
+    expected = [user_agent_strings_are_compatible(UA_WINDOWS_XP, current) for current in currents]
+
+    configure_fingerprint_cache(1)
+    configure_lexical_prefilter(False)
+    clear_fingerprint_cache()
+    try:
+        parsed = fingerprint_source_info()["parsed"]
+        assert [registry.is_compatible(baseline_id, current) for current in currents] == expected
+        # The baseline's side is read from the tables, never parsed again although the tiny cache evicted it.
+        assert fingerprint_source_info()["parsed"] - parsed == len(currents)
+        assert len(registry) == 1
+    finally:
+        configure_lexical_prefilter(True)
+        configure_fingerprint_cache(DEFAULT_FINGERPRINT_CACHE_SIZE)
+        clear_fingerprint_cache()
+
+
+def test_registry_is_bounded():
+    registry = FingerprintRegistry(max_fingerprints=2)
+    registry.intern(UA_FIREFOX)
+    registry.intern(UA_FIREFOX_UPGRADE)
+
+    with pytest.raises(RegistryFull):
+        registry.intern(UA_WINDOWS_XP)
+    # Known strings are still served, and checks of new strings are still decided, without interning them.
+    assert registry.intern(UA_FIREFOX) == 0
+    assert not registry.is_compatible(0, UA_WINDOWS_XP, strict=True)
+    assert not registry.is_compatible(0, UA_WINDOWS_XP)
+    assert registry.is_compatible(1, UA_FIREFOX_UPGRADE.replace("106.0", "107.0"))
+    assert len(registry) == 2
+    with pytest.raises(ValueError):
+        FingerprintRegistry(max_fingerprints=0)
+
+
+def test_memory_scales_with_distinct_fingerprints():
+    from compare_user_agent_strings.benchmarks import measure_memory_per_session
+
+    baselines = [baseline for (baseline, _) in generate_session_pairs(20000, distinct=50, seed=8)]
+    session_memory = measure_memory_per_session(baselines)
+
+    # An array("I") entry per session plus a share of 50 registry entries, versus a fingerprint object per session
+    assert session_memory["registry_id_bytes_per_session"] < 8
+    assert session_memory["fingerprint_bytes_per_session"] > 10 * session_memory["registry_id_bytes_per_session"]
@@ -0,0 +1,117 @@
+"""
+Tests the session tracker with pytest.
+"""
+
+
+import json
+
+import pytest
+
+from compare_user_agent_strings import FingerprintRegistry, SessionTracker, user_agent_strings_are_compatible
+from compare_user_agent_strings.corpus import generate_session_pairs
+from compare_user_agent_strings.middleware import BASELINE_RECORDED, COMPATIBLE, IDENTICAL, INCOMPATIBLE
+
+UA_BASE = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/105.1'
+UA_UPGRADE = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/106.0'
+UA_SECOND_UPGRADE = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.16; rv:104.1) Gecko/20100101 Firefox/106.0'
+UA_OTHER = "Mozilla/4.0 (compatible; MSIE 6.0; Windows NT 5.1; SV1; .NET CLR 1.1.4322)"
+
+
+def test_baseline_advances_after_an_upgrade():
+    tracker = SessionTracker()
+
+    assert tracker.observe("s1", UA_BASE) == BASELINE_RECORDED
+    assert tracker.observe("s1", UA_BASE) == IDENTICAL
+    assert tracker.observe("s1", UA_UPGRADE) == COMPATIBLE
+    assert tracker.baseline("s1") == UA_UPGRADE
+    # The following requests are decided by string equality, and a return to the old version is a downgrade.
+    assert tracker.observe("s1", UA_UPGRADE) == IDENTICAL
+    assert tracker.observe("s1", UA_BASE) == INCOMPATIBLE
+    assert tracker.observe("s1", UA_OTHER) == INCOMPATIBLE
+    assert tracker.history("s1") == (UA_BASE, UA_UPGRADE)
+
+    assert tracker.info()["verdicts"] == {BASELINE_RECORDED: 1, IDENTICAL: 2, COMPATIBLE: 1, INCOMPATIBLE: 2}
+    assert tracker.info()["advanced_baselines"] == 1
+
+
+def test_strict_mode_never_advances():
+    tracker = SessionTracker()
+    tracker.start_session("s1", UA_BASE)
+
+    assert tracker.observe("s1", UA_UPGRADE, strict=True) == INCOMPATIBLE
+    assert tracker.observe("s1", UA_BASE, strict=True) == IDENTICAL
+    assert tracker.history("s1") == (UA_BASE,)
+
+
+def test_history_is_bounded():
+    tracker = SessionTracker(history_length=2)
+    tracker.start_session("s1", UA_BASE)
+    tracker.observe("s1", UA_UPGRADE)
+    tracker.observe("s1", UA_SECOND_UPGRADE)
+
+    assert tracker.history("s1") == (UA_UPGRADE, UA_SECOND_UPGRADE)
+    assert tracker.baseline("s1") == UA_SECOND_UPGRADE
+    with pytest.raises(ValueError):
+        SessionTracker(history_length=0)
+
+
+def test_sessions_start_and_end():
+    tracker = SessionTracker()
+    tracker.start_session("s1", UA_BASE)
+    tracker.observe("s1", UA_UPGRADE)
+    tracker.start_session("s1", UA_OTHER)
+
+    assert tracker.history("s1") == (UA_OTHER,)
+    tracker.end_session("s1")
+    assert ("s1" not in tracker) and (len(tracker) == 0)
+    assert (tracker.baseline("s1") is None) and (tracker.history("s1") == ())
+
+
+def test_snapshot_and_restore():
+    tracker = SessionTracker()
+    tracker.start_session("s1", UA_BASE)
+    tracker.observe("s1", UA_UPGRADE)
+    tracker.start_session("s2", UA_OTHER)
+    snapshot = json.loads(json.dumps(tracker.snapshot()))
+
+    restored = SessionTracker(history_length=1)
+    restored.start_session("s3", UA_BASE)
+    restored.restore(snapshot)
+
+    assert len(restored) == 3
+    assert restored.history("s1") == (UA_UPGRADE,)
+    assert restored.history("s2") == (UA_OTHER,)
+    assert restored.observe("s1", UA_BASE) == INCOMPATIBLE
+    with pytest.raises(ValueError):
+        restored.restore({"format": 0, "sessions": {}})
+
+
+def test_full_registry_decides_without_advancing():
+    registry = FingerprintRegistry(max_fingerprints=1)
+    tracker = SessionTracker(registry=registry)
+    tracker.start_session("s1", UA_BASE)
+
+    assert tracker.observe("s1", UA_UPGRADE) == COMPATIBLE
+    assert tracker.observe("s1", UA_OTHER) == INCOMPATIBLE
+    assert tracker.baseline("s1") == UA_BASE
+
+
+def test_rejected_strings_are_not_interned():
+    registry = FingerprintRegistry(max_fingerprints=2)
+    tracker = SessionTracker(registry=registry)
+    tracker.start_session("s1", UA_BASE)
+
+    # A flood of rejected strings neither grows the registry nor keeps the upgrade from being interned
+    for version in range(1000, 1100):
+        assert tracker.observe("s1", f"{UA_OTHER} bot/{version}") == INCOMPATIBLE
+    assert len(registry) == 1
+    assert tracker.observe("s1", UA_UPGRADE) == COMPATIBLE
+    assert tracker.baseline("s1") == UA_UPGRADE
+
+
+def test_first_decisions_match_the_stateless_ones():
+    tracker = SessionTracker()
+    for (session_id, (baseline, current)) in enumerate(generate_session_pairs(2000, distinct=300, seed=4)):
+        tracker.start_session(session_id, baseline)
+        is_compatible = tracker.observe(session_id, current) in (IDENTICAL, COMPATIBLE)
+        assert is_compatible == user_agent_strings_are_compatible(baseline, current)
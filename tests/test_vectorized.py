@@ -0,0 +1,88 @@
+"""
+Tests the vectorized comparison of columns with pytest.
+"""
+
+
+import itertools
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import compare_user_agent_strings.ua_fingerprint as ua_fingerprint
+from compare_user_agent_strings import (
+                                        clear_fingerprint_cache,
+                                        compare_codes,
+                                        compare_columns,
+                                        fingerprint_source_info,
+                                        user_agent_strings_are_compatible,
+                                       )
+from compare_user_agent_strings.corpus import generate_session_pairs
+
+USER_AGENT_STRINGS = [
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/105.1',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.14; rv:104.1) Gecko/20100101 Firefox/105.1',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 11.14; rv:104.1) Gecko/20100101 Firefox/105.1',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:104.1) Gecko/20100101 Firefox/106.0',
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/105.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/106.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/105.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 5.1; rv:7.0.1) Gecko/20100101 Firefox/7.0.1",
+    "Mozilla/5.0 (Windows NT 6.1; rv:7.0.1) Gecko/20100101 Firefox/7.0.1",
+    "Mozilla/4.0 (compatible; MSIE 6.0; Windows NT 5.1; SV1; .NET CLR 1.1.4322)",
+    ]
+
+
+@pytest.fixture(params=[True, False], ids=["prefilter", "no_prefilter"])
+def lexical_prefilter(request, monkeypatch):
+    monkeypatch.setattr(ua_fingerprint, "_lexical_prefilter_enabled", request.param)
+    clear_fingerprint_cache()
+    yield request.param
+    clear_fingerprint_cache()
+
+
+@pytest.mark.parametrize("strict", [False, True])
+def test_compare_columns_matches_single_pair_path(lexical_prefilter, strict):
+    pairs = list(itertools.product(USER_AGENT_STRINGS, repeat=2)) + generate_session_pairs(3000, distinct=300, seed=4)
+    baselines = [baseline for (baseline, _) in pairs]
+    currents = [current for (_, current) in pairs]
+
+    results = compare_columns(baselines, np.array(currents, dtype=object), strict=strict)
+
+    assert results.dtype == bool
+    assert results.tolist() == [user_agent_strings_are_compatible(baseline, current, strict=strict)
+                                for (baseline, current) in pairs]
+
+
+def test_compare_codes_accepts_categorical_columns():
+    categories = USER_AGENT_STRINGS
+    (baseline_codes, current_codes) = map(np.array, zip(*itertools.product(range(len(categories)), repeat=2)))
+
+    results = compare_codes(baseline_codes, current_codes, categories)
+
+    assert results.tolist() == [user_agent_strings_are_compatible(categories[code_1], categories[code_2])
+                                for (code_1, code_2) in zip(baseline_codes, current_codes)]
+    with pytest.raises(ValueError):
+        compare_codes([0, -1], [1, 2], categories)
+    with pytest.raises(ValueError):
+        compare_codes([0, 1], [1], categories)
+
+
+def test_each_distinct_string_is_parsed_once_and_only_if_needed(monkeypatch):
+    monkeypatch.setattr(ua_fingerprint, "_lexical_prefilter_enabled", False)
+    clear_fingerprint_cache()
+    (windows_xp, windows_7, msie) = USER_AGENT_STRINGS[-3:]
+    baselines = [windows_xp] * 1000 + [msie] * 1000
+    currents = [windows_7] * 1000 + [msie] * 1000
+
+    assert compare_columns(baselines, currents).tolist() == [False] * 1000 + [True] * 1000
+    assert fingerprint_source_info()["parsed"] == 2
+    clear_fingerprint_cache()
+
+
+def test_prefilter_spares_parsing_of_macos_and_linux_strings():
+    clear_fingerprint_cache()
+    compare_columns(USER_AGENT_STRINGS[:7], USER_AGENT_STRINGS[1:8])
+    # Only the Windows string needs parsing.
+    assert fingerprint_source_info()["parsed"] == 1
+    clear_fingerprint_cache()